@@ -13,6 +13,7 @@ logger = logging.getLogger(__name__)
 # Add the parent directory to the path to import from utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.sections import Section
+from utils.section_rules import DatePattern
 from navigation import make_sidebar
 from utils.db import get_db
 
@@ -230,6 +231,101 @@ def display_sections(sections_list):
     else:
         st.info("No hi ha seccions que coincideixin amb els filtres seleccionats.")
 
+def merge_section_dates(fechas, new_dates):
+    """Add explicit dates to the section's fechas, keeping its date rule if it has one"""
+    pattern = DatePattern.from_value(fechas)
+    if pattern is None:
+        return sorted(set(new_dates))
+    return pattern.with_dates(include=new_dates).to_dict()
+
+def nth_weekday_label(option):
+    """Catalan label of an (n, weekday) option, e.g. 1r divendres or Últim dilluns"""
+    n, weekday = option
+    ordinals = {1: "1r", 2: "2n", 3: "3r", 4: "4t", 5: "5è", -1: "Últim"}
+    return f"{ordinals[n]} {day_translation[weekday]}"
+
+def edit_section_pattern(selected_section):
+    """Form for the recurring date rule of a section (week parity, nth weekday, bounds)"""
+    st.write("### Patró de dates")
+    st.caption("La secció s'aplica els dies que compleixen totes les regles, més les dates afegides "
+               "a mà i menys les excloses. Les regles es repeteixen cada any.")
+    pattern = selected_section.pattern
+    rule = pattern.to_dict() if pattern is not None else {}
+    parity_labels = {"even": "parell", "odd": "senar"}
+
+    with st.form("section_pattern_form"):
+        cutovers = rule.get("week_parity", [])
+        use_parity = st.checkbox("Setmanes alternes (paritat de la setmana ISO)", value=bool(cutovers))
+        first_parity = st.selectbox(
+            "Paritat inicial",
+            options=["even", "odd"],
+            index=1 if cutovers and cutovers[0]["parity"] == "odd" else 0,
+            format_func=lambda x: parity_labels[x]
+        )
+        cutover_text = st.text_area(
+            "Canvis de paritat (una línia per canvi: AAAA-MM-DD parell|senar)",
+            value="\n".join(f"{c['from']} {parity_labels[c['parity']]}" for c in cutovers[1:])
+        )
+
+        nth_options = [(n, day) for n in (1, 2, 3, 4, 5, -1) for day in day_translation if day != "festivo"]
+        nth_weekday = st.multiselect(
+            "Dies concrets del mes",
+            options=nth_options,
+            default=[tuple(item) for item in rule.get("nth_weekday", []) if tuple(item) in nth_options],
+            format_func=nth_weekday_label
+        )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            start = st.date_input("Vàlid des de", value=pattern.start if pattern is not None else None)
+        with col2:
+            end = st.date_input("Vàlid fins a", value=pattern.end if pattern is not None else None)
+
+        exclude_text = st.text_area(
+            "Dates excloses (una per línia: AAAA-MM-DD o AAAA-MM-DD/AAAA-MM-DD)",
+            value="\n".join(rule.get("exclude", []))
+        )
+
+        submitted = st.form_submit_button("Desar patró")
+
+        if submitted:
+            reverse_parity = {label: parity for parity, label in parity_labels.items()}
+            new_rule = {key: rule[key] for key in ("include",) if key in rule}
+            try:
+                if use_parity:
+                    new_rule["week_parity"] = [{"from": None, "parity": first_parity}]
+                    for line in cutover_text.splitlines():
+                        if line.strip():
+                            cutover, label = line.split()
+                            new_rule["week_parity"].append({"from": cutover, "parity": reverse_parity.get(label, label)})
+                if nth_weekday:
+                    new_rule["nth_weekday"] = [list(option) for option in nth_weekday]
+                if start:
+                    new_rule["start"] = start.isoformat()
+                if end:
+                    new_rule["end"] = end.isoformat()
+                excluded = [line.strip() for line in exclude_text.splitlines() if line.strip()]
+                if excluded:
+                    new_rule["exclude"] = excluded
+                new_pattern = DatePattern(**new_rule)
+            except ValueError as e:
+                st.error(f"Patró no vàlid: {str(e)}")
+                return
+
+            updated_section = Section(
+                nombre=selected_section.nombre,
+                dias=selected_section.dias,
+                horas_turno=selected_section.horas_turno,
+                horas_jornada=getattr(selected_section, 'horas_jornada', None),
+                personal=selected_section.personal if hasattr(selected_section, 'personal') else 1,
+                libra=selected_section.libra,
+                fechas=new_pattern.to_dict()
+            )
+            if save_section(updated_section):
+                st.success(f"Patró de dates actualitzat per a la secció {updated_section.nombre}!")
+                time.sleep(2)
+                st.rerun()
+
 def modify_section(sections_list):
     """Form for modifying an existing section"""
     st.subheader("⚙️ Modificar una secció existent")
@@ -252,7 +348,7 @@ def modify_section(sections_list):
         # First, show the option to choose between editing details or adding specific dates
         modification_type = st.radio(
             "Què voleu modificar?",
-            options=["Editar detalls de la secció", "Afegir dates específiques"],
+            options=["Editar detalls de la secció", "Afegir dates específiques", "Patró de dates"],
             horizontal=True
         )
         
@@ -316,7 +412,7 @@ def modify_section(sections_list):
                         time.sleep(2)
                         st.rerun()
         
-        else:  # "Afegir dates específiques"
+        elif modification_type == "Afegir dates específiques":
             # FORM FOR MANAGING SPECIFIC DATES
             st.write("### Afegir dates específiques")
 
@@ -353,7 +449,7 @@ def modify_section(sections_list):
                         # Determine the final dates list
                         if hasattr(selected_section, 'fechas') and selected_section.fechas:
                             # Merge existing and new dates, avoiding duplicates
-                            all_dates = list(set(selected_section.fechas) | set(new_dates))
+                            all_dates = merge_section_dates(selected_section.fechas, new_dates)
                         else:
                             # Only use new dates (either no existing dates or user chose to clear them)
                             all_dates = new_dates
@@ -414,7 +510,7 @@ def modify_section(sections_list):
                         # Determine the final dates list
                         if hasattr(selected_section, 'fechas') and selected_section.fechas:
                             # Merge existing and new dates, avoiding duplicates
-                            all_dates = list(set(selected_section.fechas) | set(new_dates))
+                            all_dates = merge_section_dates(selected_section.fechas, new_dates)
                         else:
                             # Only use new dates (either no existing dates or user chose to clear them)
                             all_dates = new_dates
@@ -450,21 +546,25 @@ def modify_section(sections_list):
                             time.sleep(2)
                             st.rerun()
 
-                            # Show current specific dates if they exist
-            if len(selected_section.fechas) > 1:
-                st.write("#### Veure dates actuals ⬇️")
-                # Add year selector for the calendar display
-                years = sorted(set([int(d.split('-')[0]) for d in selected_section.fechas]))
-                current_year = datetime.now().year
-                default_year = current_year if current_year in years else years[0] if years else datetime.now().year
-                selected_year = st.selectbox(
-                    "Seleccioneu any per visualitzar:", 
-                    options=years,
-                    index=years.index(default_year) if default_year in years else 0,
-                    key="calendar_year_display"
-                )
-                # Display dates in a calendar view
-                display_dates_calendar(selected_section.fechas, selected_year)
+        else:  # "Patró de dates"
+            edit_section_pattern(selected_section)
+
+        # Show current dates if the section has a date pattern
+        pattern = selected_section.pattern
+        if pattern is not None:
+            st.write("#### Veure dates actuals ⬇️")
+            # Add year selector for the calendar display (rules repeat every year)
+            current_year = datetime.now().year
+            years = pattern.years() or [current_year - 1, current_year, current_year + 1]
+            default_year = current_year if current_year in years else years[0]
+            selected_year = st.selectbox(
+                "Seleccioneu any per visualitzar:", 
+                options=years,
+                index=years.index(default_year),
+                key="calendar_year_display"
+            )
+            # Display dates in a calendar view
+            display_dates_calendar([d.isoformat() for d in pattern.dates_in_year(selected_year)], selected_year)
 
 
 def add_new_section():
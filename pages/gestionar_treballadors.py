@@ -7,6 +7,8 @@ import json
 from datetime import datetime, timedelta
 sys.path.append("../")  # Add parent directory to path
 from utils.worker import Worker  # Import the Worker class
+from utils.ooo import OOOPeriod, merge_ooo_periods, parse_ooo_periods
+from utils.scheduling_rules import LEGACY_WORKER_RULES
 from utils.db import get_db
 
 # Check if user is logged in
@@ -253,31 +255,33 @@ with tab2:
                     days_assigned[area] = area_days
             
             st.subheader("Dies no disponibles")
-            current_ooo_days = []
-            if hasattr(selected_worker, 'ooo_days') and selected_worker.ooo_days:
-                current_ooo_days = [day.strip() for day in selected_worker.ooo_days.split(",")]
-                st.write("Dies d'absència actuals:")
-                for date in current_ooo_days:
-                    st.write(f"- {date}")
+            current_ooo_periods = parse_ooo_periods(getattr(selected_worker, 'ooo_days', None), selected_worker.name)
+            if current_ooo_periods:
+                st.write("Períodes d'absència actuals:")
+                for period in current_ooo_periods:
+                    st.write(f"- {period} · {period.days} dies")
 
-            # Date range selector for adding new OOO days
+            # Date range selector for adding a new OOO period
             st.write("Afegir nou període d'absència:")
-            col1, col2 = st.columns(2)
+            col1, col2, col3 = st.columns(3)
             with col1:
                 start_date = st.date_input("Data d'inici", value=None)
             with col2:
                 end_date = st.date_input("Data de finalització", value=None)
+            with col3:
+                ooo_reason = st.text_input("Motiu", value="", placeholder="Vacances, formació...")
 
             # Add a checkbox for single day selection
             single_day = st.checkbox("Només un dia", value=False)
 
-            # Remove existing OOO days
-            if current_ooo_days:
-                st.write("Eliminar dies d'absència:")
-                days_to_remove = st.multiselect(
-                    "Selecciona els dies a eliminar:",
-                    options=current_ooo_days,
-                    format_func=lambda x: x
+            # Remove existing OOO periods
+            periods_to_remove = []
+            if current_ooo_periods:
+                st.write("Eliminar períodes d'absència:")
+                periods_to_remove = st.multiselect(
+                    "Selecciona els períodes a eliminar:",
+                    options=current_ooo_periods,
+                    format_func=str
                 )
 
             # Hours availability
@@ -293,6 +297,18 @@ with tab2:
                 min_value=0,
                 value=selected_worker.available_guard_hours if hasattr(selected_worker, 'available_guard_hours') else 499
             )
+
+            # Person-specific scheduling rules (pins, exclusions, preferences)
+            st.subheader("Regles de planificació")
+            current_rules = getattr(selected_worker, 'rules', None)
+            if current_rules is None:
+                current_rules = LEGACY_WORKER_RULES.get(selected_worker.name, [])
+            rules_text = st.text_area(
+                "Regles (JSON):",
+                value=json.dumps(current_rules, ensure_ascii=False, indent=2),
+                help='Llista de regles, p. ex. [{"type": "pin", "section": "Urg_G_tarde-noche_l", "when": {"weekday": "friday", "nth": 1}}]. '
+                     'Tipus: "pin" (assigna la guàrdia), "exclude" (no la pot fer) i "prefer" (se li dona si està disponible).'
+            )
             
             # Submit button
             submitted = st.form_submit_button("Actualitzar Treballador")
@@ -308,33 +324,20 @@ with tab2:
                 selected_worker.days_assigned = json.dumps(days_assigned)                
                 selected_worker.available_work_hours = available_work_hours
                 selected_worker.available_guard_hours = available_guard_hours
-                if not hasattr(selected_worker, 'ooo_days'):
-                    selected_worker.ooo_days = []
-                    
-                # Remove selected days
-                if 'days_to_remove' in locals() and days_to_remove:
-                    for day in days_to_remove:
-                        if day in selected_worker.ooo_days:
-                            selected_worker.ooo_days.remove(day)
-                            
-                # Add new OOO days
+                # Out-of-office periods are kept as (start, end, reason) ranges
+                ooo_periods = [period for period in current_ooo_periods if period not in periods_to_remove]
                 if start_date and (single_day or end_date):
-                    # If only one day is needed
-                    if single_day:
-                        date_str = start_date.strftime('%Y-%m-%d')
-                        if date_str not in selected_worker.ooo_days:
-                            selected_worker.ooo_days.append(date_str)
+                    period_end = start_date if single_day else end_date
+                    if period_end >= start_date:
+                        ooo_periods.append(OOOPeriod(start_date, period_end, ooo_reason.strip()))
                     else:
-                        # Add all days in the range
-                        if end_date >= start_date:
-                            current_date = start_date
-                            while current_date <= end_date:
-                                date_str = current_date.strftime('%Y-%m-%d')
-                                if date_str not in selected_worker.ooo_days:
-                                    selected_worker.ooo_days.append(date_str)
-                                current_date = current_date + timedelta(days=1)
-                        else:
-                            st.error("La data de finalització ha de ser posterior o igual a la data d'inici.")
+                        st.error("La data de finalització ha de ser posterior o igual a la data d'inici.")
+                selected_worker.ooo_days = merge_ooo_periods(ooo_periods)
+                try:
+                    rules = json.loads(rules_text) if rules_text.strip() else []
+                    selected_worker.rules = rules if isinstance(rules, list) else [rules]
+                except json.JSONDecodeError as e:
+                    st.error(f"Les regles no són un JSON vàlid, no s'han modificat: {e}")
                 
                 # Save changes to database
                 try:
@@ -1,6 +1,6 @@
 import streamlit as st
 from utils.calendar_utils import get_shifts_data, get_shift_color
-from utils.sections import festivos
+from utils.holidays import get_holidays
 
 def show_monthly_list(selected_month, year, month_names):
     """Display the monthly list view of shifts"""
@@ -19,7 +19,7 @@ def show_monthly_list(selected_month, year, month_names):
         for date in dates:
             day_shifts = df[df['date'] == date]
             weekday = day_shifts.iloc[0]['weekday']
-            is_festivo = date in festivos
+            is_festivo = get_holidays().is_festivo(date)
             
             date_str = date.strftime("%Y-%m-%d")
             if is_festivo:
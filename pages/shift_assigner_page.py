@@ -14,6 +14,9 @@ logger = logging.getLogger(__name__)
 # Add the parent directory to the path to import from utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.db import get_db
+from utils.assignment_io import STATS_SUMMARY_KEYS
+from utils.staffing import DEFAULT_MINIMUM_STAFF, STAFFING_CATEGORIES
+from utils.workload_limits import DEFAULT_MONTHLY_CAPS, SHIFT_TYPES
 
 # Check if user is logged in
 if "logged_in" not in st.session_state or not st.session_state.logged_in:
@@ -103,6 +106,27 @@ with st.form("assignment_params"):
         options=sections_to_assign,
         default=sections_to_assign[:min(5, len(sections_to_assign))] if sections_to_assign else []
     )
+
+    # Minimum regular staff that has to remain available per category (Mon-Thu regular shifts)
+    with st.expander("Personal mínim disponible per categoria"):
+        minimum_staff = {
+            category: st.number_input(category, min_value=0, max_value=20,
+                                      value=DEFAULT_MINIMUM_STAFF[category], step=1,
+                                      key=f"minimum_staff_{category}")
+            for category in STAFFING_CATEGORIES
+        }
+
+    with st.expander("Màxim de guàrdies mensuals per àrea"):
+        st.caption("Les hores de guàrdia anuals de cada treballador també es limiten a les seves hores disponibles.")
+        monthly_caps = {}
+        for category in STAFFING_CATEGORIES:
+            columns = st.columns(len(SHIFT_TYPES))
+            monthly_caps[category] = {
+                shift_type: column.number_input(f"{category} ({shift_type})", min_value=0, max_value=31,
+                                                value=DEFAULT_MONTHLY_CAPS[category][shift_type], step=1,
+                                                key=f"monthly_cap_{category}_{shift_type}")
+                for column, shift_type in zip(columns, SHIFT_TYPES)
+            }
     
     # Run button at the bottom of the form
     submitted = st.form_submit_button("Iniciar assignació de guàrdies", type="primary")
@@ -132,13 +156,17 @@ if submitted:
         "start_date": start_date.strftime("%Y-%m-%d"),
         "end_date": end_date.strftime("%Y-%m-%d"),
         "sections": sections_to_assign,
-        "priority_order": priority_order_dict
+        "priority_order": priority_order_dict,
+        "minimum_staff": minimum_staff,
+        "monthly_caps": monthly_caps
     }
     
     # Import the shift assignment module
     try:
         from utils.shift_assignment import ShiftAssigner
-        from utils.sections import calendario_2026
+        from utils.sections import generar_calendario_anual
+        from utils.holidays import get_holidays
+        calendario_2026 = generar_calendario_anual(2026, get_holidays().year(2026))
         
         # Load workers from database
         status_text.text("Carregant treballadors de la base de dades...")
@@ -161,7 +189,8 @@ if submitted:
         
         # Create the shift assigner with your workers, sections, and calendar
         st.info("Creant assignador de guàrdies...")
-        assigner = ShiftAssigner(workers, sections_to_assign, priority_order_dict, calendario_2026, st.session_state)
+        assigner = ShiftAssigner(workers, sections_to_assign, priority_order_dict, calendario_2026, st.session_state,
+                                 minimum_staff=minimum_staff, monthly_caps=monthly_caps)
         
         # Extract date range from config
         start_date_str = config["start_date"]
@@ -182,6 +211,21 @@ if submitted:
         status_text.text(f"Assignant guàrdies per a {period_name}...")
         progress_bar.progress(30)
         
+        # Pre-solve feasibility: candidates per section and weekday after the static constraints
+        feasibility_df = assigner.get_feasibility_report(start_date, end_date)
+        infeasible = feasibility_df[feasibility_df['candidates'] == 0]
+        if not infeasible.empty:
+            st.warning(f"{len(infeasible)} combinacions de secció i dia sense cap treballador possible")
+        with st.expander("Informe de viabilitat previ"):
+            st.dataframe(
+                feasibility_df.rename(columns={
+                    'section_name': "Secció", 'weekday': "Dia", 'shifts': "Guàrdies",
+                    'candidates': "Candidats", 'removed_by_constraints': "Exclosos per restriccions de dia"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
         # Perform the assignment
         success = assigner.assign_period_shifts_with_backtracking(start_date, end_date, period_name)
         
@@ -242,7 +286,7 @@ if submitted:
             # Prepare metrics dataframe for display
             metrics_rows = []
             for worker_name, metrics in metrics_dict.items():
-                if worker_name not in ('period_stats', 'total_shifts_assigned', 'unassigned_shifts_count'):
+                if worker_name not in STATS_SUMMARY_KEYS:
                     metrics_rows.append({
                         "Treballador": worker_name,
                         "Total guàrdies": metrics.get('total_shifts', 0),
@@ -254,6 +298,24 @@ if submitted:
             
             metrics_df = pd.DataFrame(metrics_rows)
             st.dataframe(metrics_df)
+
+            # Coverage: required shifts of the period left without a worker
+            st.subheader("Cobertura")
+            uncovered_df = assigner.get_uncovered_report(start_date, end_date)
+            if uncovered_df.empty:
+                st.success("Totes les guàrdies requerides del període tenen treballador assignat.")
+            else:
+                st.warning(f"{len(uncovered_df)} guàrdies requerides sense treballador assignat")
+                reason_counts = uncovered_df['reason'].value_counts().rename_axis("Motiu").reset_index(name="Guàrdies")
+                st.dataframe(reason_counts, use_container_width=True, hide_index=True)
+                st.dataframe(
+                    uncovered_df.rename(columns={
+                        'date': "Data", 'weekday': "Dia", 'is_festivo': "Festiu",
+                        'section_name': "Secció", 'reason': "Motiu"
+                    }),
+                    use_container_width=True,
+                    hide_index=True
+                )
             
         else:
             # Assignment failed
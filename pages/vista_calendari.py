@@ -3,7 +3,6 @@ import datetime
 import calendar
 import pandas as pd
 from navigation import make_sidebar
-from utils.sections import festivos
 from pages.monthly_calendar import show_monthly_calendar
 from pages.monthly_list import show_monthly_list
 from pages.shift_statistics import show_shift_statistics
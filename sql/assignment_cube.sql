@@ -0,0 +1,19 @@
+-- Worker x section x month aggregate of each scenario, written by save_assignment_scenario
+-- and read by the statistics views through get_assignment_cube. Run once in the Supabase SQL editor.
+
+create table if not exists public.assignment_cube (
+    id bigint generated by default as identity primary key,
+    scenario_id bigint not null references public.assignment_scenarios(id) on delete cascade,
+    worker_name text not null,
+    section_name text not null,
+    year integer not null,
+    month integer not null,
+    shifts integer not null default 0,
+    hours real not null default 0,
+    night_shifts integer not null default 0,
+    weekend_shifts integer not null default 0,
+    festivo_shifts integer not null default 0
+);
+
+create index if not exists idx_assignment_cube_scenario
+    on public.assignment_cube (scenario_id, year, month);
@@ -0,0 +1,51 @@
+-- Server-side copy of an assignment scenario, used by SupabaseManager.clone_assignment_scenario
+-- through supabase.rpc("clone_assignment_scenario", ...). Run once in the Supabase SQL editor
+-- (after assignment_cube.sql).
+-- The whole function runs in one transaction: either the clone is complete or nothing is written.
+
+create or replace function public.clone_assignment_scenario(source_id bigint, new_name text)
+returns bigint
+language plpgsql
+as $$
+declare
+    new_id bigint;
+begin
+    insert into assignment_scenarios (name, created_by, year, description, settings, status)
+    select new_name,
+           created_by,
+           year,
+           'Cloned from ' || name || ' (ID: ' || id || ')',
+           settings,
+           'draft'
+    from assignment_scenarios
+    where id = source_id
+    returning id into new_id;
+
+    if new_id is null then
+        raise exception 'Scenario % not found', source_id;
+    end if;
+
+    insert into shift_assignments (scenario_id, date, day_of_week, section_name, worker_name,
+                                   hours, libra, is_festivo, is_weekend, period)
+    select new_id, date, day_of_week, section_name, worker_name,
+           hours, libra, is_festivo, is_weekend, period
+    from shift_assignments
+    where scenario_id = source_id;
+
+    insert into assignment_metrics (scenario_id, worker_name, total_shifts, total_hours,
+                                    night_shifts, weekend_shifts, festivo_shifts, period)
+    select new_id, worker_name, total_shifts, total_hours,
+           night_shifts, weekend_shifts, festivo_shifts, period
+    from assignment_metrics
+    where scenario_id = source_id;
+
+    insert into assignment_cube (scenario_id, worker_name, section_name, year, month,
+                                 shifts, hours, night_shifts, weekend_shifts, festivo_shifts)
+    select new_id, worker_name, section_name, year, month,
+           shifts, hours, night_shifts, weekend_shifts, festivo_shifts
+    from assignment_cube
+    where scenario_id = source_id;
+
+    return new_id;
+end;
+$$;
@@ -0,0 +1,5 @@
+-- Person-specific scheduling rules of each worker (JSON list of pin / exclude / prefer rules,
+-- see utils/scheduling_rules.py). NULL means never set: the legacy defaults for the worker's
+-- name apply. Run once in the Supabase SQL editor.
+
+alter table public."Workers" add column if not exists rules text;
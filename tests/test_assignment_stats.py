@@ -0,0 +1,30 @@
+import pandas as pd
+from utils.assignment_stats import NO_PERIOD, period_metrics_to_dict, period_worker_metrics, worker_metrics
+
+
+def ledger(**columns):
+    rows = {"date": ["2026-03-04", "2026-03-07"], "section_name": ["Urg_G_noche_l", "Urg_G_festivo_mañana"],
+            "worker_name": ["A", "A"], "hours": [17, 12]}
+    rows.update(columns)
+    return pd.DataFrame(rows)
+
+
+def test_every_worker_gets_a_row_in_every_period():
+    metrics = period_worker_metrics(ledger(period=["P1", "P2"]), ["A", "B"])
+
+    assert period_metrics_to_dict(metrics)["P1"]["B"]["total_shifts"] == 0
+    totals = worker_metrics(metrics)
+    assert totals.loc["A", "total_shifts"] == 2
+    assert totals.loc["A", "total_hours"] == 29
+    assert totals.loc["A", "night_shifts"] == 1
+    assert totals.loc["A", "weekend_shifts"] == 1
+
+
+def test_assignments_without_period_count_in_the_totals():
+    with_nulls = worker_metrics(period_worker_metrics(ledger(period=[None, "P1"]), ["A"]))
+    without_column = worker_metrics(period_worker_metrics(ledger().iloc[:1], ["A"]))
+
+    assert with_nulls.loc["A", "total_shifts"] == 2
+    assert without_column.loc["A", "total_shifts"] == 1
+    assert without_column.loc["A", "total_hours"] == 17
+    assert NO_PERIOD in period_metrics_to_dict(period_worker_metrics(ledger(period=[None, None])))
@@ -0,0 +1,27 @@
+import datetime
+from io import BytesIO
+import openpyxl
+import pandas as pd
+from utils.excel_exports import create_calendar_excel
+
+
+def test_calendar_merges_the_date_of_multi_shift_days():
+    df_year = pd.DataFrame({
+        "date": [datetime.date(2026, 3, 4)] * 3 + [datetime.date(2026, 3, 5), datetime.date(2026, 4, 1)],
+        "weekday": ["wednesday"] * 3 + ["thursday", "wednesday"],
+        "shift_name": ["A", "B", "C", "A", "C"],
+        "is_festivo": [False, False, False, True, False],
+    })
+
+    workbook = openpyxl.load_workbook(BytesIO(create_calendar_excel(df_year)))
+    march, april = workbook["March"], workbook["April"]
+
+    assert sorted(str(cells) for cells in march.merged_cells.ranges) == ["A2:A4", "B2:B4"]
+    assert [[cell.value for cell in row] for row in march.iter_rows(min_row=2)] == [
+        ["2026-03-04", "Miércoles", "A"],
+        [None, None, "B"],
+        [None, None, "C"],
+        ["2026-03-05", "Jueves", "A"],
+    ]
+    assert march["A2"].alignment.vertical == "center"
+    assert not april.merged_cells.ranges
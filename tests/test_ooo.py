@@ -0,0 +1,43 @@
+import json
+from datetime import date
+from types import SimpleNamespace
+from utils.ooo import OOOIndex, OOOPeriod, encode_ooo_periods, parse_ooo_periods
+
+
+def test_parse_merges_legacy_days_and_overlapping_ranges():
+    periods = parse_ooo_periods(["02/03/2026", "03/03/2026", "04/03/2026",
+                                 {"start": "10/03/2026", "end": "15/03/2026", "reason": "Vacances"},
+                                 {"start": "14/03/2026", "end": "20/03/2026", "reason": "Congrés"}])
+
+    assert periods == [
+        OOOPeriod(date(2026, 3, 2), date(2026, 3, 4)),
+        OOOPeriod(date(2026, 3, 10), date(2026, 3, 20), "Vacances / Congrés"),
+    ]
+
+
+def test_parse_reads_stored_json_and_skips_invalid_entries():
+    stored = json.dumps([{"start": "2026-05-01", "end": "2026-05-03"}, "not a date"])
+
+    assert parse_ooo_periods(stored) == [OOOPeriod(date(2026, 5, 1), date(2026, 5, 3))]
+
+
+def test_encode_round_trip():
+    periods = [OOOPeriod(date(2026, 1, 5), date(2026, 1, 9), "Vacances"), OOOPeriod(date(2026, 2, 2), date(2026, 2, 2))]
+
+    assert parse_ooo_periods(encode_ooo_periods(periods)) == periods
+
+
+def test_index_lookups():
+    index = OOOIndex([
+        SimpleNamespace(name="A", ooo_days=[{"start": "05/01/2026", "end": "09/01/2026"}]),
+        SimpleNamespace(name="B", ooo_days=["08/01/2026", "20/01/2026"]),
+        SimpleNamespace(name="C", ooo_days=[]),
+    ])
+
+    assert index.is_unavailable("A", date(2026, 1, 9))
+    assert not index.is_unavailable("A", date(2026, 1, 10))
+    assert not index.is_unavailable("C", date(2026, 1, 8))
+    assert index.unavailable_workers(date(2026, 1, 8), date(2026, 1, 8)) == ["A", "B"]
+    assert index.unavailable_workers(date(2026, 1, 10), date(2026, 1, 19)) == []
+    assert index.unavailable_counts(date(2026, 1, 7), 3).tolist() == [1, 2, 1]
+    assert index.unavailable_counts(date(2026, 1, 7), 3, ["B"]).tolist() == [0, 1, 0]
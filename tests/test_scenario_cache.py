@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+from utils.scenario_cache import ScenarioParquetCache
+
+pytest.importorskip("pyarrow")
+
+
+def assignments(worker_name):
+    return pd.DataFrame({
+        "date": pd.to_datetime(["2026-01-15", "2026-02-10", "2026-03-05"]),
+        "section_name": ["Urg_G_noche_l"] * 3,
+        "worker_name": [worker_name] * 3,
+    })
+
+
+class CountingLoader:
+    def __init__(self, worker_name):
+        self.worker_name = worker_name
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return assignments(self.worker_name)
+
+
+def test_draft_is_reloaded_when_its_stamp_changes(tmp_path):
+    cache = ScenarioParquetCache(str(tmp_path))
+    scenario = {"id": 1, "status": "draft", "updated_at": "2026-01-01T10:00:00"}
+    loader = CountingLoader("A")
+
+    cache.load(scenario, loader)
+    cache.load(scenario, loader)
+    assert loader.calls == 1
+
+    loader.worker_name = "B"
+    df = cache.load({**scenario, "updated_at": "2026-01-02T10:00:00"}, loader)
+    assert loader.calls == 2
+    assert set(df["worker_name"]) == {"B"}
+
+
+def test_published_file_is_trusted_and_read_by_date(tmp_path):
+    cache = ScenarioParquetCache(str(tmp_path))
+    scenario = {"id": 2, "status": "published", "created_at": "2026-01-01"}
+    loader = CountingLoader("A")
+
+    cache.load(scenario, loader)
+    df = cache.load({**scenario, "created_at": "2026-06-01"}, loader, start_date="2026-02-01",
+                    end_date="2026-02-28", columns=["date", "worker_name"])
+
+    assert loader.calls == 1
+    assert list(df.columns) == ["date", "worker_name"]
+    assert df["date"].tolist() == [pd.Timestamp("2026-02-10")]
+
+
+def test_invalidate_forces_a_reload(tmp_path):
+    cache = ScenarioParquetCache(str(tmp_path))
+    scenario = {"id": 3, "status": "published"}
+    loader = CountingLoader("A")
+
+    cache.load(scenario, loader)
+    cache.invalidate(3)
+    cache.load(scenario, loader)
+
+    assert loader.calls == 2
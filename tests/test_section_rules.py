@@ -0,0 +1,49 @@
+import datetime
+import numpy as np
+from utils.section_rules import HEMS_WEEK_PATTERN, DatePattern, decode_section_fechas, encode_section_fechas
+
+
+def test_nth_weekday_with_bounds_and_exceptions():
+    pattern = DatePattern(nth_weekday=[[1, "friday"], [-1, "monday"]], start="2026-01-01", end="2026-03-31",
+                          include=["2026-04-10"], exclude=["2026-02-06"])
+
+    assert pattern.dates_in_year(2026) == [
+        datetime.date(2026, 1, 2), datetime.date(2026, 1, 26),
+        datetime.date(2026, 2, 23),
+        datetime.date(2026, 3, 6), datetime.date(2026, 3, 30),
+        datetime.date(2026, 4, 10),
+    ]
+
+
+def test_week_parity_switches_at_each_cutover():
+    # Even weeks (20 starts on 11/05) until 25/05 (week 22), odd weeks (23 starts on 01/06) afterwards
+    assert datetime.date(2026, 5, 11) in HEMS_WEEK_PATTERN
+    assert datetime.date(2026, 5, 18) not in HEMS_WEEK_PATTERN
+    assert datetime.date(2026, 5, 25) not in HEMS_WEEK_PATTERN
+    assert datetime.date(2026, 6, 1) in HEMS_WEEK_PATTERN
+
+
+def test_mask_matches_membership_across_years():
+    pattern = DatePattern(nth_weekday=[[2, "tuesday"]])
+    dates = np.arange(np.datetime64("2025-12-01"), np.datetime64("2026-02-01"), dtype="datetime64[D]")
+
+    expected = [day.astype(datetime.date) in pattern for day in dates]
+    assert pattern.mask(dates).tolist() == expected
+    assert sum(expected) == 2
+
+
+def test_legacy_date_list_round_trip():
+    pattern = DatePattern.from_value("2026-03-04, 2026-03-05, 2026-03-09")
+
+    assert pattern.to_dict() == {"include": ["2026-03-04/2026-03-05", "2026-03-09"]}
+    assert DatePattern.from_value(decode_section_fechas(encode_section_fechas(pattern))) == pattern
+    assert DatePattern.from_value("") is None
+
+
+def test_with_dates_excluding_every_explicit_date_matches_nothing():
+    pattern = DatePattern.from_value(["2026-03-04", "2026-03-05"])
+
+    emptied = pattern.with_dates(exclude=["2026-03-04", "2026-03-05"])
+
+    assert emptied.dates_in_year(2026) == []
+    assert emptied.with_dates(include=["2026-03-05"]).dates_in_year(2026) == [datetime.date(2026, 3, 5)]
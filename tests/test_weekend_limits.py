@@ -0,0 +1,101 @@
+import datetime
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from utils.weekend_assignment import WeekendBlock, block_months, solve_capped_weekend_roles, solve_weekend_roles
+from utils.workload_limits import WorkloadCounters
+
+SECTION_AREAS = {"Urg_G_festivo_mañana": "Guardia_Urg", "Urg_G_festivo_noche": "Guardia_Urg"}
+MORNING = SimpleNamespace(nombre="Urg_G_festivo_mañana", horas_turno=12, libra=False)
+NIGHT = SimpleNamespace(nombre="Urg_G_festivo_noche", horas_turno=12, libra=False)
+
+
+def weekend_block(friday):
+    """Role 1 block of a weekend: Saturday morning and Sunday night (two festivo shifts)"""
+    saturday = friday + datetime.timedelta(days=1)
+    return WeekendBlock(friday, 1, ((saturday, MORNING), (saturday + datetime.timedelta(days=1), NIGHT)))
+
+
+def make_workload(names, festivo_cap=4, guard_hours=499):
+    workers = [SimpleNamespace(name=name, available_guard_hours=guard_hours) for name in names]
+    return WorkloadCounters(workers, pd.DataFrame(), SECTION_AREAS, [],
+                            monthly_caps={"Guardia_Urg": {"festivo": festivo_cap}})
+
+
+def fridays(*days):
+    return [datetime.date(2026, month, day) for month, day in days]
+
+
+def test_block_limits_bound_one_month():
+    blocks = [weekend_block(friday) for friday in fridays((1, 9), (1, 16), (1, 23))]
+    allowed, max_blocks = make_workload(["A"]).block_limits(blocks, ["A"])
+
+    assert allowed.all()
+    assert max_blocks.tolist() == [2]
+
+
+def test_block_months_follow_the_first_weekend():
+    blocks = [weekend_block(friday) for friday in fridays((1, 30), (2, 6), (3, 6))]
+
+    assert block_months(blocks) == [(2026, 1), (2026, 2), (2026, 3)]
+
+
+def test_capped_solve_applies_the_caps_per_month():
+    # Two weekends a month for three months: the festivo cap (4) allows both every month
+    blocks = [weekend_block(friday) for friday in fridays((1, 9), (1, 16), (2, 6), (2, 13), (3, 6), (3, 13))]
+    candidates = np.ones((len(blocks), 1), dtype=bool)
+    costs = np.zeros((len(blocks), 1), dtype="int64")
+    workload = make_workload(["A"])
+
+    assert solve_capped_weekend_roles(blocks, candidates, costs, workload, ["A"]) == [0] * len(blocks)
+    # The tentative counts are undone
+    assert workload.monthly_count("A", MORNING.nombre, datetime.date(2026, 1, 10)) == 0
+
+
+def test_capped_solve_leaves_blocks_over_the_cap_uncovered():
+    blocks = [weekend_block(friday) for friday in fridays((1, 9), (1, 16), (1, 23), (2, 6))]
+    candidates = np.ones((len(blocks), 1), dtype=bool)
+    costs = np.zeros((len(blocks), 1), dtype="int64")
+
+    solution = solve_capped_weekend_roles(blocks, candidates, costs, make_workload(["A"]), ["A"])
+
+    assert solution.count(None) == 1
+    assert solution[3] == 0
+
+
+def test_capped_solve_carries_guard_hours_across_months():
+    # 72 hours cover three blocks of 24 hours, whatever their month
+    blocks = [weekend_block(friday) for friday in fridays((1, 9), (2, 6), (3, 6), (3, 13))]
+    candidates = np.ones((len(blocks), 1), dtype=bool)
+    costs = np.zeros((len(blocks), 1), dtype="int64")
+
+    solution = solve_capped_weekend_roles(blocks, candidates, costs, make_workload(["A"], guard_hours=72), ["A"])
+
+    assert solution.count(0) == 3
+
+
+def test_solve_weekend_roles_spreads_blocks():
+    blocks = [weekend_block(friday) for friday in fridays((1, 9), (1, 16))]
+    candidates = np.ones((2, 2), dtype=bool)
+    costs = np.zeros((2, 2), dtype="int64")
+
+    assert sorted(solve_weekend_roles(blocks, candidates, costs)) == [0, 1]
+
+
+def test_workload_undo_restores_counts_and_hours():
+    ledger = pd.DataFrame({"date": ["2026-01-10"], "section_name": [MORNING.nombre], "worker_name": ["A"],
+                           "hours": [12]})
+    workers = [SimpleNamespace(name="A", available_guard_hours=100)]
+    workload = WorkloadCounters(workers, ledger, SECTION_AREAS, [], monthly_caps={"Guardia_Urg": {"festivo": 2}})
+    saturday, sunday = datetime.date(2026, 1, 17), datetime.date(2026, 1, 18)
+
+    checkpoint = workload.checkpoint()
+    workload.add("A", NIGHT, saturday)
+    assert workload.monthly_count("A", NIGHT.nombre, saturday) == 2
+    assert not workload.allows("A", MORNING, sunday)
+    assert workload.remaining_hours("A", 2026) == 76
+
+    workload.undo(checkpoint)
+    assert workload.monthly_count("A", NIGHT.nombre, saturday) == 1
+    assert workload.allows("A", MORNING, sunday)
+    assert workload.remaining_hours("A", 2026) == 88
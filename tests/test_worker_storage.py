@@ -0,0 +1,108 @@
+import datetime
+import json
+from types import SimpleNamespace
+import pytest
+from utils.db import SupabaseManager
+from utils.ooo import OOOPeriod
+from utils.sqlite_db import SQLiteManager
+from utils.worker import Worker
+
+
+def make_worker(**overrides):
+    fields = dict(
+        name="Anna Puig", initials="AP", birth_year=1985, category="Adjunt",
+        areas=["Guardia_Urg", "HEMS"], days_assigned={"Guardia_Urg": ["monday"]},
+        avoid_days=["friday"], section_day_constraints={"HEMS_tarde": ["tuesday"]},
+        ooo_days=[{"start": "03/08/2026", "end": "14/08/2026", "reason": "Vacances"}, "24/12/2026"],
+        rules=[{"type": "exclude", "section": "HEMS_tarde"}],
+    )
+    fields.update(overrides)
+    return Worker(**fields)
+
+
+class FakeTable:
+    """In-memory stand-in for a Supabase table builder, storing rows as JSON like the API"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.payload = None
+        self.name = None
+
+    def select(self, *_):
+        return self
+
+    def insert(self, payload):
+        self.payload = ("insert", payload)
+        return self
+
+    def update(self, payload):
+        self.payload = ("update", payload)
+        return self
+
+    def eq(self, column, value):
+        self.name = value
+        return self
+
+    def execute(self):
+        if self.payload is None:
+            data = [dict(self.rows[self.name])] if self.name in self.rows else []
+            return SimpleNamespace(data=data)
+        action, payload = self.payload
+        # Fails like the client does on values that are not JSON serializable
+        row = json.loads(json.dumps(payload))
+        if action == "insert":
+            self.rows[row["name"]] = row
+        else:
+            self.rows[self.name].update(row)
+        return SimpleNamespace(data=[dict(self.rows[row.get("name", self.name)])])
+
+
+@pytest.fixture
+def supabase_manager():
+    manager = SupabaseManager.__new__(SupabaseManager)
+    rows = {}
+    manager.supabase = SimpleNamespace(table=lambda name: FakeTable(rows))
+    return manager
+
+
+@pytest.fixture
+def sqlite_manager():
+    return SQLiteManager(":memory:")
+
+
+def test_to_row_encodes_ooo_periods_through_the_property():
+    row = make_worker().to_row()
+
+    assert row["ooo_days"] == [
+        {"start": "03/08/2026", "end": "14/08/2026", "reason": "Vacances"},
+        {"start": "24/12/2026", "end": "24/12/2026"},
+    ]
+    assert not any(key.startswith("_") for key in row)
+
+
+@pytest.mark.parametrize("manager_name", ["sqlite_manager", "supabase_manager"])
+def test_create_worker_round_trip(manager_name, request):
+    manager = request.getfixturevalue(manager_name)
+    worker = make_worker()
+
+    manager.create_worker(worker)
+    stored = manager.get_worker(worker.name)
+
+    assert stored.ooo_days == worker.ooo_days
+    assert stored.is_out_of_office(datetime.date(2026, 8, 10))
+    assert stored.rules == worker.rules
+
+
+@pytest.mark.parametrize("manager_name", ["sqlite_manager", "supabase_manager"])
+def test_update_worker_keeps_new_ooo_periods(manager_name, request):
+    manager = request.getfixturevalue(manager_name)
+    manager.create_worker(make_worker(ooo_days=[]))
+
+    worker = manager.get_worker("Anna Puig")
+    worker.ooo_days = [OOOPeriod(datetime.date(2026, 2, 2), datetime.date(2026, 2, 6), "Congrés")]
+    manager.update_worker(worker)
+    stored = manager.get_worker("Anna Puig")
+
+    assert stored.ooo_days == worker.ooo_days
+    assert stored.is_out_of_office(datetime.date(2026, 2, 4))
+    assert not stored.is_out_of_office(datetime.date(2026, 2, 9))
@@ -0,0 +1,164 @@
+import logging
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Dimensions and measures of the per-scenario aggregate cube
+CUBE_DIMENSIONS = ['worker_name', 'section_name', 'year', 'month']
+CUBE_MEASURES = ['shifts', 'hours', 'night_shifts', 'weekend_shifts', 'festivo_shifts']
+CUBE_COLUMNS = CUBE_DIMENSIONS + CUBE_MEASURES
+
+# Columns of shift_assignments needed to build the cube
+CUBE_SOURCE_COLUMNS = ['date', 'section_name', 'worker_name', 'hours', 'is_festivo', 'is_weekend']
+
+
+def empty_cube() -> pd.DataFrame:
+    """Build an empty cube with the typed columns"""
+    return pd.DataFrame({
+        'worker_name': pd.Series(dtype='object'),
+        'section_name': pd.Series(dtype='object'),
+        'year': pd.Series(dtype='int64'),
+        'month': pd.Series(dtype='int64'),
+        'shifts': pd.Series(dtype='int64'),
+        'hours': pd.Series(dtype='float64'),
+        'night_shifts': pd.Series(dtype='int64'),
+        'weekend_shifts': pd.Series(dtype='int64'),
+        'festivo_shifts': pd.Series(dtype='int64'),
+    })
+
+
+def is_night_section(section_names: pd.Series) -> pd.Series:
+    """Vectorized version of ShiftAssigner.is_night_shift_by_name"""
+    lowered = section_names.astype(str).str.lower()
+    return lowered.str.contains('noche', regex=False) | lowered.str.contains('nocturno', regex=False)
+
+
+def build_assignment_cube(assignments_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate the assignments of a scenario into a worker x section x month cube
+
+    Each cell holds the number of shifts, the hours and the night, weekend and
+    festivo shift counts. Everything is computed with one groupby over flag columns.
+
+    Args:
+        assignments_df: DataFrame of shift assignments (date, section_name, worker_name, hours, flags)
+
+    Returns:
+        DataFrame with CUBE_COLUMNS, one row per non-empty cell
+    """
+    if assignments_df is None or assignments_df.empty:
+        return empty_cube()
+
+    df = assignments_df[assignments_df['worker_name'].notna()]
+    if df.empty:
+        return empty_cube()
+    dates = pd.to_datetime(df['date'])
+    weekend = dates.dt.weekday >= 5
+    if 'is_weekend' in df.columns:
+        weekend = weekend | df['is_weekend'].fillna(False).astype(bool)
+    festivo = df['is_festivo'].fillna(False).astype(bool) if 'is_festivo' in df.columns else False
+
+    flat = pd.DataFrame({
+        'worker_name': df['worker_name'].astype(str).to_numpy(),
+        'section_name': df['section_name'].astype(str).to_numpy(),
+        'year': dates.dt.year.to_numpy(),
+        'month': dates.dt.month.to_numpy(),
+        'shifts': 1,
+        'hours': pd.to_numeric(df['hours'], errors='coerce').fillna(0).to_numpy(),
+        'night_shifts': is_night_section(df['section_name']).astype(int).to_numpy(),
+        'weekend_shifts': pd.Series(weekend).astype(int).to_numpy(),
+        'festivo_shifts': pd.Series(festivo, index=df.index).astype(int).to_numpy(),
+    })
+    cube = flat.groupby(CUBE_DIMENSIONS, sort=True, as_index=False)[CUBE_MEASURES].sum()
+    return cube.astype({'year': 'int64', 'month': 'int64', 'shifts': 'int64', 'hours': 'float64',
+                        'night_shifts': 'int64', 'weekend_shifts': 'int64', 'festivo_shifts': 'int64'})
+
+
+def encode_cube_columns(cube: pd.DataFrame, scenario_id: int) -> Dict[str, list]:
+    """
+    Build the insert payload of a cube as one list of native values per column
+
+    Args:
+        cube: DataFrame produced by build_assignment_cube
+        scenario_id: ID of the scenario the cube belongs to
+
+    Returns:
+        Dictionary mapping scenario_id and each of CUBE_COLUMNS to a list of values
+    """
+    payload = {'scenario_id': [int(scenario_id)] * len(cube)}
+    for column in CUBE_COLUMNS:
+        payload[column] = cube[column].tolist()
+    return payload
+
+
+def decode_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast a cube read from the database to the cube dtypes, dropping storage columns"""
+    if df is None or df.empty:
+        return empty_cube()
+    cube = df[[column for column in CUBE_COLUMNS if column in df.columns]].copy()
+    return cube.astype({'year': 'int64', 'month': 'int64', 'shifts': 'int64', 'hours': 'float64',
+                        'night_shifts': 'int64', 'weekend_shifts': 'int64', 'festivo_shifts': 'int64'})
+
+
+def months_in_range(start_month: int, end_month: int) -> List[int]:
+    """Months between start and end (inclusive), wrapping across the year boundary"""
+    if start_month <= end_month:
+        return list(range(start_month, end_month + 1))
+    return list(range(start_month, 13)) + list(range(1, end_month + 1))
+
+
+def slice_cube(cube: pd.DataFrame, months: Optional[Iterable[int]] = None, year: Optional[int] = None,
+               workers: Optional[Iterable[str]] = None, sections: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Select the cells of a cube matching the given months, year, workers and sections
+
+    Args:
+        cube: Scenario cube
+        months: Optional month numbers (1-12)
+        year: Optional year
+        workers: Optional worker names
+        sections: Optional section names
+
+    Returns:
+        DataFrame with the selected cells
+    """
+    mask = pd.Series(True, index=cube.index)
+    if months is not None:
+        mask &= cube['month'].isin(list(months))
+    if year is not None:
+        mask &= cube['year'] == year
+    if workers is not None:
+        mask &= cube['worker_name'].isin(list(workers))
+    if sections is not None:
+        mask &= cube['section_name'].isin(list(sections))
+    return cube[mask]
+
+
+def worker_section_totals(cube_slice: pd.DataFrame, measure: str = 'shifts') -> pd.DataFrame:
+    """
+    Roll a cube slice up to one row per (worker, section)
+
+    Args:
+        cube_slice: Cells returned by slice_cube
+        measure: Measure to sum
+
+    Returns:
+        DataFrame with worker_name, section_name and the summed measure
+    """
+    return cube_slice.groupby(['worker_name', 'section_name'], as_index=False)[measure].sum()
+
+
+def worker_section_pivot(cube_slice: pd.DataFrame, measure: str = 'shifts') -> pd.DataFrame:
+    """
+    Pivot a cube slice into a worker x section table of the given measure
+
+    Args:
+        cube_slice: Cells returned by slice_cube
+        measure: Measure to show
+
+    Returns:
+        DataFrame indexed by worker with one column per section
+    """
+    return cube_slice.pivot_table(index='worker_name', columns='section_name', values=measure,
+                                  aggfunc='sum', fill_value=0)
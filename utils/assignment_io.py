@@ -0,0 +1,190 @@
+import logging
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Columns written for every shift assignment (the id is generated by the database)
+ASSIGNMENT_COLUMNS = ['scenario_id', 'date', 'day_of_week', 'section_name', 'worker_name',
+                      'hours', 'libra', 'is_festivo', 'is_weekend', 'period']
+
+METRIC_COLUMNS = ['scenario_id', 'worker_name', 'total_shifts', 'total_hours',
+                  'night_shifts', 'weekend_shifts', 'festivo_shifts', 'period']
+
+# Column types of the shift_assignments table once loaded into pandas
+ASSIGNMENT_DTYPES = {
+    'id': 'int64',
+    'scenario_id': 'int64',
+    'date': 'datetime64[ns]',
+    'day_of_week': 'object',
+    'section_name': 'object',
+    'worker_name': 'object',
+    'hours': 'float64',
+    'libra': 'bool',
+    'is_festivo': 'bool',
+    'is_weekend': 'bool',
+    'period': 'object',
+}
+
+BOOL_ASSIGNMENT_COLUMNS = ('libra', 'is_festivo', 'is_weekend')
+
+# Keys of the ShiftAssigner stats/metrics dictionaries that aren't worker names
+STATS_SUMMARY_KEYS = ('period_stats', 'total_shifts_assigned', 'unassigned_shifts_count', 'uncovered_shifts')
+
+
+def _cast_column(values, dtype: str) -> pd.Series:
+    """Convert a raw column (list or Series) to the given assignment dtype"""
+    if dtype == 'datetime64[ns]':
+        return pd.to_datetime(pd.Series(values, dtype='object'))
+    if dtype == 'bool':
+        return pd.Series(values, dtype='object').fillna(False).astype(bool)
+    if dtype == 'float64':
+        return pd.to_numeric(pd.Series(values, dtype='object'), errors='coerce').astype('float64')
+    if dtype == 'int64':
+        return pd.to_numeric(pd.Series(values, dtype='object')).astype('int64')
+    return pd.Series(values, dtype='object')
+
+
+def empty_assignments_frame(columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Build an empty assignments DataFrame with the typed columns
+
+    Args:
+        columns: Columns to include, all known columns if None
+
+    Returns:
+        Empty DataFrame with the right dtypes
+    """
+    columns = list(columns) if columns else list(ASSIGNMENT_DTYPES)
+    return pd.DataFrame({
+        column: pd.Series(dtype=ASSIGNMENT_DTYPES.get(column, 'object')) for column in columns
+    })
+
+
+def decode_assignment_rows(rows: List[Dict], columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Decode a page of raw assignment rows straight into typed column arrays
+
+    The rows are transposed once into per-column lists and each column is cast
+    with a single vectorized conversion, instead of letting pandas infer types
+    cell by cell and fixing them afterwards.
+
+    Args:
+        rows: List of row dictionaries as returned by the database
+        columns: Columns to keep, every column present in the rows if None
+
+    Returns:
+        DataFrame with one typed column per requested column
+    """
+    if not rows:
+        return empty_assignments_frame(columns)
+    columns = list(columns) if columns else list(rows[0].keys())
+    data = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        data[column] = _cast_column(values, ASSIGNMENT_DTYPES.get(column, 'object'))
+    return pd.DataFrame(data)
+
+
+def cast_assignment_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the known columns of an assignments DataFrame to their dtypes in place
+
+    Args:
+        df: DataFrame read from the database (e.g. with SQLite 0/1 booleans)
+
+    Returns:
+        The same DataFrame with typed columns
+    """
+    for column in df.columns:
+        dtype = ASSIGNMENT_DTYPES.get(column)
+        if dtype and str(df[column].dtype) != dtype:
+            df[column] = _cast_column(df[column].tolist(), dtype)
+    return df
+
+
+def concat_assignment_pages(pages: Iterable[pd.DataFrame], columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Materialize a stream of assignment pages into a single DataFrame
+
+    Args:
+        pages: Iterable of typed DataFrames (e.g. from iter_assignments)
+        columns: Columns of the result when the stream is empty
+
+    Returns:
+        DataFrame with every row, empty (but typed) if there were none
+    """
+    pages = [page for page in pages if not page.empty]
+    if not pages:
+        return empty_assignments_frame(columns)
+    if len(pages) == 1:
+        return pages[0].reset_index(drop=True)
+    return pd.concat(pages, ignore_index=True)
+
+
+def encode_assignment_columns(assignments_df: pd.DataFrame, scenario_id: int) -> Dict[str, list]:
+    """
+    Build the insert payload of a scenario as one list of native values per column
+
+    Every column is converted with a single vectorized operation (dates formatted,
+    flags defaulted to False, missing periods turned into None), so no per-row
+    Python work is done before the rows are zipped together.
+
+    Args:
+        assignments_df: DataFrame of shift assignments as produced by ShiftAssigner
+        scenario_id: ID of the scenario the rows belong to
+
+    Returns:
+        Dictionary mapping each of ASSIGNMENT_COLUMNS to a list of values
+    """
+    n = len(assignments_df)
+
+    def column(name, default=None):
+        if name in assignments_df.columns:
+            return assignments_df[name]
+        return pd.Series([default] * n, index=assignments_df.index, dtype='object')
+
+    dates = pd.to_datetime(column('date')).dt.strftime('%Y-%m-%d')
+    period = column('period')
+    return {
+        'scenario_id': [int(scenario_id)] * n,
+        'date': dates.tolist(),
+        'day_of_week': column('day_of_week').tolist(),
+        'section_name': column('section_name').tolist(),
+        'worker_name': column('worker_name').tolist(),
+        'hours': pd.to_numeric(column('hours'), errors='coerce').astype('float64').tolist(),
+        'libra': column('libra', False).fillna(False).astype(bool).tolist(),
+        'is_festivo': column('is_festivo', False).fillna(False).astype(bool).tolist(),
+        'is_weekend': column('is_weekend', False).fillna(False).astype(bool).tolist(),
+        'period': period.astype('object').where(period.notna(), None).tolist(),
+    }
+
+
+def columns_to_records(columns: Dict[str, list]) -> List[Dict]:
+    """Zip a column payload into row dictionaries (the JSON shape PostgREST expects)"""
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def columns_to_tuples(columns: Dict[str, list], names: List[str]) -> List[tuple]:
+    """Zip a column payload into row tuples ordered as names (for executemany)"""
+    return list(zip(*(columns[name] for name in names)))
+
+
+def encode_metric_columns(metrics_dict: Dict, scenario_id: int) -> Dict[str, list]:
+    """
+    Build the insert payload of the per-worker metrics of a scenario
+
+    Args:
+        metrics_dict: Dictionary of worker metrics (summary keys are skipped)
+        scenario_id: ID of the scenario the rows belong to
+
+    Returns:
+        Dictionary mapping each of METRIC_COLUMNS to a list of values
+    """
+    workers = [name for name in metrics_dict if name not in STATS_SUMMARY_KEYS]
+    payload = {'scenario_id': [int(scenario_id)] * len(workers), 'worker_name': workers}
+    for key in ('total_shifts', 'total_hours', 'night_shifts', 'weekend_shifts', 'festivo_shifts'):
+        payload[key] = [metrics_dict[name].get(key, 0) for name in workers]
+    payload['period'] = [None] * len(workers)  # For overall metrics
+    return payload
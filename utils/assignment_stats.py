@@ -0,0 +1,136 @@
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional
+from utils.assignment_cube import is_night_section
+
+logger = logging.getLogger(__name__)
+
+# Per-worker metrics tracked by the assigner, in display order
+METRIC_KEYS = ['total_shifts', 'total_hours', 'night_shifts', 'weekend_shifts', 'festivo_shifts']
+
+# Column names of the statistics CSV exports
+METRIC_LABELS = {
+    'total_shifts': 'Total Shifts',
+    'total_hours': 'Total Hours',
+    'night_shifts': 'Night Shifts',
+    'weekend_shifts': 'Weekend Shifts',
+    'festivo_shifts': 'Festivo Shifts',
+}
+
+# Period of assignments stored without one (historical rows), so they still count in the totals
+NO_PERIOD = ""
+
+
+def _categorical(values: pd.Series, categories: Optional[Iterable] = None) -> pd.Categorical:
+    """Categorical of the values, keeping the given categories (or the order of appearance)"""
+    values = values.astype(object)
+    if categories is None:
+        categories = pd.unique(values.dropna())
+    else:
+        categories = list(dict.fromkeys(list(categories) + list(pd.unique(values.dropna()))))
+    return pd.Categorical(values, categories=categories)
+
+
+def assignment_metric_frame(assignments_df: pd.DataFrame, worker_names: Optional[Iterable[str]] = None,
+                            festivos_list: Optional[Iterable] = None) -> pd.DataFrame:
+    """
+    One row per assignment with the metric contributions as numeric columns
+
+    Args:
+        assignments_df: Assignments (date, section_name, worker_name, hours, flags, period)
+        worker_names: Workers to report even without assignments
+        festivos_list: Holidays, used when the frame has no is_festivo column
+
+    Returns:
+        DataFrame with categorical period and worker_name columns and one column per METRIC_KEYS
+    """
+    dates = pd.to_datetime(assignments_df['date'])
+    if 'is_weekend' in assignments_df.columns:
+        weekend = assignments_df['is_weekend'].fillna(False).astype(bool)
+    else:
+        weekend = dates.dt.weekday >= 5
+    if 'is_festivo' in assignments_df.columns:
+        festivo = assignments_df['is_festivo'].fillna(False).astype(bool)
+    else:
+        festivo = dates.dt.normalize().isin(pd.to_datetime(list(festivos_list or [])))
+    if 'period' in assignments_df.columns:
+        period = assignments_df['period'].astype(object).where(assignments_df['period'].notna(), NO_PERIOD)
+    else:
+        period = pd.Series(NO_PERIOD, index=assignments_df.index, dtype=object)
+
+    return pd.DataFrame({
+        'period': _categorical(period),
+        'worker_name': _categorical(assignments_df['worker_name'], worker_names),
+        'total_shifts': np.ones(len(assignments_df), dtype='int64'),
+        'total_hours': pd.to_numeric(assignments_df['hours'], errors='coerce').fillna(0).astype('float64').to_numpy(),
+        'night_shifts': is_night_section(assignments_df['section_name']).astype('int64').to_numpy(),
+        'weekend_shifts': weekend.astype('int64').to_numpy(),
+        'festivo_shifts': festivo.astype('int64').to_numpy(),
+    })
+
+
+def period_worker_metrics(assignments_df: pd.DataFrame, worker_names: Optional[Iterable[str]] = None,
+                          festivos_list: Optional[Iterable] = None) -> pd.DataFrame:
+    """
+    Metrics per (period, worker) from a single groupby over categorical columns
+
+    Every listed worker gets a row in every period, with zeros when they have
+    no assignment there.
+
+    Args:
+        assignments_df: Assignments ledger
+        worker_names: Workers to report even without assignments
+        festivos_list: Holidays, used when the frame has no is_festivo column
+
+    Returns:
+        DataFrame indexed by (period, worker_name) with METRIC_KEYS columns
+    """
+    if assignments_df is None or assignments_df.empty:
+        index = pd.MultiIndex.from_arrays([[], []], names=['period', 'worker_name'])
+        return pd.DataFrame({key: pd.Series(dtype='float64' if key == 'total_hours' else 'int64', index=index)
+                             for key in METRIC_KEYS})
+    frame = assignment_metric_frame(assignments_df, worker_names, festivos_list)
+    return frame.groupby(['period', 'worker_name'], observed=False, sort=True)[METRIC_KEYS].sum()
+
+
+def worker_metrics(period_metrics: pd.DataFrame) -> pd.DataFrame:
+    """Roll (period, worker) metrics up to one row per worker"""
+    return period_metrics.groupby(level='worker_name', observed=False, sort=True)[METRIC_KEYS].sum()
+
+
+def metrics_to_dict(frame: pd.DataFrame) -> Dict[str, Dict]:
+    """Convert a worker-indexed metrics frame to {worker: {metric: value}} with native types"""
+    return {
+        str(worker): {key: (float(row[key]) if key == 'total_hours' else int(row[key])) for key in METRIC_KEYS}
+        for worker, row in zip(frame.index, frame[METRIC_KEYS].to_dict('records'))
+    }
+
+
+def period_metrics_to_dict(period_metrics: pd.DataFrame) -> Dict[str, Dict[str, Dict]]:
+    """Convert (period, worker) metrics to {period: {worker: {metric: value}}}"""
+    result = {}
+    for period, frame in period_metrics.groupby(level='period', observed=True, sort=False):
+        result[period] = metrics_to_dict(frame.droplevel('period'))
+    return result
+
+
+def metrics_table(frame: pd.DataFrame, only_active: bool = False) -> pd.DataFrame:
+    """
+    Flatten a metrics frame into the columns of the statistics CSVs
+
+    Args:
+        frame: Frame indexed by worker_name or (period, worker_name)
+        only_active: Drop rows without shifts
+
+    Returns:
+        DataFrame with Period (when present), Worker and the METRIC_LABELS columns
+    """
+    table = frame[METRIC_KEYS]
+    if only_active:
+        table = table[table['total_shifts'] > 0]
+    table = table.reset_index().rename(columns={'period': 'Period', 'worker_name': 'Worker', **METRIC_LABELS})
+    for column in ('Period', 'Worker'):
+        if column in table.columns:
+            table[column] = table[column].astype(object)
+    return table
@@ -0,0 +1,275 @@
+import copy
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import pandas as pd
+from utils.worker import Worker
+from utils.sections import Section
+from utils.scenario_cache import ScenarioParquetCache
+from utils.holidays import invalidate_holidays
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 300  # seconds
+
+
+class TTLCache:
+    """
+    Small thread-safe key/value cache where every entry expires after a fixed TTL
+    """
+
+    def __init__(self, ttl: float = DEFAULT_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, tuple] = {}
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, calling loader on a miss or an expired entry
+
+        The lock is held while loading so concurrent sessions don't stampede the database.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            value = loader()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Drop the given keys from the cache"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every key matching the predicate"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedDBManager:
+    """
+    Process-wide caching wrapper around a database manager (SupabaseManager or SQLiteManager).
+
+    Workers, sections, festivos and the scenario list are served from a TTL cache.
+    Every create_*/update_*/delete_* call goes to the database first and then
+    invalidates only the keys it affects. Any other method is forwarded untouched.
+    Callers get copies, so mutating a returned object never corrupts the cache.
+    Scenario assignments are served from an optional on-disk Parquet cache and
+    scenario aggregate cubes are kept in memory.
+    """
+
+    WORKERS = "workers"
+    SECTIONS = "sections"
+    SCENARIOS = "scenarios"
+    FESTIVOS = "festivos"
+    CUBE = "cube"
+
+    def __init__(self, manager, ttl: float = DEFAULT_CACHE_TTL,
+                 scenario_cache: Optional[ScenarioParquetCache] = None):
+        self._manager = manager
+        self._cache = TTLCache(ttl)
+        self._scenario_cache = scenario_cache
+
+    def __getattr__(self, name):
+        # Only called for attributes not defined here: forward to the wrapped manager
+        return getattr(self._manager, name)
+
+    @property
+    def manager(self):
+        """The wrapped database manager"""
+        return self._manager
+
+    def clear_cache(self) -> None:
+        """Drop every cached entry (e.g. after editing the database by hand)"""
+        self._cache.clear()
+
+    # ========== WORKER OPERATIONS ==========
+
+    def get_workers(self) -> List[Worker]:
+        """Retrieve all workers, served from the cache when warm"""
+        return copy.deepcopy(self._cache.get(self.WORKERS, self._manager.get_workers))
+
+    def get_worker(self, worker_name: str) -> Optional[Worker]:
+        """Retrieve a specific worker by name from the cached worker list"""
+        workers = self._cache.get(self.WORKERS, self._manager.get_workers)
+        worker = next((w for w in workers if w.name == worker_name), None)
+        return copy.deepcopy(worker)
+
+    def create_worker(self, worker: Worker) -> Optional[Worker]:
+        """Create a worker and invalidate the cached worker list"""
+        try:
+            return self._manager.create_worker(worker)
+        finally:
+            self._cache.invalidate(self.WORKERS)
+
+    def update_worker(self, worker: Worker) -> Optional[Worker]:
+        """Update a worker and invalidate the cached worker list"""
+        try:
+            return self._manager.update_worker(worker)
+        finally:
+            self._cache.invalidate(self.WORKERS)
+
+    def delete_worker(self, worker_name: str) -> bool:
+        """Delete a worker and invalidate the cached worker list"""
+        try:
+            return self._manager.delete_worker(worker_name)
+        finally:
+            self._cache.invalidate(self.WORKERS)
+
+    # ========== SECTION OPERATIONS ==========
+
+    def get_sections(self) -> List[Section]:
+        """Retrieve all sections, served from the cache when warm"""
+        return copy.deepcopy(self._cache.get(self.SECTIONS, self._manager.get_sections))
+
+    def get_section(self, section_nombre: str) -> Optional[Section]:
+        """Retrieve a specific section by nombre from the cached section list"""
+        sections = self._cache.get(self.SECTIONS, self._manager.get_sections)
+        section = next((s for s in sections if s.nombre == section_nombre), None)
+        return copy.deepcopy(section)
+
+    def create_section(self, section: Section) -> Optional[Section]:
+        """Create a section and invalidate the cached section list"""
+        try:
+            return self._manager.create_section(section)
+        finally:
+            self._cache.invalidate(self.SECTIONS)
+
+    def update_section(self, section: Section) -> Optional[Section]:
+        """Update a section and invalidate the cached section list"""
+        try:
+            return self._manager.update_section(section)
+        finally:
+            self._cache.invalidate(self.SECTIONS)
+
+    def delete_section(self, section_nombre: str) -> bool:
+        """Delete a section and invalidate the cached section list"""
+        try:
+            return self._manager.delete_section(section_nombre)
+        finally:
+            self._cache.invalidate(self.SECTIONS)
+
+    # ========== SHIFT ASSIGNMENT OPERATIONS ==========
+
+    def get_assignment_scenarios(self) -> pd.DataFrame:
+        """Get all assignment scenarios, served from the cache when warm"""
+        return self._cache.get(self.SCENARIOS, self._manager.get_assignment_scenarios).copy()
+
+    def _scenario_row(self, scenario_id: int) -> Optional[Dict]:
+        """Find a scenario in the cached scenario list"""
+        scenarios = self._cache.get(self.SCENARIOS, self._manager.get_assignment_scenarios)
+        if scenarios.empty or 'id' not in scenarios.columns:
+            return None
+        match = scenarios[scenarios['id'] == scenario_id]
+        if match.empty:
+            return None
+        return match.iloc[0].to_dict()
+
+    def get_assignments(self, scenario_id: int, start_date: str = None, end_date: str = None,
+                        columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Get shift assignments for a scenario, from the on-disk scenario cache when enabled
+
+        Args:
+            scenario_id: ID of the scenario to retrieve assignments for
+            start_date: Optional start date filter (YYYY-MM-DD)
+            end_date: Optional end date filter (YYYY-MM-DD)
+            columns: Optional list of columns to select (all columns if None)
+
+        Returns:
+            DataFrame containing the assignments
+        """
+        scenario = None
+        if self._scenario_cache is not None and self._scenario_cache.available:
+            scenario = self._scenario_row(scenario_id)
+        if scenario is None:
+            return self._manager.get_assignments(scenario_id, start_date, end_date, columns=columns)
+        return self._scenario_cache.load(
+            scenario, lambda: self._manager.get_assignments(scenario_id), start_date, end_date, columns
+        )
+
+    def get_assignment_cube(self, scenario_id: int) -> pd.DataFrame:
+        """Get the aggregate cube of a scenario, served from the cache when warm"""
+        key = (self.CUBE, scenario_id)
+        return self._cache.get(key, lambda: self._manager.get_assignment_cube(scenario_id)).copy()
+
+    def _invalidate_scenario(self, scenario_id: int) -> None:
+        """Drop the scenario list and the cached cube and files of one scenario"""
+        self._cache.invalidate(self.SCENARIOS, (self.CUBE, scenario_id))
+        if self._scenario_cache is not None:
+            self._scenario_cache.invalidate(scenario_id)
+
+    def save_assignment_scenario(self, *args, **kwargs) -> Optional[int]:
+        """Save a scenario and invalidate the cached scenario list"""
+        try:
+            return self._manager.save_assignment_scenario(*args, **kwargs)
+        finally:
+            self._cache.invalidate(self.SCENARIOS)
+
+    def delete_assignment_scenario(self, scenario_id: int) -> bool:
+        """Delete a scenario and invalidate the cached scenario list and files"""
+        try:
+            return self._manager.delete_assignment_scenario(scenario_id)
+        finally:
+            self._invalidate_scenario(scenario_id)
+
+    def clone_assignment_scenario(self, scenario_id: int, new_name: str) -> Optional[int]:
+        """Clone a scenario and invalidate the cached scenario list"""
+        try:
+            return self._manager.clone_assignment_scenario(scenario_id, new_name)
+        finally:
+            self._cache.invalidate(self.SCENARIOS)
+
+    def publish_assignment_scenario(self, scenario_id: int) -> bool:
+        """Publish a scenario and invalidate the cached scenario list and files"""
+        try:
+            return self._manager.publish_assignment_scenario(scenario_id)
+        finally:
+            self._invalidate_scenario(scenario_id)
+
+    def archive_assignment_scenario(self, scenario_id: int) -> bool:
+        """Archive a scenario and invalidate the cached scenario list and files"""
+        try:
+            return self._manager.archive_assignment_scenario(scenario_id)
+        finally:
+            self._invalidate_scenario(scenario_id)
+
+    # ========== UTILITY METHODS ==========
+
+    def get_festivos(self, year: Optional[int] = None) -> pd.DataFrame:
+        """Retrieve holiday/festivo dates, cached per year filter"""
+        key = (self.FESTIVOS, year)
+        return self._cache.get(key, lambda: self._manager.get_festivos(year)).copy()
+
+    def _invalidate_festivos(self, date: str) -> None:
+        """Drop the unfiltered festivo list, the one for the year of date and the holiday calendar"""
+        invalidate_holidays()
+        year = int(str(date)[:4]) if str(date)[:4].isdigit() else None
+        if year is None:
+            self._cache.invalidate_where(lambda key: isinstance(key, tuple) and key[0] == self.FESTIVOS)
+        else:
+            self._cache.invalidate((self.FESTIVOS, None), (self.FESTIVOS, year))
+
+    def create_festivo(self, date: str, description: str = "") -> Dict:
+        """Create a festivo and invalidate the cached festivos for its year"""
+        try:
+            return self._manager.create_festivo(date, description)
+        finally:
+            self._invalidate_festivos(date)
+
+    def delete_festivo(self, date: str) -> bool:
+        """Delete a festivo and invalidate the cached festivos for its year"""
+        try:
+            return self._manager.delete_festivo(date)
+        finally:
+            self._invalidate_festivos(date)
@@ -1,7 +1,25 @@
 import datetime
 import calendar
+import html
+import threading
+from collections import OrderedDict
 import pandas as pd
-from utils.sections import sections, festivos
+from utils.sections import sections
+from utils.holidays import get_holidays
+from utils.demand import get_demand_matrix
+from utils.section_rules import DatePattern, pattern_version
+
+# Inline styles shared by every calendar cell
+EMPTY_CELL_STYLE = "background-color: #eaeaea; border: 1px solid #ddd; padding: 5px; min-height: 80px; border-radius: 5px;"
+DAY_CELL_STYLE = "background-color: #f9f9f9; border: 1px solid #ddd; padding: 5px; min-height: 80px; border-radius: 5px;"
+FESTIVO_CELL_STYLE = "background-color: #ffcccc; border: 1px solid #ddd; padding: 5px; min-height: 80px; border-radius: 5px;"
+SHIFT_STYLE = ("color: white; padding: 2px 4px; margin: 2px 0; border-radius: 3px; font-size: 0.8em; "
+               "overflow: hidden; text-overflow: ellipsis; white-space: nowrap;")
+
+# Rendered calendar fragments, keyed by (view, scenario, year, month, data version)
+CALENDAR_HTML_CACHE_SIZE = 64
+_calendar_html_cache = OrderedDict()
+_calendar_html_lock = threading.Lock()
 
 def get_day_label(date_obj, festivos_list):
     """Converts a date to day label (monday, tuesday, etc.)"""
@@ -20,8 +38,8 @@ def day_matches_section(date_obj, section_obj, festivos_list):
     Returns True if section applies to the given date.
     Critical logic:
     1. Day of week must match section's days or be marked as festivo
-    2. If section has specific fechas (dates), the date must be in that list
-       (HEMS and Coordis have specific dates they operate)
+    2. If section has a date pattern (fechas), it must match the date
+       (HEMS and Coordis only operate on some dates)
     """
     day_label = get_day_label(date_obj, festivos_list)
     
@@ -30,45 +48,16 @@ def day_matches_section(date_obj, section_obj, festivos_list):
         return False
     
     # Then check if section has specific dates
-    if hasattr(section_obj, 'fechas') and section_obj.fechas:
-        return date_obj in section_obj.fechas
+    pattern = DatePattern.from_value(getattr(section_obj, 'fechas', None))
+    if pattern is not None:
+        return date_obj in pattern
         
     # If no specific dates defined, it applies to all days matching the weekday
     return True
 
 def get_shifts_data(year, month=None):
-    """Get shifts data for visualization"""
-    data = []
-    
-    # If month is specified, only get data for that month
-    if month:
-        start_date = datetime.date(year, month, 1)
-        if month == 12:
-            end_date = datetime.date(year + 1, 1, 1)
-        else:
-            end_date = datetime.date(year, month + 1, 1)
-    else:
-        start_date = datetime.date(year, 1, 1)
-        end_date = datetime.date(year + 1, 1, 1)
-    
-    current_date = start_date
-    while current_date < end_date:
-        for sec in sections:
-            if day_matches_section(current_date, sec, festivos):
-                data.append({
-                    "date": current_date,
-                    "day": current_date.day,
-                    "month": current_date.month,
-                    "weekday": get_day_label(current_date, festivos),
-                    "shift_name": sec.nombre,
-                    "hours": sec.horas_turno,
-                    "personnel": sec.personal,
-                    "libra": sec.libra,
-                    "is_festivo": current_date in festivos
-                })
-        current_date += datetime.timedelta(days=1)
-    
-    return pd.DataFrame(data)
+    """Get shifts data for visualization (one row per date and section to cover)"""
+    return get_demand_matrix(sections, year, festivos_list=get_holidays().year(year)).to_frame(month)
 
 def get_shift_color(shift_name):
     """Return color based on shift category"""
@@ -83,148 +72,158 @@ def get_shift_color(shift_name):
     else:
         return "#9AA0A6"  # Gray
 
-def draw_month_calendar(df_month, month_name, year, month_names):
-    """Draw a calendar for a specific month using Streamlit"""
-    import streamlit as st
-    
-    # Calculate the first day of week for this month and the number of days
-    if df_month.empty:
-        first_day = datetime.date(year, month_names.index(month_name) + 1, 1)
-    else:
-        first_day = datetime.date(df_month['date'].min().year, df_month['date'].min().month, 1)
-    
-    first_weekday = first_day.weekday()  # 0 for Monday, 6 for Sunday
-    days_in_month = calendar.monthrange(first_day.year, first_day.month)[1]
-    
-    # Create a 7x6 grid (7 days x max 6 weeks)
-    weeks = 6
-    
-    # Display day headers (Mon, Tue, etc.)
-    cols = st.columns(7)
-    weekday_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    for i, col in enumerate(cols):
-        col.markdown(f"<div style='text-align: center; font-weight: bold;'>{weekday_names[i]}</div>", unsafe_allow_html=True)
-    
-    # Create a 2D list to hold all cells
-    day_num = 1 - first_weekday
-    
-    for w in range(weeks):
-        cols = st.columns(7)
-        for d in range(7):
-            current_day = day_num
-            day_num += 1
-            
-            # Skip days outside the month
-            if current_day < 1 or current_day > days_in_month:
-                cols[d].markdown("<div style='background-color: #eaeaea; border: 1px solid #ddd; padding: 5px; min-height: 80px; border-radius: 5px;'>&nbsp;</div>", unsafe_allow_html=True)
+def fallback_initials(worker_name):
+    """Build initials from a name (first letter of each word) when the worker is unknown"""
+    name_parts = str(worker_name).split()
+    return ''.join([part[0].upper() for part in name_parts if part])[:2]
+
+
+def calendar_data_version(sections_list=None, workers_list=None, scenario=None):
+    """
+    Fingerprint of the data a calendar is drawn from, used as part of the cache key
+
+    Args:
+        sections_list: Section objects (nombre, dias, fechas)
+        workers_list: Worker objects (name, initials)
+        scenario: Scenario row (id, status, created_at/updated_at)
+
+    Returns:
+        Hashable version value
+    """
+    section_part = tuple(
+        (s.nombre, tuple(s.dias or ()), pattern_version(s.fechas))
+        for s in (sections_list or [])
+    )
+    worker_part = tuple((w.name, w.initials) for w in (workers_list or []))
+    scenario_part = None
+    if scenario:
+        scenario_part = (scenario.get('id'), scenario.get('status'),
+                         str(scenario.get('updated_at') or scenario.get('created_at')))
+    return hash((section_part, worker_part, scenario_part, get_holidays().version))
+
+
+def build_month_calendar_html(df_month, year, month, assignments_df=None, initials=None,
+                              weekday_names=None, festivos_list=None):
+    """
+    Build the HTML of a month calendar as a single grid
+
+    Shifts and assignments are grouped by date once, and assigned workers are
+    resolved through a name -> initials dictionary.
+
+    Args:
+        df_month: Shifts of the month (columns date, shift_name), as from get_shifts_data
+        year: Year
+        month: Month number (1-12)
+        assignments_df: Optional assignments (columns date, section_name, worker_name)
+        initials: Optional worker name -> initials map; full names are shown if None
+        weekday_names: Header labels, Monday first
+        festivos_list: Holiday dates highlighted in the calendar
+
+    Returns:
+        HTML string of the whole calendar
+    """
+    weekday_names = weekday_names or ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    festivos_set = get_holidays().year(year) if festivos_list is None else set(festivos_list)
+
+    # Group the month's shifts by date once
+    shifts_by_day = {}
+    if df_month is not None and not df_month.empty:
+        shift_dates = pd.to_datetime(df_month['date']).dt.date
+        for day_date, shift_name in zip(shift_dates, df_month['shift_name']):
+            shifts_by_day.setdefault(day_date, []).append(shift_name)
+
+    # First worker assigned to each (date, section)
+    assigned = {}
+    if assignments_df is not None and not assignments_df.empty:
+        assignment_dates = pd.to_datetime(assignments_df['date']).dt.date
+        for key, worker_name in zip(zip(assignment_dates, assignments_df['section_name']), assignments_df['worker_name']):
+            assigned.setdefault(key, worker_name)
+
+    parts = ["<div style='display: grid; grid-template-columns: repeat(7, minmax(0, 1fr)); gap: 6px;'>"]
+    for name in weekday_names:
+        parts.append(f"<div style='text-align: center; font-weight: bold;'>{html.escape(name)}</div>")
+
+    for week in calendar.Calendar(firstweekday=0).monthdayscalendar(year, month):
+        for current_day in week:
+            if current_day == 0:
+                parts.append(f"<div style='{EMPTY_CELL_STYLE}'>&nbsp;</div>")
                 continue
-            
-            # Create date object for current day
-            day_date = datetime.date(first_day.year, first_day.month, current_day)
-            
-            # Get shifts for this day
-            if df_month.empty:
-                day_shifts = pd.DataFrame()
-            else:
-                day_shifts = df_month[df_month['date'] == day_date]
-            
-            # Construct cell content with all shifts
-            cell_content = f"<div style='text-align: right; font-weight: bold; margin-bottom: 5px;'>{current_day}</div>"
-            
-            for _, shift in day_shifts.iterrows():
-                color = get_shift_color(shift['shift_name'])
-                cell_content += f"<div style='background-color: {color}; color: white; padding: 2px 4px; margin: 2px 0; border-radius: 3px; font-size: 0.8em; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;'>{shift['shift_name']}</div>"
-            
-            # Style for the cell
-            is_festivo = day_date in festivos
-            if is_festivo:
-                cell_style = "background-color: #ffcccc; border: 1px solid #ddd; padding: 5px; min-height: 80px; border-radius: 5px;"
-            else:
-                cell_style = "background-color: #f9f9f9; border: 1px solid #ddd; padding: 5px; min-height: 80px; border-radius: 5px;"
-            
-            # Render the cell
-            cols[d].markdown(f'<div style="{cell_style}">{cell_content}</div>', unsafe_allow_html=True)
-            
-        # Break if we've displayed all days in the month
-        if day_num > days_in_month:
-            break
-
-def draw_assignment_calendar(df_month, assignments_df, month_name, year, month_names):
-    """Draw a calendar with shift assignments for a specific month"""
+
+            day_date = datetime.date(year, month, current_day)
+            cell_style = FESTIVO_CELL_STYLE if day_date in festivos_set else DAY_CELL_STYLE
+            parts.append(f"<div style='{cell_style}'>")
+            parts.append(f"<div style='text-align: right; font-weight: bold; margin-bottom: 5px;'>{current_day}</div>")
+
+            for shift_name in shifts_by_day.get(day_date, ()):
+                label = html.escape(str(shift_name))
+                worker_name = assigned.get((day_date, shift_name))
+                if worker_name:
+                    if initials is None:
+                        label += f": {html.escape(str(worker_name))}"
+                    else:
+                        label += f": {html.escape(str(initials.get(worker_name) or fallback_initials(worker_name)))}"
+                parts.append(f"<div style='background-color: {get_shift_color(shift_name)}; {SHIFT_STYLE}'>{label}</div>")
+
+            parts.append("</div>")
+
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def get_calendar_html(cache_key, build):
+    """
+    Return a rendered calendar fragment, building it only on a cache miss
+
+    Args:
+        cache_key: Hashable key (view, scenario, year, month, data version), or None to skip the cache
+        build: Callable returning the HTML
+
+    Returns:
+        HTML string
+    """
+    if cache_key is None:
+        return build()
+    with _calendar_html_lock:
+        if cache_key in _calendar_html_cache:
+            _calendar_html_cache.move_to_end(cache_key)
+            return _calendar_html_cache[cache_key]
+    fragment = build()
+    with _calendar_html_lock:
+        _calendar_html_cache[cache_key] = fragment
+        while len(_calendar_html_cache) > CALENDAR_HTML_CACHE_SIZE:
+            _calendar_html_cache.popitem(last=False)
+    return fragment
+
+
+def _calendar_month(df_month, month_name, year, month_names):
+    """Resolve the (year, month) of a calendar from its data or the selected month name"""
+    if df_month is None or df_month.empty:
+        return year, month_names.index(month_name) + 1
+    first = pd.to_datetime(df_month['date']).min()
+    return first.year, first.month
+
+
+def draw_month_calendar(df_month, month_name, year, month_names, weekday_names=None, cache_key=None):
+    """Draw a calendar for a specific month using Streamlit (one HTML element)"""
     import streamlit as st
-    
-    # Calculate the first day of week for this month and the number of days
-    if df_month.empty:
-        first_day = datetime.date(year, month_names.index(month_name) + 1, 1)
-    else:
-        first_day = datetime.date(df_month['date'].min().year, df_month['date'].min().month, 1)
-    
-    first_weekday = first_day.weekday()  # 0 for Monday, 6 for Sunday
-    days_in_month = calendar.monthrange(first_day.year, first_day.month)[1]
-    
-    # Create a 7x6 grid (7 days x max 6 weeks)
-    weeks = 6
-    
-    # Display day headers (Mon, Tue, etc.)
-    cols = st.columns(7)
-    weekday_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    for i, col in enumerate(cols):
-        col.markdown(f"<div style='text-align: center; font-weight: bold;'>{weekday_names[i]}</div>", unsafe_allow_html=True)
-    
-    # Create a 2D list to hold all cells
-    day_num = 1 - first_weekday
-    
-    for w in range(weeks):
-        cols = st.columns(7)
-        for d in range(7):
-            current_day = day_num
-            day_num += 1
-            
-            # Skip days outside the month
-            if current_day < 1 or current_day > days_in_month:
-                cols[d].markdown("<div style='background-color: #eaeaea; border: 1px solid #ddd; padding: 5px; min-height: 80px; border-radius: 5px;'>&nbsp;</div>", unsafe_allow_html=True)
-                continue
-            
-            # Create date object for current day
-            day_date = datetime.date(first_day.year, first_day.month, current_day)
-            
-            # Get shifts for this day
-            if df_month.empty:
-                day_shifts = pd.DataFrame()
-            else:
-                day_shifts = df_month[df_month['date'] == day_date]
-            
-            # Get assignments for this day
-            if assignments_df.empty:
-                day_assignments = pd.DataFrame()
-            else:
-                day_assignments = assignments_df[assignments_df['date'].dt.date == day_date]
-            
-            # Construct cell content with the day number
-            cell_content = f"<div style='text-align: right; font-weight: bold; margin-bottom: 5px;'>{current_day}</div>"
-            
-            # Add shifts with assignments
-            for _, shift in day_shifts.iterrows():
-                color = get_shift_color(shift['shift_name'])
-                
-                # Check if this shift has been assigned
-                assigned_worker = ""
-                matching_assignments = day_assignments[day_assignments['section_name'] == shift['shift_name']]
-                if not matching_assignments.empty:
-                    assigned_worker = f": {matching_assignments.iloc[0]['worker_name']}"
-                
-                cell_content += f"<div style='background-color: {color}; color: white; padding: 2px 4px; margin: 2px 0; border-radius: 3px; font-size: 0.8em; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;'>{shift['shift_name']}{assigned_worker}</div>"
-            
-            # Style for the cell
-            is_festivo = day_date in festivos
-            if is_festivo:
-                cell_style = "background-color: #ffcccc; border: 1px solid #ddd; padding: 5px; min-height: 80px; border-radius: 5px;"
-            else:
-                cell_style = "background-color: #f9f9f9; border: 1px solid #ddd; padding: 5px; min-height: 80px; border-radius: 5px;"
-            
-            # Render the cell
-            cols[d].markdown(f'<div style="{cell_style}">{cell_content}</div>', unsafe_allow_html=True)
-            
-        # Break if we've displayed all days in the month
-        if day_num > days_in_month:
-            break
\ No newline at end of file
+
+    cal_year, cal_month = _calendar_month(df_month, month_name, year, month_names)
+    fragment = get_calendar_html(
+        cache_key,
+        lambda: build_month_calendar_html(df_month, cal_year, cal_month, weekday_names=weekday_names)
+    )
+    st.markdown(fragment, unsafe_allow_html=True)
+
+
+def draw_assignment_calendar(df_month, assignments_df, month_name, year, month_names,
+                             initials=None, weekday_names=None, cache_key=None):
+    """Draw a calendar with shift assignments for a specific month (one HTML element)"""
+    import streamlit as st
+
+    cal_year, cal_month = _calendar_month(df_month, month_name, year, month_names)
+    fragment = get_calendar_html(
+        cache_key,
+        lambda: build_month_calendar_html(df_month, cal_year, cal_month, assignments_df,
+                                          initials=initials, weekday_names=weekday_names)
+    )
+    st.markdown(fragment, unsafe_allow_html=True)
@@ -2,16 +2,39 @@ import streamlit as st
 import pandas as pd
 import logging
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from supabase import create_client, Client
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, Iterator, List, Optional, Any, Union
 from utils.worker import Worker  # Import the Worker class
+from utils.section_rules import decode_section_fechas, encode_section_fechas
 from utils.sections import Section  # Import the Section class
+from utils.assignment_cube import build_assignment_cube, encode_cube_columns, decode_cube, CUBE_SOURCE_COLUMNS
+from utils.sqlite_db import SQLiteManager, DEFAULT_SQLITE_PATH
+from utils.cached_db import CachedDBManager, DEFAULT_CACHE_TTL
+from utils.scenario_cache import ScenarioParquetCache, DEFAULT_SCENARIO_CACHE_DIR
+from utils.assignment_io import (ASSIGNMENT_COLUMNS, decode_assignment_rows, concat_assignment_pages,
+                                 encode_assignment_columns, encode_metric_columns, columns_to_records)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Rows per request when paging through shift_assignments (PostgREST caps responses at 1000 by default)
+ASSIGNMENT_PAGE_SIZE = 1000
+# Maximum number of pages fetched at the same time
+FETCH_MAX_WORKERS = 4
+# Rows per insert request and number of insert requests in flight
+INSERT_BATCH_SIZE = 1000
+WRITE_MAX_WORKERS = 4
+# Attempts per insert request and base delay of the exponential backoff (seconds)
+WRITE_RETRIES = 3
+RETRY_BACKOFF = 0.5
+# Status of a scenario whose rows are still being written; it is hidden from listings
+STAGING_STATUS = "staging"
+
 
 class SupabaseManager:
     """
@@ -109,11 +132,13 @@ class SupabaseManager:
         """
         try:
             # Convert Worker object to dictionary
-            worker_data = worker.__dict__
-            
-            # Remove any keys that shouldn't be sent to the database
-            if '_id' in worker_data:
-                del worker_data['_id']
+            worker_data = worker.to_row()
+            worker_data['ooo_days'] = json.dumps(worker_data['ooo_days'])
+            # Rules are only sent once set (tables without the rules column keep working)
+            if worker_data.get('rules') is None:
+                worker_data.pop('rules', None)
+            else:
+                worker_data['rules'] = json.dumps(worker_data['rules'])
                 
             # Check if worker already exists
             existing = self.get_worker(worker.name)
@@ -144,7 +169,8 @@ class SupabaseManager:
         """
         try:
             # Convert Worker object to dictionary
-            worker_data = worker.__dict__
+            worker_data = worker.to_row()
+            worker_data['ooo_days'] = json.dumps(worker_data['ooo_days'])
             logger.info(f"Updating worker with data: {worker_data}")
             if not worker.name:
                 raise ValueError("Worker must have a name to update")
@@ -172,7 +198,7 @@ class SupabaseManager:
         """
         try:
             # Convert Worker object to dictionary
-            worker_data = worker.__dict__.copy()  # Create a copy to avoid modifying the original
+            worker_data = worker.to_row()
             
             # Handle special fields that might need serialization
             if isinstance(worker_data.get('days_assigned'), dict):
@@ -188,18 +214,16 @@ class SupabaseManager:
             if isinstance(worker_data.get('section_day_constraints'), dict):
                 worker_data['section_day_constraints'] = json.dumps(worker_data['section_day_constraints'])
                 
-            if isinstance(worker_data.get('ooo_days'), list):
-                worker_data['ooo_days'] = json.dumps(worker_data['ooo_days'])
-            
-            # Remove any internal attributes that shouldn't be sent to the database
-            keys_to_remove = []
-            for key in worker_data:
-                if key.startswith('_'):
-                    keys_to_remove.append(key)
-            
-            for key in keys_to_remove:
-                del worker_data[key]
-                
+            # Out-of-office periods are stored as compact {start, end, reason} ranges
+            worker_data['ooo_days'] = json.dumps(worker_data['ooo_days'])
+
+            # Scheduling rules, only sent once set (tables without the rules column keep working)
+            if worker_data.get('rules') is None:
+                worker_data.pop('rules', None)
+            else:
+                worker_data['rules'] = json.dumps(worker_data['rules'])
+
+
             logger.info(f"Updating worker with data: {worker_data}")
             
             if not worker.name:
@@ -251,8 +275,8 @@ class SupabaseManager:
             for section_data in response.data:
                 if 'dias' in section_data and section_data['dias'] is not None and isinstance(section_data['dias'], str):
                     section_data['dias'] = [day.strip() for day in section_data['dias'].split(",") if day.strip()]
-                if 'fechas' in section_data and section_data['fechas'] is not None and isinstance(section_data['fechas'], str):
-                    section_data['fechas'] = [day.strip() for day in section_data['fechas'].split(",") if day.strip()]
+                if 'fechas' in section_data:
+                    section_data['fechas'] = decode_section_fechas(section_data['fechas'])
 
                 section_list.append(Section(**section_data))
                 
@@ -307,8 +331,9 @@ class SupabaseManager:
             logger.info(f"Serialized dias: {section_data['dias']}")
             logger.info(type(section_data['dias']))
                 
-            if 'fechas' in section_data and isinstance(section_data['fechas'], list):
-                section_data['fechas'] = ", ".join(section_data['fechas'])
+            if 'fechas' in section_data:
+                # Date rules (and legacy date lists) are stored as compact JSON
+                section_data['fechas'] = encode_section_fechas(section_data['fechas'])
             
             response = self.supabase.table("Sections").insert(section_data).execute()
             logger.info(f"Section created: {section.nombre}")
@@ -342,8 +367,9 @@ class SupabaseManager:
                 logger.info(f"Serialized dias: {section_data['dias']}")
                 logger.info(type(section_data['dias']))
                 
-            if 'fechas' in section_data and isinstance(section_data['fechas'], list):
-                section_data['fechas'] = ", ".join(section_data['fechas'])
+            if 'fechas' in section_data:
+                # Date rules (and legacy date lists) are stored as compact JSON
+                section_data['fechas'] = encode_section_fechas(section_data['fechas'])
             
             if not section.nombre:
                 raise ValueError("Section must have a nombre to update")
@@ -378,11 +404,111 @@ class SupabaseManager:
     
     # ========== SHIFT ASSIGNMENT OPERATIONS ==========
     
+    def _execute_with_retry(self, query, description: str):
+        """
+        Execute a query builder, retrying transient failures with exponential backoff
+
+        Args:
+            query: Prepared postgrest request builder
+            description: Short text used in the log messages
+
+        Returns:
+            The query response
+        """
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                return query.execute()
+            except Exception as e:
+                if attempt == WRITE_RETRIES:
+                    raise
+                delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+                logger.warning(f"{description} failed (attempt {attempt}/{WRITE_RETRIES}): {str(e)}; "
+                               f"retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _bulk_insert(self, table: str, records: List[Dict]) -> None:
+        """
+        Insert rows in fixed-size batches sent concurrently, each with retry/backoff
+
+        Args:
+            table: Name of the table
+            records: Row dictionaries to insert
+
+        Raises:
+            Exception from the first batch that failed after every retry
+        """
+        batches = [records[i:i + INSERT_BATCH_SIZE] for i in range(0, len(records), INSERT_BATCH_SIZE)]
+        if not batches:
+            return
+        if len(batches) == 1:
+            self._execute_with_retry(self.supabase.table(table).insert(batches[0]), f"Insert into {table}")
+            return
+        with ThreadPoolExecutor(max_workers=WRITE_MAX_WORKERS) as pool:
+            futures = [
+                pool.submit(self._execute_with_retry, self.supabase.table(table).insert(batch),
+                            f"Insert batch {index + 1}/{len(batches)} into {table}")
+                for index, batch in enumerate(batches)
+            ]
+            for future in futures:
+                future.result()
+
+    def _write_scenario(self, scenario_data: Dict, payload_builders: List[tuple]) -> Optional[int]:
+        """
+        Write a scenario and its rows with all-or-nothing semantics
+
+        The scenario row is created with the staging status, its assignments,
+        metrics and aggregate cube are bulk inserted, and only then is the status
+        flipped to draft. If any batch fails the staged scenario is deleted
+        (cascading to the rows already written), so a half-saved scenario is never visible.
+
+        Args:
+            scenario_data: Columns of the assignment_scenarios row
+            payload_builders: List of (table, callable(scenario_id) returning a column payload)
+
+        Returns:
+            ID of the created scenario or None if failed
+        """
+        response = self.supabase.table("assignment_scenarios")\
+            .insert({**scenario_data, "status": STAGING_STATUS}).execute()
+        scenario_id = response.data[0]['id']
+        row_counts = {}
+        try:
+            for table, builder in payload_builders:
+                records = columns_to_records(builder(scenario_id))
+                self._bulk_insert(table, records)
+                row_counts[table] = len(records)
+            self._execute_with_retry(
+                self.supabase.table("assignment_scenarios").update({"status": "draft"}).eq("id", scenario_id),
+                f"Commit scenario {scenario_id}"
+            )
+        except Exception:
+            # Roll back: cascade delete removes every row written so far
+            try:
+                self.supabase.table("assignment_scenarios").delete().eq("id", scenario_id).execute()
+            except Exception as cleanup_error:
+                logger.error(f"Could not remove staged scenario {scenario_id}: {str(cleanup_error)}")
+            raise
+        logger.info(f"Saved scenario {scenario_data.get('name')} (ID: {scenario_id}): {row_counts}")
+        return scenario_id
+
+    def _scenario_payloads(self, assignments_df: pd.DataFrame, metrics_dict: Dict) -> List[tuple]:
+        """Payload builders of every table written for a scenario"""
+        cube = build_assignment_cube(assignments_df)
+        return [
+            ("shift_assignments", lambda scenario_id: encode_assignment_columns(assignments_df, scenario_id)),
+            ("assignment_metrics", lambda scenario_id: encode_metric_columns(metrics_dict, scenario_id)),
+            ("assignment_cube", lambda scenario_id: encode_cube_columns(cube, scenario_id)),
+        ]
+
     def save_assignment_scenario(self, name: str, created_by: str, year: int, 
                                  assignments_df: pd.DataFrame, metrics_dict: Dict, 
                                  description: str = "", settings: Dict = None) -> Optional[int]:
         """
         Save a complete assignment scenario to the database
+
+        The payload is built column-wise and written through _write_scenario, so
+        either every row is saved or the scenario does not exist at all. The
+        worker x section x month aggregate cube is computed here and stored with it.
         
         Args:
             name: Name of the scenario
@@ -397,7 +523,6 @@ class SupabaseManager:
             ID of the created scenario or None if failed
         """
         try:
-            # Insert the scenario and get its ID
             scenario_data = {
                 "name": name,
                 "created_by": created_by,
@@ -405,57 +530,7 @@ class SupabaseManager:
                 "description": description,
                 "settings": json.dumps(settings) if settings else None
             }
-            
-            response = self.supabase.table("assignment_scenarios").insert(scenario_data).execute()
-            scenario_id = response.data[0]['id']
-            logger.info(f"Created assignment scenario: {name} (ID: {scenario_id})")
-            
-            # Prepare batch insert data for shift assignments
-            assignments_batch = []
-            for _, row in assignments_df.iterrows():
-                assignment = {
-                    "scenario_id": scenario_id,
-                    "date": row['date'].strftime('%Y-%m-%d') if hasattr(row['date'], 'strftime') else row['date'],
-                    "day_of_week": row['day_of_week'],
-                    "section_name": row['section_name'],
-                    "worker_name": row['worker_name'],
-                    "hours": float(row['hours']),
-                    "libra": bool(row.get('libra', False)),
-                    "is_festivo": bool(row.get('is_festivo', False)),
-                    "is_weekend": bool(row.get('is_weekend', False)),
-                    "period": row.get('period', None)
-                }
-                assignments_batch.append(assignment)
-            
-            # Insert assignments in batches of 1000 (Supabase limit)
-            batch_size = 1000
-            for i in range(0, len(assignments_batch), batch_size):
-                batch = assignments_batch[i:i+batch_size]
-                self.supabase.table("shift_assignments").insert(batch).execute()
-            
-            logger.info(f"Inserted {len(assignments_batch)} shift assignments for scenario {scenario_id}")
-            
-            # Insert metrics
-            metrics_batch = []
-            for worker_name, metrics in metrics_dict.items():
-                if worker_name not in ('period_stats', 'total_shifts_assigned', 'unassigned_shifts_count'):
-                    metric_data = {
-                        "scenario_id": scenario_id,
-                        "worker_name": worker_name,
-                        "total_shifts": metrics.get('total_shifts', 0),
-                        "total_hours": metrics.get('total_hours', 0),
-                        "night_shifts": metrics.get('night_shifts', 0),
-                        "weekend_shifts": metrics.get('weekend_shifts', 0),
-                        "festivo_shifts": metrics.get('festivo_shifts', 0),
-                        "period": None  # For overall metrics
-                    }
-                    metrics_batch.append(metric_data)
-            
-            if metrics_batch:
-                self.supabase.table("assignment_metrics").insert(metrics_batch).execute()
-                logger.info(f"Inserted metrics for {len(metrics_batch)} workers for scenario {scenario_id}")
-            
-            return scenario_id
+            return self._write_scenario(scenario_data, self._scenario_payloads(assignments_df, metrics_dict))
         except Exception as e:
             logger.error(f"Error saving assignment scenario: {str(e)}")
             return None
@@ -468,7 +543,8 @@ class SupabaseManager:
             DataFrame containing all scenarios with metadata
         """
         try:
-            response = self.supabase.table("assignment_scenarios").select("*").order("created_at", desc=True).execute()
+            response = self.supabase.table("assignment_scenarios").select("*")\
+                .or_(f"status.is.null,status.neq.{STAGING_STATUS}").order("created_at", desc=True).execute()
             return pd.DataFrame(response.data)
         except Exception as e:
             logger.error(f"Error fetching assignment scenarios: {str(e)}")
@@ -493,7 +569,80 @@ class SupabaseManager:
             logger.error(f"Error fetching assignment scenario {scenario_id}: {str(e)}")
             return None
     
-    def get_assignments(self, scenario_id: int, start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    def _assignments_select(self, columns: Optional[List[str]], count: Optional[str] = None,
+                            scenario_id: int = None, start_date: str = None, end_date: str = None,
+                            worker_name: str = None, section_name: str = None):
+        """Build a fresh shift_assignments query with projection, filters and a stable order"""
+        query = self.supabase.table("shift_assignments")\
+            .select(*(columns or ["*"]), count=count)\
+            .eq("scenario_id", scenario_id)
+        if start_date:
+            query = query.gte("date", start_date)
+        if end_date:
+            query = query.lte("date", end_date)
+        if worker_name:
+            query = query.eq("worker_name", worker_name)
+        if section_name:
+            query = query.eq("section_name", section_name)
+        # Order by id as well so page boundaries are deterministic
+        return query.order("date").order("id")
+
+    def iter_assignments(self, scenario_id: int, columns: Optional[List[str]] = None,
+                         start_date: str = None, end_date: str = None,
+                         worker_name: str = None, section_name: str = None,
+                         page_size: int = ASSIGNMENT_PAGE_SIZE) -> Iterator[pd.DataFrame]:
+        """
+        Stream the shift assignments of a scenario page by page
+
+        The first page also returns the exact row count, the remaining row ranges are
+        then fetched concurrently from a bounded thread pool and yielded in date order.
+        Each page is decoded straight into typed columns.
+
+        Args:
+            scenario_id: ID of the scenario
+            columns: Columns to select, all columns if None
+            start_date: Optional start date filter (YYYY-MM-DD)
+            end_date: Optional end date filter (YYYY-MM-DD)
+            worker_name: Optional worker filter
+            section_name: Optional section filter
+            page_size: Rows requested per page
+
+        Yields:
+            DataFrame with the rows of each page
+        """
+        filters = dict(scenario_id=scenario_id, start_date=start_date, end_date=end_date,
+                       worker_name=worker_name, section_name=section_name)
+
+        first = self._assignments_select(columns, count="exact", **filters).range(0, page_size - 1).execute()
+        rows = first.data or []
+        total = first.count if first.count is not None else len(rows)
+        yield decode_assignment_rows(rows, columns)
+
+        # The server may cap responses below the requested page size
+        if rows and len(rows) < page_size and total > len(rows):
+            page_size = len(rows)
+        starts = list(range(len(rows), total, page_size))
+        if not starts:
+            return
+
+        def fetch(offset: int) -> pd.DataFrame:
+            response = self._assignments_select(columns, **filters).range(offset, offset + page_size - 1).execute()
+            return decode_assignment_rows(response.data or [], columns)
+
+        # Keep a bounded window of pages in flight so memory stays flat on big scenarios
+        window = FETCH_MAX_WORKERS * 2
+        with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as pool:
+            pending = [pool.submit(fetch, offset) for offset in starts[:window]]
+            next_index = len(pending)
+            while pending:
+                page = pending.pop(0).result()
+                if next_index < len(starts):
+                    pending.append(pool.submit(fetch, starts[next_index]))
+                    next_index += 1
+                yield page
+
+    def get_assignments(self, scenario_id: int, start_date: str = None, end_date: str = None,
+                        columns: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Get all shift assignments for a specific scenario
         
@@ -501,55 +650,38 @@ class SupabaseManager:
             scenario_id: ID of the scenario to retrieve assignments for
             start_date: Optional start date filter (YYYY-MM-DD)
             end_date: Optional end date filter (YYYY-MM-DD)
+            columns: Optional list of columns to select (all columns if None)
             
         Returns:
             DataFrame containing all assignments for the scenario
         """
         try:
-            query = self.supabase.table("shift_assignments").select("*").eq("scenario_id", scenario_id)
-            
-            if start_date:
-                query = query.gte("date", start_date)
-            if end_date:
-                query = query.lte("date", end_date)
-                
-            response = query.order("date").execute()
-            
-            df = pd.DataFrame(response.data)
-            
-            # Convert date to datetime
-            if not df.empty and 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                
-            return df
+            return concat_assignment_pages(
+                self.iter_assignments(scenario_id, columns, start_date=start_date, end_date=end_date),
+                columns
+            )
         except Exception as e:
             logger.error(f"Error fetching assignments for scenario {scenario_id}: {str(e)}")
             return pd.DataFrame()
     
-    def get_worker_assignments(self, scenario_id: int, worker_name: str) -> pd.DataFrame:
+    def get_worker_assignments(self, scenario_id: int, worker_name: str,
+                               columns: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Get all shift assignments for a specific worker in a scenario
         
         Args:
             scenario_id: ID of the scenario
             worker_name: Name of the worker
+            columns: Optional list of columns to select (all columns if None)
             
         Returns:
             DataFrame containing worker's assignments
         """
         try:
-            response = self.supabase.table("shift_assignments").select("*")\
-                .eq("scenario_id", scenario_id)\
-                .eq("worker_name", worker_name)\
-                .order("date").execute()
-                
-            df = pd.DataFrame(response.data)
-            
-            # Convert date to datetime
-            if not df.empty and 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                
-            return df
+            return concat_assignment_pages(
+                self.iter_assignments(scenario_id, columns, worker_name=worker_name),
+                columns
+            )
         except Exception as e:
             logger.error(f"Error fetching assignments for worker {worker_name} in scenario {scenario_id}: {str(e)}")
             return pd.DataFrame()
@@ -572,6 +704,32 @@ class SupabaseManager:
             logger.error(f"Error fetching metrics for scenario {scenario_id}: {str(e)}")
             return pd.DataFrame()
     
+    def get_assignment_cube(self, scenario_id: int) -> pd.DataFrame:
+        """
+        Get the worker x section x month aggregate cube of a scenario
+
+        Scenarios saved before the cube existed have no stored cube; it is then
+        computed from their assignments.
+        
+        Args:
+            scenario_id: ID of the scenario
+            
+        Returns:
+            DataFrame with the cube cells (see utils.assignment_cube)
+        """
+        try:
+            response = self.supabase.table("assignment_cube").select("*")\
+                .eq("scenario_id", scenario_id).execute()
+            if response.data:
+                return decode_cube(pd.DataFrame(response.data))
+        except Exception as e:
+            logger.warning(f"Stored cube for scenario {scenario_id} unavailable: {str(e)}")
+        try:
+            return build_assignment_cube(self.get_assignments(scenario_id, columns=CUBE_SOURCE_COLUMNS))
+        except Exception as e:
+            logger.error(f"Error building cube for scenario {scenario_id}: {str(e)}")
+            return pd.DataFrame()
+    
     def delete_assignment_scenario(self, scenario_id: int) -> bool:
         """
         Delete an assignment scenario and all related assignments and metrics
@@ -594,6 +752,40 @@ class SupabaseManager:
     def clone_assignment_scenario(self, scenario_id: int, new_name: str) -> Optional[int]:
         """
         Clone an existing assignment scenario with a new name
+
+        The rows are copied inside the database by the clone_assignment_scenario
+        stored function (sql/clone_assignment_scenario.sql), so cloning costs a
+        single request whatever the size of the scenario. If the function is not
+        installed, the scenario is copied through the client instead.
+        
+        Args:
+            scenario_id: ID of the scenario to clone
+            new_name: Name for the new scenario
+            
+        Returns:
+            ID of the new scenario or None if failed
+        """
+        try:
+            response = self.supabase.rpc(
+                "clone_assignment_scenario", {"source_id": int(scenario_id), "new_name": new_name}
+            ).execute()
+            new_scenario_id = response.data
+            # Scalar results may come back wrapped depending on the client version
+            if isinstance(new_scenario_id, list):
+                new_scenario_id = new_scenario_id[0] if new_scenario_id else None
+            if isinstance(new_scenario_id, dict):
+                new_scenario_id = next(iter(new_scenario_id.values()), None)
+            if new_scenario_id is not None:
+                logger.info(f"Cloned scenario {scenario_id} to new scenario {new_scenario_id} (server side)")
+                return int(new_scenario_id)
+        except Exception as e:
+            logger.warning(f"Server-side clone of scenario {scenario_id} unavailable, "
+                           f"copying through the client: {str(e)}")
+        return self._clone_assignment_scenario_client_side(scenario_id, new_name)
+
+    def _clone_assignment_scenario_client_side(self, scenario_id: int, new_name: str) -> Optional[int]:
+        """
+        Clone a scenario by downloading its rows and writing them back (fallback path)
         
         Args:
             scenario_id: ID of the scenario to clone
@@ -609,36 +801,28 @@ class SupabaseManager:
                 logger.error(f"Scenario {scenario_id} not found for cloning")
                 return None
                 
-            # Get assignments for the original scenario
-            assignments_df = self.get_assignments(scenario_id)
+            # Get assignments for the original scenario (only the columns that are copied)
+            assignments_df = self.get_assignments(scenario_id, columns=ASSIGNMENT_COLUMNS[1:])
             if assignments_df.empty:
                 logger.warning(f"No assignments found for scenario {scenario_id}")
                 
             # Get metrics for the original scenario
             metrics_df = self.get_assignment_metrics(scenario_id)
-            
-            # Convert metrics to the dictionary format needed for save_assignment_scenario
             metrics_dict = {}
-            for _, row in metrics_df.iterrows():
-                worker_name = row['worker_name']
-                metrics_dict[worker_name] = {
-                    'total_shifts': row['total_shifts'],
-                    'total_hours': row['total_hours'],
-                    'night_shifts': row['night_shifts'],
-                    'weekend_shifts': row['weekend_shifts'],
-                    'festivo_shifts': row['festivo_shifts']
-                }
-                
-            # Create new scenario
-            new_scenario_id = self.save_assignment_scenario(
-                name=new_name,
-                created_by=original['created_by'],
-                year=original['year'],
-                assignments_df=assignments_df,
-                metrics_dict=metrics_dict,
-                description=f"Cloned from {original['name']} (ID: {scenario_id})",
-                settings=json.loads(original['settings']) if original.get('settings') else None
-            )
+            if not metrics_df.empty:
+                metrics_dict = metrics_df.set_index('worker_name')[
+                    ['total_shifts', 'total_hours', 'night_shifts', 'weekend_shifts', 'festivo_shifts']
+                ].to_dict('index')
+
+            # Create new scenario through the same staged bulk writer as save_assignment_scenario
+            scenario_data = {
+                "name": new_name,
+                "created_by": original['created_by'],
+                "year": original['year'],
+                "description": f"Cloned from {original['name']} (ID: {scenario_id})",
+                "settings": original.get('settings')
+            }
+            new_scenario_id = self._write_scenario(scenario_data, self._scenario_payloads(assignments_df, metrics_dict))
             
             logger.info(f"Cloned scenario {scenario_id} to new scenario {new_scenario_id}")
             return new_scenario_id
@@ -683,30 +867,24 @@ class SupabaseManager:
             logger.error(f"Error fetching assignment calendar for scenario {scenario_id}: {str(e)}")
             return {}
     
-    def get_section_assignments(self, scenario_id: int, section_name: str) -> pd.DataFrame:
+    def get_section_assignments(self, scenario_id: int, section_name: str,
+                                columns: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Get all assignments for a specific section in a scenario
         
         Args:
             scenario_id: ID of the scenario
             section_name: Name of the section
+            columns: Optional list of columns to select (all columns if None)
             
         Returns:
             DataFrame with assignments for the section
         """
         try:
-            response = self.supabase.table("shift_assignments").select("*")\
-                .eq("scenario_id", scenario_id)\
-                .eq("section_name", section_name)\
-                .order("date").execute()
-                
-            df = pd.DataFrame(response.data)
-            
-            # Convert date to datetime
-            if not df.empty and 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date'])
-                
-            return df
+            return concat_assignment_pages(
+                self.iter_assignments(scenario_id, columns, section_name=section_name),
+                columns
+            )
         except Exception as e:
             logger.error(f"Error fetching assignments for section {section_name} in scenario {scenario_id}: {str(e)}")
             return pd.DataFrame()
@@ -764,7 +942,8 @@ class SupabaseManager:
             query = self.supabase.table("festivos").select("*")
             
             if year:
-                query = query.like("date", f"{year}%")
+                # Date range on the column instead of a text pattern match
+                query = query.gte("date", f"{year}-01-01").lte("date", f"{year}-12-31")
                 
             response = query.execute()
             df = pd.DataFrame(response.data)
@@ -816,14 +995,79 @@ class SupabaseManager:
             logger.error(f"Error deleting festivo {date}: {str(e)}")
             return False
 
+def get_db_config() -> Dict[str, Any]:
+    """
+    Read the database backend configuration
+
+    The backend is chosen with the GUARDIAS_DB_BACKEND environment variable or the
+    [database] table of .streamlit/secrets.toml, e.g.:
+
+        [database]
+        backend = "sqlite"              # "supabase" (default) or "sqlite"
+        sqlite_path = "data/guardias.sqlite3"
+        seed = true                     # load data/workers.json and data/sections.csv into an empty file
+        cache_ttl = 300                 # seconds workers/sections/festivos/scenarios stay cached
+        scenario_cache_dir = "data/scenario_cache"  # Parquet copies of scenarios, "" to disable
+
+    Returns:
+        Dictionary with the backend name and its options
+    """
+    config = {}
+    try:
+        if "database" in st.secrets:
+            config = dict(st.secrets["database"])
+    except Exception:
+        # No secrets file available (e.g. offline runs), use the environment only
+        config = {}
+
+    config["backend"] = os.environ.get("GUARDIAS_DB_BACKEND", config.get("backend", "supabase")).lower()
+    config["sqlite_path"] = os.environ.get("GUARDIAS_SQLITE_PATH", config.get("sqlite_path", DEFAULT_SQLITE_PATH))
+    config["scenario_cache_dir"] = os.environ.get("GUARDIAS_SCENARIO_CACHE_DIR",
+                                                  config.get("scenario_cache_dir", DEFAULT_SCENARIO_CACHE_DIR))
+    config["cache_ttl"] = float(os.environ.get("GUARDIAS_CACHE_TTL", config.get("cache_ttl", DEFAULT_CACHE_TTL)))
+    return config
+
+
+def create_db_manager():
+    """
+    Create the database manager for the configured backend
+
+    Returns:
+        SupabaseManager or SQLiteManager instance
+    """
+    config = get_db_config()
+    if config["backend"] == "sqlite":
+        manager = SQLiteManager(config["sqlite_path"])
+        if config.get("seed", False):
+            manager.seed_from_json()
+        return manager
+    if config["backend"] != "supabase":
+        raise ValueError(f"Unknown database backend: {config['backend']}")
+    return SupabaseManager()
+
+
+@st.cache_resource
+def _get_shared_db() -> CachedDBManager:
+    """
+    Build the process-wide database manager, shared by every browser session
+
+    Returns:
+        CachedDBManager wrapping the configured backend
+    """
+    config = get_db_config()
+    scenario_cache = ScenarioParquetCache(config["scenario_cache_dir"]) if config["scenario_cache_dir"] else None
+    return CachedDBManager(create_db_manager(), ttl=config["cache_ttl"], scenario_cache=scenario_cache)
+
+
 # Create a singleton instance
 def get_db():
     """
-    Get or create a database manager instance
-    
+    Get the shared, cached database manager instance
+
+    There is one client per process instead of one per session. Reads of workers,
+    sections, festivos and the scenario list are cached and invalidated on writes.
+
     Returns:
-        SupabaseManager instance
+        CachedDBManager wrapping a SupabaseManager or SQLiteManager
     """
-    if 'db' not in st.session_state:
-        st.session_state.db = SupabaseManager()
-    return st.session_state.db
\ No newline at end of file
+    return _get_shared_db()
@@ -0,0 +1,314 @@
+import datetime
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from utils.section_rules import DatePattern, pattern_version
+
+logger = logging.getLogger(__name__)
+
+# Day labels used by Section.dias, indexed by weekday (0=Monday ... 6=Sunday)
+WEEKDAY_LABELS = np.array(["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"])
+FESTIVO_LABEL = "festivo"
+
+# Compiled matrices kept in memory, keyed by (year range, sections version, festivos version)
+DEMAND_CACHE_SIZE = 16
+_demand_cache = OrderedDict()
+_demand_lock = threading.Lock()
+
+
+def to_datetime64(values: Iterable) -> np.ndarray:
+    """Convert dates given as date objects or YYYY-MM-DD strings to a datetime64[D] array"""
+    if isinstance(values, (pd.Series, pd.Index, np.ndarray)):
+        # Columns (e.g. assignments dates) are converted in one go
+        return pd.to_datetime(pd.Series(values), errors="coerce").to_numpy().astype("datetime64[D]")
+    values = [value for value in (values or []) if value is not None and str(value).strip()]
+    if not values:
+        return np.array([], dtype="datetime64[D]")
+    return pd.to_datetime([str(value).strip()[:10] for value in values]).to_numpy().astype("datetime64[D]")
+
+
+def day_labels(dates: np.ndarray, festivos_list: Iterable) -> np.ndarray:
+    """
+    Day label of each date, as produced by get_day_label
+
+    Args:
+        dates: datetime64[D] array
+        festivos_list: Holiday dates
+
+    Returns:
+        Array of labels ("monday" ... "sunday", or "festivo")
+    """
+    # 1970-01-01 was a Thursday
+    weekdays = (dates.astype("int64") + 3) % 7
+    return np.where(np.isin(dates, to_datetime64(festivos_list)), FESTIVO_LABEL, WEEKDAY_LABELS[weekdays])
+
+
+def sections_version(sections: Sequence, festivos_list: Iterable = ()) -> int:
+    """
+    Fingerprint of the section fields (and holidays) the demand is compiled from
+
+    Args:
+        sections: Section objects
+        festivos_list: Holiday dates
+
+    Returns:
+        Hashable version value
+    """
+    section_part = tuple(
+        (s.nombre, tuple(s.dias or ()), pattern_version(s.fechas), s.personal, s.horas_turno, bool(s.libra))
+        for s in sections
+    )
+    return hash((section_part, tuple(sorted(str(f) for f in (festivos_list or ())))))
+
+
+class DemandMatrix:
+    """
+    Staffing demand of a set of sections over a date range.
+
+    `required[i, j]` tells whether section j has to be covered on date i, and
+    `staff` holds the number of people it needs (its personal, 0 otherwise).
+    Rows follow the dates, columns the order of the sections list.
+    """
+
+    def __init__(self, dates: np.ndarray, sections: Sequence, labels: np.ndarray,
+                 is_festivo: np.ndarray, required: np.ndarray):
+        self.dates = dates
+        self.sections = list(sections)
+        self.section_names = [section.nombre for section in self.sections]
+        self.labels = labels
+        self.is_festivo = is_festivo
+        self.required = required
+        self.personal = np.array([int(section.personal or 0) for section in self.sections], dtype="int64")
+        self.hours = np.array([float(section.horas_turno or 0) for section in self.sections], dtype="float64")
+        self.libra = np.array([bool(section.libra) for section in self.sections], dtype=bool)
+        self._section_index = {name: j for j, name in enumerate(self.section_names)}
+
+    @property
+    def staff(self) -> np.ndarray:
+        """Number of people required per date and section"""
+        return self.required * self.personal
+
+    def section_index(self, section_name: str) -> Optional[int]:
+        """Column of a section, None if it isn't part of the matrix"""
+        return self._section_index.get(section_name)
+
+    def date_index(self, dates) -> np.ndarray:
+        """Row of each date, -1 for dates outside the matrix"""
+        days = to_datetime64(dates)
+        if not len(self.dates):
+            return np.full(len(days), -1, dtype="int64")
+        rows = (days - self.dates[0]).astype("int64")
+        return np.where((rows >= 0) & (rows < len(self.dates)), rows, -1)
+
+    def cell_mask(self, dates, section_names) -> np.ndarray:
+        """
+        Mark the (date, section) cells present in paired date / section columns
+
+        Args:
+            dates: Dates of the records (e.g. the date column of the assignments)
+            section_names: Section name of each record
+
+        Returns:
+            Boolean matrix shaped like required
+        """
+        mask = np.zeros_like(self.required)
+        if len(dates) == 0:
+            return mask
+        rows = self.date_index(dates)
+        columns = np.array([self._section_index.get(name, -1) for name in section_names], dtype="int64")
+        valid = (rows >= 0) & (columns >= 0)
+        mask[rows[valid], columns[valid]] = True
+        return mask
+
+    def _date_mask(self, start_date=None, end_date=None) -> np.ndarray:
+        """Rows between start and end (inclusive)"""
+        mask = np.ones(len(self.dates), dtype=bool)
+        if start_date is not None:
+            mask &= self.dates >= np.datetime64(str(start_date)[:10], "D")
+        if end_date is not None:
+            mask &= self.dates <= np.datetime64(str(end_date)[:10], "D")
+        return mask
+
+    def slice(self, start_date=None, end_date=None, section_names: Optional[Iterable[str]] = None) -> "DemandMatrix":
+        """
+        Sub-matrix for a date range and/or a subset of sections
+
+        Args:
+            start_date: Optional first date (inclusive)
+            end_date: Optional last date (inclusive)
+            section_names: Optional sections to keep, in the given order
+
+        Returns:
+            DemandMatrix sharing no state with this one
+        """
+        rows = self._date_mask(start_date, end_date)
+        if section_names is None:
+            columns = list(range(len(self.sections)))
+        else:
+            columns = [self._section_index[name] for name in section_names if name in self._section_index]
+        return DemandMatrix(self.dates[rows], [self.sections[j] for j in columns], self.labels[rows],
+                            self.is_festivo[rows], self.required[np.ix_(rows, columns)])
+
+    def shifts(self, start_date=None, end_date=None) -> List[Tuple[datetime.date, object]]:
+        """
+        Every (date, section) pair to cover, by date and then section order
+
+        Args:
+            start_date: Optional first date (inclusive)
+            end_date: Optional last date (inclusive)
+
+        Returns:
+            List of (datetime.date, Section) tuples
+        """
+        rows = np.flatnonzero(self._date_mask(start_date, end_date))
+        date_idx, section_idx = np.nonzero(self.required[rows])
+        dates = self.dates[rows][date_idx].tolist()
+        return [(dates[k], self.sections[j]) for k, j in enumerate(section_idx.tolist())]
+
+    def to_frame(self, month: Optional[int] = None) -> pd.DataFrame:
+        """
+        Long DataFrame of the demand, one row per (date, section) to cover
+
+        Args:
+            month: Optional month number to keep
+
+        Returns:
+            DataFrame with date, day, month, weekday, shift_name, hours, personnel, libra, is_festivo
+        """
+        rows = np.ones(len(self.dates), dtype=bool)
+        if month:
+            rows &= self.dates.astype("datetime64[M]").astype("int64") % 12 + 1 == month
+        date_idx, section_idx = np.nonzero(self.required[rows])
+        dates = pd.DatetimeIndex(self.dates[rows][date_idx])
+        return pd.DataFrame({
+            "date": dates.date,
+            "day": dates.day.to_numpy(),
+            "month": dates.month.to_numpy(),
+            "weekday": self.labels[rows][date_idx],
+            "shift_name": np.array(self.section_names, dtype=object)[section_idx],
+            "hours": self.hours[section_idx],
+            "personnel": self.personal[section_idx],
+            "libra": self.libra[section_idx],
+            "is_festivo": self.is_festivo[rows][date_idx],
+        })
+
+
+def build_demand_matrix(sections: Sequence, start_date, end_date, festivos_list: Iterable = ()) -> DemandMatrix:
+    """
+    Compile sections against the calendar into a DemandMatrix
+
+    A section applies on a date when the date's label (weekday or "festivo") is
+    in its dias and, if it has a date pattern (fechas), the pattern matches the
+    date. Each section is resolved with an isin mask and the cached year
+    bitmaps of its pattern.
+
+    Args:
+        sections: Section objects (nombre, dias, fechas, personal, horas_turno, libra)
+        start_date: First date (inclusive)
+        end_date: Last date (inclusive)
+        festivos_list: Holiday dates
+
+    Returns:
+        DemandMatrix over every date of the range
+    """
+    start = np.datetime64(str(start_date)[:10], "D")
+    end = np.datetime64(str(end_date)[:10], "D")
+    dates = np.arange(start, end + 1, dtype="datetime64[D]")
+    labels = day_labels(dates, festivos_list)
+    is_festivo = labels == FESTIVO_LABEL
+
+    required = np.zeros((len(dates), len(sections)), dtype=bool)
+    for j, section in enumerate(sections):
+        mask = np.isin(labels, list(section.dias or []))
+        pattern = DatePattern.from_value(section.fechas)
+        if pattern is not None:
+            mask &= pattern.mask(dates)
+        required[:, j] = mask
+
+    return DemandMatrix(dates, sections, labels, is_festivo, required)
+
+
+def get_demand_matrix(sections: Sequence, start_year: int, end_year: Optional[int] = None,
+                      festivos_list: Iterable = ()) -> DemandMatrix:
+    """
+    Get the demand of whole years, compiled once per (year range, sections version)
+
+    Args:
+        sections: Section objects
+        start_year: First year
+        end_year: Last year (inclusive), start_year by default
+        festivos_list: Holiday dates
+
+    Returns:
+        Cached DemandMatrix (treat it as read-only)
+    """
+    end_year = end_year or start_year
+    key = (start_year, end_year, sections_version(sections, festivos_list))
+    with _demand_lock:
+        matrix = _demand_cache.get(key)
+        if matrix is not None:
+            _demand_cache.move_to_end(key)
+            return matrix
+
+    matrix = build_demand_matrix(sections, datetime.date(start_year, 1, 1),
+                                 datetime.date(end_year, 12, 31), festivos_list)
+    with _demand_lock:
+        _demand_cache[key] = matrix
+        while len(_demand_cache) > DEMAND_CACHE_SIZE:
+            _demand_cache.popitem(last=False)
+    return matrix
+
+
+def get_period_demand(sections: Sequence, start_date, end_date, festivos_list: Iterable = ()) -> DemandMatrix:
+    """
+    Demand between two dates, sliced from the cached matrix of the years they span
+
+    Args:
+        sections: Section objects
+        start_date: First date (inclusive)
+        end_date: Last date (inclusive)
+        festivos_list: Holiday dates
+
+    Returns:
+        DemandMatrix over the period
+    """
+    start = pd.Timestamp(str(start_date)[:10])
+    end = pd.Timestamp(str(end_date)[:10])
+    return get_demand_matrix(sections, start.year, end.year, festivos_list).slice(start_date, end_date)
+
+
+def uncovered_slots(demand: DemandMatrix, assignments_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Required (date, section) slots with no assignment in the ledger
+
+    Both sides are keyed by (date ordinal, section id) and the ledger keys are
+    removed from the demand keys with a single isin, i.e. one anti-join.
+
+    Args:
+        demand: DemandMatrix of the period
+        assignments_df: Ledger of assignments (date, section_name)
+
+    Returns:
+        DataFrame with date, weekday, is_festivo and section_name per uncovered slot
+    """
+    n_sections = max(len(demand.sections), 1)
+    date_idx, section_idx = np.nonzero(demand.required)
+    demand_keys = date_idx * n_sections + section_idx
+
+    if assignments_df is not None and not assignments_df.empty:
+        rows = demand.date_index(assignments_df['date'])
+        columns = assignments_df['section_name'].map(demand.section_index).fillna(-1).astype("int64").to_numpy()
+        valid = (rows >= 0) & (columns >= 0)
+        ledger_keys = rows[valid] * n_sections + columns[valid]
+        missing = ~np.isin(demand_keys, ledger_keys)
+        date_idx, section_idx = date_idx[missing], section_idx[missing]
+
+    return pd.DataFrame({
+        "date": pd.DatetimeIndex(demand.dates[date_idx]).date,
+        "weekday": demand.labels[date_idx],
+        "is_festivo": demand.is_festivo[date_idx],
+        "section_name": np.array(demand.section_names, dtype=object)[section_idx],
+    })
@@ -0,0 +1,124 @@
+import logging
+from typing import Callable, Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from utils.worker import WEEKDAY_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Sections whose Monday-Thursday shifts only go to workers with that weekday assigned for the section's category
+ASSIGNED_WEEKDAY_SECTIONS = ("UCI_G_lab", "Coordis_nocturno", "Coordis_diurno", "HEMS_tarde", "Urg_G_noche_l")
+
+
+class EligibilityIndex:
+    """
+    Static eligibility of every worker per (section, weekday).
+
+    Compiled once per run from the parts of eligibility that do not change
+    during the search: active state, the section's area, the Monday-Thursday
+    assigned weekdays and the worker's section-day constraints. Each section
+    gets a (7 x workers) boolean mask, so the check in the search loops is one
+    lookup. The candidates removed by section-day constraints are kept apart
+    for the feasibility report.
+    """
+
+    def __init__(self, workers: Sequence, sections: Sequence, required_category: Callable):
+        """
+        Args:
+            workers: CompiledWorker list
+            sections: Sections to index
+            required_category: Area a section needs (None when it has none)
+        """
+        self.worker_names = [worker.name for worker in workers]
+        self._worker_column = {name: j for j, name in enumerate(self.worker_names)}
+        self._masks: Dict[str, np.ndarray] = {}
+        self._removed: Dict[str, np.ndarray] = {}
+
+        active = np.array([worker.state == "Alta" for worker in workers], dtype=bool)
+        for section in sections:
+            category = required_category(section)
+            masks = np.zeros((len(WEEKDAY_NAMES), len(self.worker_names)), dtype=bool)
+            removed = np.zeros_like(masks)
+            if category is not None:
+                in_area = active & np.array([worker.can_work_in_area(category) for worker in workers], dtype=bool)
+                # Bit d of each constraint mask is set when the worker can't do the section on weekday d
+                constrained = np.array([getattr(worker, 'section_day_masks', {}).get(section.nombre, 0)
+                                        for worker in workers], dtype="int64")
+                for weekday in range(len(WEEKDAY_NAMES)):
+                    base = in_area.copy()
+                    if weekday <= 3 and section.nombre in ASSIGNED_WEEKDAY_SECTIONS:
+                        base &= np.array([worker.has_assigned_weekday(category, weekday) for worker in workers],
+                                         dtype=bool)
+                    blocked = ((constrained >> weekday) & 1).astype(bool)
+                    masks[weekday] = base & ~blocked
+                    removed[weekday] = base & blocked
+            self._masks[section.nombre] = masks
+            self._removed[section.nombre] = removed
+
+        for worker in workers:
+            unknown = set(getattr(worker, 'section_day_constraints', None) or {}) - set(self._masks)
+            if unknown:
+                logger.warning(f"Section-day constraints of {worker.name} name unknown sections: {sorted(unknown)}")
+
+    def allows(self, section_name: str, weekday: int, worker_name: str) -> bool:
+        """Check if the worker can ever do the section on that weekday (0=Monday)"""
+        masks = self._masks.get(section_name)
+        column = self._worker_column.get(worker_name)
+        return masks is not None and column is not None and bool(masks[weekday, column])
+
+    def mask(self, section_name: str, weekday: int, worker_names: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Eligible workers of a section on a weekday
+
+        Args:
+            section_name: Section name
+            weekday: Weekday (0=Monday)
+            worker_names: Columns of the result, the indexed workers by default
+
+        Returns:
+            Boolean array, one value per worker
+        """
+        masks = self._masks.get(section_name)
+        if worker_names is None:
+            return masks[weekday].copy() if masks is not None else np.zeros(len(self.worker_names), dtype=bool)
+        if masks is None:
+            return np.zeros(len(worker_names), dtype=bool)
+        columns = np.array([self._worker_column.get(name, -1) for name in worker_names], dtype="int64")
+        return np.where(columns >= 0, masks[weekday, np.maximum(columns, 0)], False)
+
+    def candidate_count(self, section_name: str, weekday: int) -> int:
+        """Workers that can ever do the section on that weekday"""
+        masks = self._masks.get(section_name)
+        return int(masks[weekday].sum()) if masks is not None else 0
+
+    def feasibility_report(self, demand) -> pd.DataFrame:
+        """
+        Candidates of every (section, weekday) demanded in a period, before solving
+
+        Args:
+            demand: DemandMatrix of the period
+
+        Returns:
+            DataFrame with section_name, weekday, shifts (demanded), candidates
+            and removed_by_constraints (candidates taken out by section-day
+            constraints), one row per demanded pair
+        """
+        columns = ['section_name', 'weekday', 'shifts', 'candidates', 'removed_by_constraints']
+        if not len(demand.dates):
+            return pd.DataFrame(columns=columns)
+        # 1970-01-01 was a Thursday
+        weekdays = (demand.dates.astype("datetime64[D]").astype("int64") + 3) % 7
+        rows = []
+        for j, section_name in enumerate(demand.section_names):
+            shifts = np.bincount(weekdays[demand.required[:, j]], minlength=len(WEEKDAY_NAMES))
+            masks = self._masks.get(section_name)
+            removed = self._removed.get(section_name)
+            for weekday in np.flatnonzero(shifts).tolist():
+                rows.append({
+                    'section_name': section_name,
+                    'weekday': WEEKDAY_NAMES[weekday],
+                    'shifts': int(shifts[weekday]),
+                    'candidates': int(masks[weekday].sum()) if masks is not None else 0,
+                    'removed_by_constraints': int(removed[weekday].sum()) if removed is not None else 0,
+                })
+        return pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,306 @@
+import logging
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from utils.holidays import get_holidays
+
+logger = logging.getLogger(__name__)
+
+# Background colours of the monthly assignments sheets
+WEEKEND_COLOR = "#FFF8E1"
+FESTIVO_COLOR = "#F8D7DA"
+ALT_ROW_COLOR = "#F6F8FA"
+SECTION_PALETTE = [
+    "#E8F5E9", "#E3F2FD", "#FFF8E1", "#F3E5F5", "#E0F7FA", "#FFF3E0", "#EDE7F6",
+    "#F1F8E9", "#F9FBE7", "#E8EAF6", "#FCE4EC", "#E0F2F1"
+]
+
+
+class AssignmentFormatPool:
+    """
+    Pre-built xlsxwriter formats for the monthly assignments sheets.
+
+    Cell formats are keyed by (is_weekend, is_festivo, is_alt_row) and section
+    label formats by palette index, so a workbook holds a handful of styles
+    whatever the number of cells.
+    """
+
+    def __init__(self, workbook):
+        self.header = workbook.add_format({"bold": True, "align": "center", "valign": "vcenter"})
+        self.header_date = workbook.add_format({"bold": True, "align": "center", "valign": "vcenter", "num_format": "dd-mmm"})
+        self.header_dow = workbook.add_format({"align": "center", "valign": "vcenter", "font_color": "#555555",
+                                               "bottom": 1, "bottom_color": "#DDDDDD"})
+        self.header_blank = workbook.add_format({"bold": True, "align": "center", "valign": "vcenter",
+                                                 "bottom": 1, "bottom_color": "#DDDDDD"})
+        self.sections = [workbook.add_format({"bold": True, "bg_color": color}) for color in SECTION_PALETTE]
+        self.cells = {}
+        for is_weekend in (False, True):
+            for is_festivo in (False, True):
+                for is_alt_row in (False, True):
+                    properties = {"text_wrap": True, "valign": "top"}
+                    if is_festivo:
+                        properties["bg_color"] = FESTIVO_COLOR
+                    elif is_weekend:
+                        properties["bg_color"] = WEEKEND_COLOR
+                    elif is_alt_row:
+                        properties["bg_color"] = ALT_ROW_COLOR
+                    self.cells[(is_weekend, is_festivo, is_alt_row)] = workbook.add_format(properties)
+
+    def section(self, index: int):
+        """Format of the section label in the given row"""
+        return self.sections[index % len(self.sections)]
+
+    def cell(self, is_weekend: bool, is_festivo: bool, is_alt_row: bool):
+        """Format of an assignment cell"""
+        return self.cells[(bool(is_weekend), bool(is_festivo), bool(is_alt_row))]
+
+
+def _sheet_name(name: str, used: set) -> str:
+    """Valid, unique worksheet name (max 31 characters, no []:*?/\\)"""
+    for char in '[]:*?/\\':
+        name = name.replace(char, "_")
+    name = name[:31]
+    candidate, n = name, 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate = name[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def generate_monthly_assignments_excel_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Build the monthly assignments workbook (one sheet per month, sections x days)
+    and return it as bytes for Streamlit's download button.
+
+    Formats come from an AssignmentFormatPool, the weekend/festivo flags of each
+    month are precomputed as arrays, and rows are written in order in
+    xlsxwriter's constant_memory mode so only the current row is kept in memory.
+    Frames with several scenarios get one set of sheets per scenario.
+
+    Args:
+        df: Assignments with date, day_of_week, section_name, worker_name, libra, is_festivo
+
+    Returns:
+        The .xlsx file as bytes
+    """
+    required = {"date", "day_of_week", "section_name", "worker_name", "libra", "is_festivo"}
+    missing = required - set(df.columns)
+    if missing:
+        raise ValueError(f"DataFrame missing required columns: {sorted(missing)}")
+
+    dates_col = pd.to_datetime(df["date"]).dt.normalize()
+    worker_display = np.where(df["libra"].fillna(False).astype(bool),
+                              df["worker_name"].astype(str) + " (L)", df["worker_name"].astype(str))
+    data = pd.DataFrame({
+        "date": dates_col.to_numpy(),
+        "section_name": df["section_name"].astype(str).to_numpy(),
+        "worker_display": worker_display,
+        "is_festivo": df["is_festivo"].fillna(False).astype(bool).to_numpy(),
+        "month_key": dates_col.dt.to_period("M").astype(str).to_numpy(),
+    })
+    multi_scenario = "scenario_id" in df.columns and df["scenario_id"].nunique() > 1
+    data["scenario_id"] = df["scenario_id"].to_numpy() if multi_scenario else None
+
+    # Festivo flag per date: the rows' flags plus the holiday calendar (days without assignments too)
+    festivo_dates = set(data.loc[data["is_festivo"], "date"])
+    holidays = get_holidays()
+
+    buf = BytesIO()
+    workbook = xlsxwriter.Workbook(buf, {"constant_memory": True})
+    formats = AssignmentFormatPool(workbook)
+    used_names = set()
+
+    group_keys = ["scenario_id", "month_key"] if multi_scenario else ["month_key"]
+    for keys, dfm in data.groupby(group_keys, sort=True):
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        month_key = keys[-1]
+        title = f"S{keys[0]} {month_key}" if multi_scenario else month_key
+
+        month_first = pd.Timestamp(month_key + "-01")
+        dates = pd.date_range(month_first, month_first + pd.offsets.MonthEnd(0), freq="D")
+        is_weekend = (dates.weekday >= 5)
+        is_festivo = holidays.mask(dates.to_numpy()) | np.array([d in festivo_dates for d in dates])
+
+        joined = (
+            dfm.groupby(["section_name", "date"])["worker_display"]
+               .agg(lambda s: ", ".join(sorted(set(s))))
+               .unstack(fill_value="")
+               .reindex(columns=dates, fill_value="")
+        )
+        sections = list(joined.index)
+        values = joined.to_numpy(dtype=object)
+
+        ws = workbook.add_worksheet(_sheet_name(title, used_names))
+
+        # Column widths and frozen panes are set up front (rows can't be revisited in constant_memory)
+        start_row, start_col = 3, 0
+        sec_width = max([len("Section")] + [len(s) for s in sections]) + 2
+        ws.set_column(start_col, start_col, min(max(sec_width, 12), 32))
+        for j, d in enumerate(dates):
+            longest = max([len(d.strftime("%d-%b")), len("Wed")] + [len(str(v)) for v in values[:, j]]) + 2
+            ws.set_column(start_col + 1 + j, start_col + 1 + j, min(max(10, longest), 22))
+        ws.freeze_panes(start_row + 2, start_col + 1)
+
+        ws.write(0, 0, f"Assignments — {title}", formats.header)
+
+        ws.set_row(start_row, 20)
+        ws.write(start_row, start_col, "Section", formats.header)
+        for j, d in enumerate(dates, start=start_col + 1):
+            ws.write_datetime(start_row, j, d.to_pydatetime(), formats.header_date)
+
+        ws.set_row(start_row + 1, 16)
+        ws.write(start_row + 1, start_col, "", formats.header_blank)
+        for j, d in enumerate(dates, start=start_col + 1):
+            ws.write_string(start_row + 1, j, d.strftime("%a"), formats.header_dow)
+
+        for i, section in enumerate(sections):
+            row = start_row + 2 + i
+            is_alt_row = i % 2 == 1
+            ws.write_string(row, start_col, section, formats.section(i))
+            row_values = values[i]
+            for j in range(len(dates)):
+                ws.write_string(row, start_col + 1 + j, row_values[j],
+                                formats.cell(is_weekend[j], is_festivo[j], is_alt_row))
+
+    workbook.close()
+    buf.seek(0)
+    return buf.getvalue()
+
+
+# Annual calendar colours: one per weekday (0=Monday ... 6=Sunday) plus festivos
+WEEKDAY_COLORS = ["#C6EFCE", "#B8CCE4", "#FFFFCC", "#E6B8B7", "#D8E4BC", "#CCC0DA", "#FAC090"]
+CALENDAR_FESTIVO_COLOR = "#FF0000"
+FESTIVO_FILL = len(WEEKDAY_COLORS)
+
+SPANISH_WEEKDAYS = {
+    "monday": "Lunes",
+    "tuesday": "Martes",
+    "wednesday": "Miércoles",
+    "thursday": "Jueves",
+    "friday": "Viernes",
+    "saturday": "Sábado",
+    "sunday": "Domingo",
+    "festivo": "Festivo"
+}
+
+CALENDAR_HEADERS = ["Fecha", "Día de la semana", "Turno"]
+
+
+class CalendarFormatPool:
+    """
+    Pre-built xlsxwriter formats for the annual calendar sheets.
+
+    One fill per weekday plus festivo, each in a plain version (Turno column
+    and single-shift days) and a centered one (merged Fecha / Día cells).
+    """
+
+    def __init__(self, workbook):
+        self.header = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        colors = WEEKDAY_COLORS + [CALENDAR_FESTIVO_COLOR]
+        self.plain = [workbook.add_format({"bg_color": color}) for color in colors]
+        self.centered = [workbook.add_format({"bg_color": color, "align": "center", "valign": "vcenter"})
+                         for color in colors]
+
+
+def _calendar_month_frame(month_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the rows of one month sheet with vectorized columns
+
+    Returns:
+        DataFrame with Fecha, Día de la semana, Turno, the fill index of each row,
+        and the first row / length of the date group each row belongs to
+    """
+    dates = month_df["date"]
+    fill = np.where(month_df["is_festivo"].fillna(False).astype(bool).to_numpy(),
+                    FESTIVO_FILL, dates.dt.weekday.to_numpy())
+    frame = pd.DataFrame({
+        "Fecha": dates.dt.strftime("%Y-%m-%d").to_numpy(),
+        "Día de la semana": month_df["weekday"].astype(str).to_numpy(),
+        "Turno": month_df["shift_name"].astype(str).to_numpy(),
+        "fill": fill,
+    })
+    # Consecutive rows sharing date and weekday are merged in the Fecha / Día columns
+    new_group = ((frame["Fecha"] != frame["Fecha"].shift())
+                 | (frame["Día de la semana"] != frame["Día de la semana"].shift()))
+    group_id = new_group.cumsum()
+    frame["group_size"] = group_id.map(group_id.value_counts()).to_numpy()
+    frame["group_start"] = new_group.to_numpy()
+    return frame
+
+
+def create_calendar_excel(df_year: pd.DataFrame) -> bytes | None:
+    """
+    Create the annual calendar workbook (one sheet per month) as bytes.
+
+    Rows are written in order with xlsxwriter and a shared CalendarFormatPool;
+    the Fecha / Día cells of each date are merged with merge_range() as its
+    first row is written. Frames spanning several years get one sheet per
+    month and year.
+
+    Args:
+        df_year: DataFrame with date, weekday, shift_name and is_festivo
+
+    Returns:
+        The .xlsx file as bytes, or None if there's no data
+    """
+    required_cols = {"date", "weekday", "shift_name", "is_festivo"}
+    missing = required_cols - set(df_year.columns)
+    if missing:
+        raise ValueError(f"Missing required columns: {sorted(missing)}")
+
+    if df_year.empty:
+        return None
+
+    df = df_year[["date", "weekday", "shift_name", "is_festivo"]].copy()
+    df["date"] = pd.to_datetime(df["date"])
+    df["weekday"] = df["weekday"].map(lambda day: SPANISH_WEEKDAYS.get(str(day).lower(), day))
+    df = df.sort_values(["date", "shift_name"], kind="stable")
+    multi_year = df["date"].dt.year.nunique() > 1
+
+    buf = BytesIO()
+    # Not in constant_memory mode: merge_range() writes the rows of a date group ahead of the current one
+    workbook = xlsxwriter.Workbook(buf)
+    formats = CalendarFormatPool(workbook)
+    used_names = set()
+
+    for (year, month), month_df in df.groupby([df["date"].dt.year, df["date"].dt.month], sort=True):
+        frame = _calendar_month_frame(month_df)
+        month_name = month_df["date"].iloc[0].month_name()
+        ws = workbook.add_worksheet(_sheet_name(f"{month_name} {year}" if multi_year else month_name, used_names))
+
+        # Column widths (capped at 50) and frozen header are set before writing any row
+        for col, header in enumerate(CALENDAR_HEADERS):
+            width = max(len(header), int(frame[header].str.len().max()))
+            ws.set_column(col, col, min(width + 2, 50))
+        ws.freeze_panes(1, 0)
+
+        for col, header in enumerate(CALENDAR_HEADERS):
+            ws.write_string(0, col, header, formats.header)
+
+        fechas = frame["Fecha"].to_numpy()
+        weekdays = frame["Día de la semana"].to_numpy()
+        turnos = frame["Turno"].to_numpy()
+        fills = frame["fill"].to_numpy()
+        group_sizes = frame["group_size"].to_numpy()
+        group_starts = frame["group_start"].to_numpy()
+
+        for i in range(len(frame)):
+            row = i + 1
+            fill = fills[i]
+            ws.set_row(row, 25)
+            if group_starts[i]:
+                if group_sizes[i] > 1:
+                    last_row = row + group_sizes[i] - 1
+                    ws.merge_range(row, 0, last_row, 0, fechas[i], formats.centered[fill])
+                    ws.merge_range(row, 1, last_row, 1, weekdays[i], formats.centered[fill])
+                else:
+                    ws.write_string(row, 0, fechas[i], formats.plain[fill])
+                    ws.write_string(row, 1, weekdays[i], formats.plain[fill])
+            ws.write_string(row, 2, turnos[i], formats.plain[fill])
+
+    workbook.close()
+    buf.seek(0)
+    return buf.getvalue()
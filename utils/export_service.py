@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Total size of the cached workbooks before the least recently used ones are dropped
+DEFAULT_EXPORT_CACHE_BYTES = 64 * 1024 * 1024
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def hash_export_input(kind: str, data: Optional[pd.DataFrame] = None, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Content hash of an export request (kind + input data + options)
+
+    Args:
+        kind: Name of the export (e.g. "annual_calendar")
+        data: Input DataFrame, hashed by content
+        options: Export options that change the output
+
+    Returns:
+        Hex digest identifying the workbook
+    """
+    digest = hashlib.sha1(kind.encode())
+    if data is not None:
+        digest.update(repr(list(data.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    if options:
+        digest.update(repr(sorted(options.items())).encode())
+    return digest.hexdigest()
+
+
+class ExcelExportService:
+    """
+    Builds export workbooks on demand in a background thread and keeps the bytes
+    in an LRU cache bounded by their total size.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_EXPORT_CACHE_BYTES, max_workers: int = 1):
+        self.max_bytes = max_bytes
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cached_bytes = 0
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="excel-export")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the workbook bytes if they are ready, None otherwise"""
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+            return data
+
+    def is_pending(self, key: str) -> bool:
+        """Whether the workbook is being generated"""
+        with self._lock:
+            return key in self._pending
+
+    def submit(self, key: str, build: Callable[[], Optional[bytes]]) -> Future:
+        """
+        Start generating a workbook in the background (no-op if cached or already running)
+
+        Args:
+            key: Content hash from hash_export_input
+            build: Callable returning the workbook bytes
+
+        Returns:
+            Future resolving to the bytes
+        """
+        with self._lock:
+            if key in self._cache:
+                future = Future()
+                future.set_result(self._cache[key])
+                return future
+            if key in self._pending:
+                return self._pending[key]
+            future = self._executor.submit(self._build, key, build)
+            self._pending[key] = future
+            return future
+
+    def _build(self, key: str, build: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """Run a build and store its result"""
+        try:
+            data = build()
+            if data:
+                self._store(key, data)
+            return data
+        except Exception as e:
+            logger.error(f"Error generating export {key}: {str(e)}")
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _store(self, key: str, data: bytes) -> None:
+        """Insert bytes in the LRU, evicting old entries past the byte budget"""
+        with self._lock:
+            if key in self._cache:
+                self._cached_bytes -= len(self._cache.pop(key))
+            self._cache[key] = data
+            self._cached_bytes += len(data)
+            while self._cached_bytes > self.max_bytes and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+
+
+_export_service: Optional[ExcelExportService] = None
+_export_service_lock = threading.Lock()
+
+
+def get_export_service() -> ExcelExportService:
+    """
+    Get the process-wide export service
+
+    Returns:
+        ExcelExportService instance shared by every session
+    """
+    global _export_service
+    with _export_service_lock:
+        if _export_service is None:
+            _export_service = ExcelExportService()
+        return _export_service
+
+
+def excel_download_button(label: str, file_name: str, kind: str, data: Optional[pd.DataFrame],
+                          build: Callable[[], Optional[bytes]], options: Optional[Dict[str, Any]] = None,
+                          key: Optional[str] = None) -> None:
+    """
+    Show a download button for a workbook that is only generated when asked for
+
+    The first click starts the generation in the background; once the bytes are
+    ready (now or on a later rerun) a regular download button is shown.
+
+    Args:
+        label: Label of the download button
+        file_name: Name of the downloaded file
+        kind: Name of the export, part of the cache key
+        data: Input DataFrame, part of the cache key
+        build: Callable returning the workbook bytes
+        options: Export options, part of the cache key
+        key: Optional Streamlit widget key
+    """
+    import streamlit as st
+
+    service = get_export_service()
+    export_key = hash_export_input(kind, data, options)
+    widget_key = key or f"export_{kind}"
+
+    data_bytes = service.get(export_key)
+    if data_bytes is None and not service.is_pending(export_key):
+        if st.button(f"⚙️ Prepara: {label}", key=f"{widget_key}_prepare", use_container_width=True):
+            future = service.submit(export_key, build)
+            try:
+                # Small exports are usually ready right away; larger ones finish in the background
+                data_bytes = future.result(timeout=1)
+            except Exception:
+                data_bytes = service.get(export_key)
+
+    if data_bytes:
+        st.download_button(
+            label=label,
+            data=data_bytes,
+            file_name=file_name,
+            mime=EXCEL_MIME,
+            use_container_width=True,
+            key=f"{widget_key}_download",
+        )
+    elif service.is_pending(export_key):
+        st.info("S'està generant l'Excel en segon pla...")
+        st.button("🔄 Comprova si ja està llest", key=f"{widget_key}_refresh")
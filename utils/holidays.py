@@ -0,0 +1,189 @@
+import datetime
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _to_date(value) -> Optional[datetime.date]:
+    """Convert a festivo value (date, datetime, Timestamp or YYYY-MM-DD string) to a date"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        logger.warning(f"Could not parse festivo date '{value}'")
+        return None
+
+
+def _load_from_db() -> Iterable:
+    """Festivo dates of every year from the shared data layer"""
+    from utils.db import get_db
+
+    festivos_df = get_db().get_festivos()
+    if festivos_df is None or festivos_df.empty or 'date' not in festivos_df.columns:
+        return []
+    return festivos_df['date'].tolist()
+
+
+def _bundled_festivos() -> Iterable:
+    """Holidays shipped with the code, used when the festivos table is empty or unreachable"""
+    from utils.sections import festivos
+
+    return festivos
+
+
+class HolidayCalendar:
+    """
+    Holidays indexed by year.
+
+    Loaded once from the data layer (or the bundled list as a fallback) and
+    kept as one frozenset of dates and one day-of-year bitmap per year, so
+    checking a date is a set or array lookup. `version` changes on every
+    invalidation and can be used in cache keys.
+    """
+
+    def __init__(self, loader: Optional[Callable[[], Iterable]] = None,
+                 fallback: Optional[Callable[[], Iterable]] = None):
+        self._loader = loader or _load_from_db
+        self._fallback = fallback or _bundled_festivos
+        self._lock = threading.Lock()
+        self._by_year: Optional[Dict[int, frozenset]] = None
+        self._all = frozenset()
+        self._masks: Dict[int, np.ndarray] = {}
+        self.version = 0
+
+    def _ensure_loaded(self) -> Dict[int, frozenset]:
+        """Load the festivos on first use and return them by year"""
+        by_year = self._by_year
+        if by_year is not None:
+            return by_year
+        with self._lock:
+            if self._by_year is not None:
+                return self._by_year
+            try:
+                values = list(self._loader())
+            except Exception as e:
+                logger.error(f"Error loading festivos: {str(e)}")
+                values = []
+            if not values:
+                logger.info("No festivos in the database, using the bundled list")
+                values = list(self._fallback())
+
+            by_year = {}
+            for day in filter(None, map(_to_date, values)):
+                by_year.setdefault(day.year, set()).add(day)
+            self._by_year = {year: frozenset(days) for year, days in by_year.items()}
+            self._all = frozenset().union(*self._by_year.values()) if self._by_year else frozenset()
+            self._masks = {}
+            logger.info(f"Loaded {len(self._all)} festivos for years {sorted(self._by_year)}")
+            return self._by_year
+
+    def invalidate(self) -> None:
+        """Drop the loaded festivos; the next lookup reloads them"""
+        with self._lock:
+            self._by_year = None
+            self._all = frozenset()
+            self._masks = {}
+            self.version += 1
+
+    def year(self, year: int) -> frozenset:
+        """Festivos of a year"""
+        return self._ensure_loaded().get(year, frozenset())
+
+    def dates(self, start_year: Optional[int] = None, end_year: Optional[int] = None) -> frozenset:
+        """
+        Festivos of a range of years
+
+        Args:
+            start_year: First year, every loaded year when omitted
+            end_year: Last year (inclusive), start_year by default
+
+        Returns:
+            Frozenset of dates
+        """
+        self._ensure_loaded()
+        if start_year is None:
+            return self._all
+        end_year = end_year or start_year
+        if start_year == end_year:
+            return self.year(start_year)
+        return frozenset().union(*(self.year(year) for year in range(start_year, end_year + 1)))
+
+    def is_festivo(self, day) -> bool:
+        """Check if a date (or YYYY-MM-DD string) is a festivo"""
+        day = _to_date(day)
+        return day is not None and day in self.year(day.year)
+
+    def year_mask(self, year: int) -> np.ndarray:
+        """
+        Bitmap of a year, one boolean per day from January 1st
+
+        Args:
+            year: Year
+
+        Returns:
+            Read-only boolean array
+        """
+        mask = self._masks.get(year)
+        if mask is None:
+            first_ordinal = datetime.date(year, 1, 1).toordinal()
+            mask = np.zeros(datetime.date(year, 12, 31).toordinal() - first_ordinal + 1, dtype=bool)
+            days = [day.toordinal() - first_ordinal for day in self.year(year)]
+            mask[days] = True
+            mask.setflags(write=False)
+            self._masks[year] = mask
+        return mask
+
+    def mask(self, dates) -> np.ndarray:
+        """
+        Whether each date of a datetime64[D] array (or date column) is a festivo
+
+        Args:
+            dates: datetime64 array, Series or list of dates
+
+        Returns:
+            Boolean array of the same length
+        """
+        dates = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy().astype("datetime64[D]")
+        result = np.zeros(len(dates), dtype=bool)
+        valid = ~np.isnat(dates)
+        if not valid.any():
+            return result
+        years = dates.astype("datetime64[Y]").astype("int64") + 1970
+        for year in np.unique(years[valid]).tolist():
+            in_year = valid & (years == year)
+            day_of_year = (dates[in_year] - np.datetime64(f"{year:04d}-01-01")).astype("int64")
+            result[in_year] = self.year_mask(year)[day_of_year]
+        return result
+
+
+_holidays: Optional[HolidayCalendar] = None
+_holidays_lock = threading.Lock()
+
+
+def get_holidays() -> HolidayCalendar:
+    """
+    Get the process-wide holiday calendar
+
+    Returns:
+        HolidayCalendar shared by every session
+    """
+    global _holidays
+    with _holidays_lock:
+        if _holidays is None:
+            _holidays = HolidayCalendar()
+        return _holidays
+
+
+def invalidate_holidays() -> None:
+    """Reload the festivos on next use (called after create_festivo / delete_festivo)"""
+    if _holidays is not None:
+        _holidays.invalidate()
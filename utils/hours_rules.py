@@ -0,0 +1,73 @@
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Per-section rules for the hours a guard counts towards a worker's total.
+# Sections without a rule count their horas_turno.
+#   hours:     hours counted when the rule applies
+#   weekdays:  only count on these weekdays (0=Monday ... 6=Sunday), 0 hours otherwise
+#   same_day:  (section, hours) -> count these hours instead when that section is also
+#              assigned on the same date
+HOURS_RULES = {
+    'UCI_G_lab': {'hours': 7},
+    'UCI_G_festivo': {'hours': 24, 'same_day': ('HEMS_festivo', 16)},
+    'HEMS_festivo': {'hours': 16},
+    'Coordis_diurno': {'hours': 12, 'weekdays': (5, 6)},
+    'Coordis_nocturno': {'hours': 12, 'weekdays': (4, 5, 6)},
+}
+
+
+def section_hours_map(sections: Iterable) -> Dict[str, float]:
+    """Map each section nombre to its horas_turno"""
+    return {section.nombre: section.horas_turno for section in sections}
+
+
+def compute_counted_hours(assignments_df: pd.DataFrame, sections: Optional[Iterable] = None,
+                          hours_by_section: Optional[Dict[str, float]] = None,
+                          rules: Dict[str, Dict] = HOURS_RULES) -> pd.Series:
+    """
+    Compute the hours each assignment counts, applying HOURS_RULES column-wise
+
+    The same-day rules are resolved with one set of dates per referenced section
+    (e.g. every date with a HEMS_festivo) and an isin over the date column, so
+    the whole scenario is processed in a single vectorized pass.
+
+    Args:
+        assignments_df: DataFrame with at least date and section_name
+        sections: Section objects used for the horas_turno fallback
+        hours_by_section: Precomputed nombre -> horas_turno map (overrides sections)
+        rules: Rules table, HOURS_RULES by default
+
+    Returns:
+        Series of counted hours aligned with assignments_df
+    """
+    if assignments_df.empty:
+        return pd.Series(dtype='float64', index=assignments_df.index)
+
+    if hours_by_section is None:
+        hours_by_section = section_hours_map(sections or [])
+
+    section_names = assignments_df['section_name'].astype(str)
+    dates = pd.to_datetime(assignments_df['date']).dt.normalize()
+    weekdays = dates.dt.weekday.to_numpy()
+
+    # Fallback: the section's horas_turno, 0 when the section is unknown
+    hours = section_names.map(hours_by_section).astype('float64').fillna(0).to_numpy(copy=True)
+
+    for section_name, rule in rules.items():
+        mask = (section_names == section_name).to_numpy()
+        if not mask.any():
+            continue
+        rule_hours = np.full(mask.sum(), float(rule['hours']))
+        if 'weekdays' in rule:
+            rule_hours = np.where(np.isin(weekdays[mask], rule['weekdays']), rule_hours, 0.0)
+        if 'same_day' in rule:
+            other_section, other_hours = rule['same_day']
+            other_dates = dates[section_names.str.contains(other_section, regex=False)].unique()
+            rule_hours = np.where(dates[mask].isin(other_dates).to_numpy(), float(other_hours), rule_hours)
+        hours[mask] = rule_hours
+
+    return pd.Series(hours, index=assignments_df.index, name='total_hours')
@@ -0,0 +1,105 @@
+import logging
+from collections import deque
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MinCostFlow:
+    """
+    Min-cost flow on a small directed graph with integer capacities and costs.
+
+    Solved with successive shortest augmenting paths (SPFA over the residual
+    graph), which is polynomial in the number of nodes, edges and units of
+    flow. Nodes are integers from 0 to n_nodes - 1.
+    """
+
+    def __init__(self, n_nodes: int):
+        self.n_nodes = n_nodes
+        # Residual edges as [to, capacity, cost, index of the reverse edge]
+        self._graph: List[List[list]] = [[] for _ in range(n_nodes)]
+        self._edges: List[Tuple[int, int]] = []
+
+    def add_node(self) -> int:
+        """Append a node and return its id"""
+        self._graph.append([])
+        self.n_nodes += 1
+        return self.n_nodes - 1
+
+    def add_edge(self, source: int, target: int, capacity: int, cost: int) -> int:
+        """
+        Add an edge and return its id, to read its flow after solving
+
+        Args:
+            source: Tail node
+            target: Head node
+            capacity: Maximum flow through the edge
+            cost: Cost per unit of flow
+
+        Returns:
+            Edge id
+        """
+        self._graph[source].append([target, capacity, cost, len(self._graph[target])])
+        self._graph[target].append([source, 0, -cost, len(self._graph[source]) - 1])
+        self._edges.append((source, len(self._graph[source]) - 1))
+        return len(self._edges) - 1
+
+    def flow(self, edge_id: int) -> int:
+        """Flow sent through an edge"""
+        source, position = self._edges[edge_id]
+        target, _, _, reverse = self._graph[source][position]
+        return self._graph[target][reverse][1]
+
+    def solve(self, source: int, sink: int, max_flow: int) -> Tuple[int, int]:
+        """
+        Send up to max_flow units from source to sink at minimum cost
+
+        Args:
+            source: Source node
+            sink: Sink node
+            max_flow: Units of flow wanted
+
+        Returns:
+            (flow sent, total cost)
+        """
+        total_flow = total_cost = 0
+        while total_flow < max_flow:
+            distance = [None] * self.n_nodes
+            previous = [None] * self.n_nodes
+            in_queue = [False] * self.n_nodes
+            distance[source] = 0
+            queue = deque([source])
+            while queue:
+                node = queue.popleft()
+                in_queue[node] = False
+                for position, (target, capacity, cost, _) in enumerate(self._graph[node]):
+                    if capacity <= 0:
+                        continue
+                    candidate = distance[node] + cost
+                    if distance[target] is None or candidate < distance[target]:
+                        distance[target] = candidate
+                        previous[target] = (node, position)
+                        if not in_queue[target]:
+                            in_queue[target] = True
+                            queue.append(target)
+            if distance[sink] is None:
+                break
+
+            # Bottleneck of the shortest path, then push it
+            push = max_flow - total_flow
+            node = sink
+            while node != source:
+                parent, position = previous[node]
+                push = min(push, self._graph[parent][position][1])
+                node = parent
+            node = sink
+            while node != source:
+                parent, position = previous[node]
+                edge = self._graph[parent][position]
+                edge[1] -= push
+                self._graph[node][edge[3]][1] += push
+                node = parent
+
+            total_flow += push
+            total_cost += push * distance[sink]
+        return total_flow, total_cost
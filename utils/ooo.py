@@ -0,0 +1,287 @@
+import json
+import logging
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Date format of the ranges stored in the ooo_days column
+OOO_DATE_FORMAT = '%d/%m/%Y'
+
+# Ordinal span reserved per worker in OOOIndex keys (every date ordinal is below 2**22)
+_WORKER_KEY_SPAN = 1 << 22
+
+
+class OOOPeriod(NamedTuple):
+    """Out-of-office period, both ends included"""
+    start: date
+    end: date
+    reason: str = ""
+
+    @property
+    def days(self) -> int:
+        """Number of days of the period"""
+        return (self.end - self.start).days + 1
+
+    def __str__(self):
+        text = self.start.strftime(OOO_DATE_FORMAT)
+        if self.end != self.start:
+            text += f" - {self.end.strftime(OOO_DATE_FORMAT)}"
+        return f"{text} ({self.reason})" if self.reason else text
+
+
+def parse_ooo_day(day) -> Optional[date]:
+    """Parse an out-of-office day (date, datetime, dd/mm/YYYY or YYYY-MM-DD string) to a date, None if invalid"""
+    if isinstance(day, datetime):
+        return day.date()
+    if isinstance(day, date):
+        return day
+    for date_format in (OOO_DATE_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(str(day).strip()[:10], date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_period(value) -> Optional[OOOPeriod]:
+    """Parse one stored entry: a period, a {start, end, reason} dict, a (start, end[, reason]) pair or a single day"""
+    if isinstance(value, OOOPeriod):
+        return value
+    if isinstance(value, dict):
+        start = parse_ooo_day(value.get('start'))
+        end = parse_ooo_day(value.get('end') or value.get('start'))
+        reason = value.get('reason') or ""
+    elif isinstance(value, (list, tuple)) and value:
+        start = parse_ooo_day(value[0])
+        end = parse_ooo_day(value[1]) if len(value) > 1 else start
+        reason = value[2] if len(value) > 2 and value[2] else ""
+    else:
+        start = end = parse_ooo_day(value)
+        reason = ""
+    if start is None or end is None:
+        return None
+    if end < start:
+        start, end = end, start
+    return OOOPeriod(start, end, str(reason))
+
+
+def merge_ooo_periods(periods: Iterable[OOOPeriod]) -> List[OOOPeriod]:
+    """
+    Sort periods and merge the ones that overlap, or touch with the same reason
+
+    The result is disjoint and ordered, which is what the bisect lookups need.
+    Legacy single-day entries collapse into one range per run of days.
+
+    Args:
+        periods: OOOPeriod objects in any order
+
+    Returns:
+        Sorted list of disjoint periods
+    """
+    merged = []
+    for period in sorted(periods):
+        if merged:
+            last = merged[-1]
+            overlaps = period.start <= last.end
+            touches = period.start == last.end + timedelta(days=1) and period.reason == last.reason
+            if overlaps or touches:
+                reason = last.reason
+                if period.reason and period.reason not in reason.split(" / "):
+                    reason = f"{reason} / {period.reason}" if reason else period.reason
+                merged[-1] = OOOPeriod(last.start, max(last.end, period.end), reason)
+                continue
+        merged.append(period)
+    return merged
+
+
+def parse_ooo_periods(values, worker_name: str = "") -> List[OOOPeriod]:
+    """
+    Parse the ooo_days field into sorted, disjoint periods
+
+    Accepts the stored JSON text, lists of {start, end, reason} dicts and the
+    legacy lists of single dd/mm/YYYY days.
+
+    Args:
+        values: Raw ooo_days value
+        worker_name: Worker name, used in warnings
+
+    Returns:
+        Sorted list of disjoint OOOPeriod
+    """
+    if not values:
+        return []
+    if isinstance(values, str):
+        try:
+            values = json.loads(values)
+        except json.JSONDecodeError:
+            values = [value for value in values.split(",") if value.strip()]
+    if isinstance(values, (dict, OOOPeriod)):
+        values = [values]
+
+    periods = []
+    for value in values:
+        period = _parse_period(value)
+        if period is None:
+            logger.warning(f"Could not parse out-of-office entry '{value}' for worker {worker_name}")
+            continue
+        periods.append(period)
+    return merge_ooo_periods(periods)
+
+
+def encode_ooo_periods(periods: Iterable) -> List[Dict[str, str]]:
+    """
+    Compact JSON form of the periods, one {start, end[, reason]} dict per range
+
+    Args:
+        periods: OOOPeriod objects (or anything parse_ooo_periods accepts)
+
+    Returns:
+        List of dicts with dd/mm/YYYY dates
+    """
+    encoded = []
+    for period in parse_ooo_periods(list(periods or [])):
+        entry = {'start': period.start.strftime(OOO_DATE_FORMAT), 'end': period.end.strftime(OOO_DATE_FORMAT)}
+        if period.reason:
+            entry['reason'] = period.reason
+        encoded.append(entry)
+    return encoded
+
+
+def find_period(periods: Sequence[OOOPeriod], starts: Sequence[int], day: date) -> Optional[OOOPeriod]:
+    """
+    Period containing a day, by bisecting the start ordinals
+
+    Args:
+        periods: Sorted disjoint periods
+        starts: Start ordinal of each period
+        day: Date to look up
+
+    Returns:
+        The OOOPeriod or None
+    """
+    i = bisect_right(starts, day.toordinal()) - 1
+    if i >= 0 and periods[i].end >= day:
+        return periods[i]
+    return None
+
+
+def period_row_ranges(periods: Iterable[OOOPeriod], start_date: date, n_days: int) -> List[Tuple[int, int]]:
+    """
+    Row slices (start, stop) covered by the periods in a matrix starting at start_date
+
+    Args:
+        periods: OOOPeriod objects
+        start_date: Date of row 0
+        n_days: Number of rows
+
+    Returns:
+        List of non-empty (start, stop) pairs, stop exclusive
+    """
+    origin = start_date.toordinal()
+    ranges = []
+    for period in periods:
+        row_start = max(period.start.toordinal() - origin, 0)
+        row_stop = min(period.end.toordinal() - origin + 1, n_days)
+        if row_start < row_stop:
+            ranges.append((row_start, row_stop))
+    return ranges
+
+
+class OOOIndex:
+    """
+    Interval index of the out-of-office periods of a set of workers.
+
+    Periods are kept in one array sorted by (worker, start), keyed as
+    worker_id * span + start ordinal, so both "is this worker out on d" and
+    "which workers are out during [a, b]" are binary searches over that key.
+    """
+
+    def __init__(self, workers: Iterable):
+        self.worker_names = []
+        keys, ends, owners, periods = [], [], [], []
+        for worker_id, worker in enumerate(workers):
+            self.worker_names.append(worker.name)
+            for period in parse_ooo_periods(getattr(worker, 'ooo_days', None), worker.name):
+                keys.append(worker_id * _WORKER_KEY_SPAN + period.start.toordinal())
+                ends.append(period.end.toordinal())
+                owners.append(worker_id)
+                periods.append(period)
+        self._worker_ids = {name: i for i, name in enumerate(self.worker_names)}
+        self._keys = np.array(keys, dtype='int64')
+        self._ends = np.array(ends, dtype='int64')
+        self._owners = np.array(owners, dtype='int64')
+        self._periods = periods
+
+    def __len__(self):
+        return len(self._periods)
+
+    def _last_started(self, worker_ids: np.ndarray, ordinal: int) -> np.ndarray:
+        """Position of each worker's last period starting on or before the ordinal, -1 if none"""
+        positions = np.searchsorted(self._keys, worker_ids * _WORKER_KEY_SPAN + ordinal, side='right') - 1
+        valid = positions >= 0
+        valid[valid] = self._owners[positions[valid]] == worker_ids[valid]
+        return np.where(valid, positions, -1)
+
+    def period_on(self, worker_name: str, day: date) -> Optional[OOOPeriod]:
+        """Period during which the worker is out on a day, None if they are available"""
+        worker_id = self._worker_ids.get(worker_name)
+        if worker_id is None or not len(self._keys):
+            return None
+        position = int(self._last_started(np.array([worker_id]), day.toordinal())[0])
+        if position >= 0 and self._ends[position] >= day.toordinal():
+            return self._periods[position]
+        return None
+
+    def is_unavailable(self, worker_name: str, day: date) -> bool:
+        """Check if a worker is out of office on a day"""
+        return self.period_on(worker_name, day) is not None
+
+    def unavailable_workers(self, start_date: date, end_date: date) -> List[str]:
+        """
+        Workers with an out-of-office period overlapping [start_date, end_date]
+
+        Periods of a worker are disjoint and sorted, so the last one starting
+        before end_date is the only candidate; one searchsorted covers every worker.
+
+        Args:
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+
+        Returns:
+            Worker names, in the order the index was built with
+        """
+        if not len(self._keys):
+            return []
+        worker_ids = np.arange(len(self.worker_names), dtype='int64')
+        positions = self._last_started(worker_ids, end_date.toordinal())
+        found = positions >= 0
+        found[found] = self._ends[positions[found]] >= start_date.toordinal()
+        return [self.worker_names[i] for i in np.flatnonzero(found)]
+
+    def unavailable_counts(self, start_date: date, n_days: int, worker_names: Optional[Iterable[str]] = None) -> np.ndarray:
+        """
+        Number of (listed) workers out of office on each of n_days from start_date
+
+        Built with one difference array over the clipped periods (range fills).
+
+        Args:
+            start_date: Date of the first day
+            n_days: Number of days
+            worker_names: Optional subset of workers to count
+
+        Returns:
+            int64 array of length n_days
+        """
+        selected = None if worker_names is None else {self._worker_ids[name] for name in worker_names
+                                                        if name in self._worker_ids}
+        delta = np.zeros(n_days + 1, dtype='int64')
+        for owner, period in zip(self._owners.tolist(), self._periods):
+            if selected is not None and owner not in selected:
+                continue
+            for row_start, row_stop in period_row_ranges((period,), start_date, n_days):
+                delta[row_start] += 1
+                delta[row_stop] -= 1
+        return np.cumsum(delta[:-1])
@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import pandas as pd
+from typing import Callable, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:  # The cache is simply disabled without pyarrow
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCENARIO_CACHE_DIR = "data/scenario_cache"
+
+# Key of the Parquet schema metadata holding the version stamp of a draft
+STAMP_KEY = b"scenario_stamp"
+
+
+class ScenarioParquetCache:
+    """
+    On-disk columnar cache of scenario assignments, one Parquet file per scenario and status.
+
+    Published scenarios never change, so their file is trusted forever. Draft files
+    carry a stamp (updated_at, or created_at when the table has no updated_at) and
+    are rewritten when the scenario row no longer matches it. Files are written
+    with one row group per month and read memory-mapped with a date filter, so a
+    month view only touches that month's row group.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_SCENARIO_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """Whether the cache can be used (pyarrow installed)"""
+        return PYARROW_AVAILABLE
+
+    def _path(self, scenario_id: int, status: str) -> str:
+        """Path of the Parquet file of a scenario in a given status"""
+        return os.path.join(self.cache_dir, f"scenario_{int(scenario_id)}_{status}.parquet")
+
+    @staticmethod
+    def _stamp(scenario: Dict) -> str:
+        """Version stamp of a scenario row"""
+        return str(scenario.get('updated_at') or scenario.get('created_at') or "")
+
+    def _is_fresh(self, path: str, scenario: Dict, status: str) -> bool:
+        """Check whether the cached file can be served for the scenario row"""
+        if not os.path.exists(path):
+            return False
+        if status == "published":
+            return True
+        try:
+            metadata = pq.read_schema(path, memory_map=True).metadata or {}
+        except Exception:
+            return False
+        return metadata.get(STAMP_KEY, b"").decode() == self._stamp(scenario)
+
+    def _write(self, path: str, df: pd.DataFrame, scenario: Dict) -> None:
+        """Write the scenario sorted by date with one row group per month"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        df = df.sort_values('date', kind='stable').reset_index(drop=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[STAMP_KEY] = self._stamp(scenario).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        # Write to a temporary file first so readers never see a half-written file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with pq.ParquetWriter(tmp_path, table.schema) as writer:
+            if df.empty:
+                writer.write_table(table)
+            else:
+                months = df['date'].dt.to_period('M')
+                boundaries = [0] + list((months != months.shift()).to_numpy().nonzero()[0][1:]) + [len(df)]
+                for start, end in zip(boundaries[:-1], boundaries[1:]):
+                    writer.write_table(table.slice(start, end - start))
+        os.replace(tmp_path, path)
+
+    def _read(self, path: str, start_date: str = None, end_date: str = None,
+              columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read a cached scenario memory-mapped, pruning row groups outside the date range"""
+        filters = []
+        if start_date:
+            filters.append(('date', '>=', pd.Timestamp(start_date)))
+        if end_date:
+            filters.append(('date', '<=', pd.Timestamp(end_date)))
+        table = pq.read_table(path, columns=columns, filters=filters or None, memory_map=True)
+        return table.to_pandas()
+
+    def load(self, scenario: Dict, loader: Callable[[], pd.DataFrame], start_date: str = None,
+             end_date: str = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Get the assignments of a scenario from disk, downloading them on a miss
+
+        Args:
+            scenario: Row of assignment_scenarios (id, status, created_at/updated_at)
+            loader: Callable returning every assignment of the scenario from the database
+            start_date: Optional start date filter (YYYY-MM-DD)
+            end_date: Optional end date filter (YYYY-MM-DD)
+            columns: Optional list of columns to return
+
+        Returns:
+            DataFrame with the requested assignments
+        """
+        status = scenario.get('status') or "draft"
+        path = self._path(scenario['id'], status)
+        try:
+            if self._is_fresh(path, scenario, status):
+                return self._read(path, start_date, end_date, columns)
+        except Exception as e:
+            logger.warning(f"Could not read cached scenario {scenario['id']}: {str(e)}")
+
+        df = loader()
+        if df.empty and not len(df.columns):
+            # Fetch failed, don't cache it
+            return df
+        try:
+            with self._lock:
+                self._write(path, df, scenario)
+            return self._read(path, start_date, end_date, columns)
+        except Exception as e:
+            logger.warning(f"Could not cache scenario {scenario['id']}: {str(e)}")
+            if start_date:
+                df = df[df['date'] >= pd.Timestamp(start_date)]
+            if end_date:
+                df = df[df['date'] <= pd.Timestamp(end_date)]
+            return df[columns] if columns else df
+
+    def invalidate(self, scenario_id: int) -> None:
+        """Remove every cached file of a scenario (all statuses)"""
+        prefix = f"scenario_{int(scenario_id)}_"
+        if not os.path.isdir(self.cache_dir):
+            return
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.startswith(prefix) and file_name.endswith(".parquet"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, file_name))
+                except OSError as e:
+                    logger.warning(f"Could not remove cached file {file_name}: {str(e)}")
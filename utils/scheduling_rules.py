@@ -0,0 +1,242 @@
+import datetime
+import json
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Person-specific rules, stored per worker in the rules column as a JSON list:
+#   {"type": "pin", "section": ..., "when": {...}}
+#       the worker takes the section on the matching dates (pre-assigned before the search)
+#   {"type": "exclude", "section": ..., "when": {...}}
+#       the worker never takes the section on the matching dates
+#   {"type": "prefer", "section": ..., "when": {...}, "if_worked": {...}}
+#       the worker takes the section on the matching dates, when available and the condition holds
+#
+# "when" selects dates: {"weekday": "friday", "nth": 1, "offset_days": 2} is the Sunday after
+# the first Friday of each month; every key is optional ({} matches every date).
+# "if_worked" is {"workers": [...], "sections": [name fragments], "days_before": [1, 2]}: true
+# when any of the workers had one of those sections that many days before the date.
+RULE_TYPES = ("pin", "exclude", "prefer")
+
+WEEKDAY_NUMBERS = {name: i for i, name in enumerate(
+    ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"))}
+
+# Rules the solver used to hardcode, applied to workers whose rules were never set
+LEGACY_WORKER_RULES = {
+    "Violeta Fariña": [
+        {"type": "pin", "section": "Urg_G_tarde-noche_l", "when": {"weekday": "friday", "nth": 1}},
+        {"type": "pin", "section": "Urg_G_festivo_mañana", "when": {"weekday": "friday", "nth": 1, "offset_days": 2}},
+        {"type": "exclude", "section": "Urg_G_refuerzo_fyf", "when": {"weekday": "friday", "nth": 1, "offset_days": 1}},
+    ],
+    "María Coma": [
+        {"type": "prefer", "section": "Urg_G_noche_l", "when": {"weekday": "monday"},
+         "if_worked": {"workers": ["Roberto Velasco", "Edu Marin"], "sections": ["noche", "nocturno"],
+                       "days_before": [1, 2]}},
+    ],
+}
+
+
+class SchedulingRule(NamedTuple):
+    """A rule of one worker"""
+    worker: str
+    type: str
+    section: str
+    when: Dict
+    if_worked: Optional[Dict] = None
+
+
+def parse_worker_rules(value) -> Optional[List[Dict]]:
+    """
+    Decode the rules column (JSON text or list), None when it was never set
+
+    Args:
+        value: Raw rules value
+
+    Returns:
+        List of rule dicts, or None
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            logger.warning(f"Could not parse scheduling rules '{value}'")
+            return []
+    if isinstance(value, dict):
+        value = [value]
+    return [rule for rule in value if isinstance(rule, dict)]
+
+
+def worker_rules(worker) -> List[SchedulingRule]:
+    """
+    Valid rules of a worker: the stored ones, or the legacy defaults of their name if never set
+
+    Args:
+        worker: Worker or CompiledWorker
+
+    Returns:
+        List of SchedulingRule
+    """
+    stored = parse_worker_rules(getattr(worker, 'rules', None))
+    if stored is None:
+        stored = LEGACY_WORKER_RULES.get(worker.name, [])
+
+    rules = []
+    for rule in stored:
+        rule_type = rule.get('type')
+        if rule_type not in RULE_TYPES or not rule.get('section'):
+            logger.warning(f"Ignoring invalid scheduling rule {rule} of worker {worker.name}")
+            continue
+        rules.append(SchedulingRule(worker.name, rule_type, rule['section'], dict(rule.get('when') or {}),
+                                    rule.get('if_worked') if rule_type == "prefer" else None))
+    return rules
+
+
+def date_selector_mask(when: Dict, dates: np.ndarray) -> np.ndarray:
+    """
+    Dates matched by a "when" selector
+
+    Args:
+        when: Selector dict (weekday, nth, offset_days)
+        dates: datetime64[D] array
+
+    Returns:
+        Boolean array of the same length
+    """
+    anchor = dates - np.timedelta64(int(when.get('offset_days', 0) or 0), 'D')
+    mask = np.ones(len(dates), dtype=bool)
+    weekday = when.get('weekday')
+    if weekday is not None:
+        # 1970-01-01 was a Thursday
+        number = WEEKDAY_NUMBERS.get(str(weekday).strip().lower(), weekday)
+        mask &= (anchor.astype("int64") + 3) % 7 == number
+    nth = when.get('nth')
+    if nth:
+        day_of_month = (anchor - anchor.astype("datetime64[M]")).astype("int64") + 1
+        mask &= (day_of_month - 1) // 7 + 1 == int(nth)
+    return mask
+
+
+class CompiledRules:
+    """
+    Scheduling rules of a set of workers, compiled against the dates of a period.
+
+    Pins become a list of (date, section, worker) pre-assignments, exclusions
+    one (dates x workers) mask per section and preferences one date mask per
+    rule, so applying them in the search is an array or set lookup. Conditions
+    of preferences are answered from an index of the ledger kept by
+    index_history / record.
+    """
+
+    def __init__(self, workers: Sequence, start_date: datetime.date, end_date: datetime.date):
+        self.worker_names = [worker.name for worker in workers]
+        self._worker_column = {name: j for j, name in enumerate(self.worker_names)}
+        self.start_date = start_date
+        self._dates = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+        dates = list(pd.DatetimeIndex(self._dates).date)
+
+        self.pins: List[Tuple[datetime.date, str, str]] = []
+        self._excluded: Dict[str, np.ndarray] = {}
+        self._preferences: Dict[str, List[Tuple[np.ndarray, SchedulingRule]]] = {}
+        self._worked: Dict[Tuple[str, int], Set[str]] = {}
+
+        for worker in workers:
+            for rule in worker_rules(worker):
+                mask = date_selector_mask(rule.when, self._dates)
+                if rule.type == "pin":
+                    self.pins.extend((dates[i], rule.section, rule.worker) for i in np.flatnonzero(mask))
+                elif rule.type == "exclude":
+                    excluded = self._excluded.setdefault(
+                        rule.section, np.zeros((len(dates), len(self.worker_names)), dtype=bool))
+                    excluded[:, self._worker_column[rule.worker]] |= mask
+                else:
+                    self._preferences.setdefault(rule.section, []).append((mask, rule))
+        self.pins.sort()
+
+    def _row(self, date: datetime.date) -> Optional[int]:
+        """Row of a date in the compiled masks, None outside the period"""
+        row = date.toordinal() - self.start_date.toordinal()
+        return row if 0 <= row < len(self._dates) else None
+
+    def is_excluded(self, section_name: str, date: datetime.date, worker_name: str) -> bool:
+        """Check if a rule keeps the worker off the section on that date"""
+        excluded = self._excluded.get(section_name)
+        row = self._row(date)
+        column = self._worker_column.get(worker_name)
+        return excluded is not None and row is not None and column is not None and bool(excluded[row, column])
+
+    def block_exclusions(self, blocks: Sequence, worker_names: Sequence[str]) -> np.ndarray:
+        """
+        Workers excluded from at least one shift of each weekend block
+
+        Args:
+            blocks: WeekendBlock list
+            worker_names: Columns of the result
+
+        Returns:
+            Boolean (blocks x workers)
+        """
+        result = np.zeros((len(blocks), len(worker_names)), dtype=bool)
+        if not self._excluded:
+            return result
+        columns = np.array([self._worker_column.get(name, -1) for name in worker_names])
+        known = columns >= 0
+        for b, block in enumerate(blocks):
+            for shift_date, section in block.shifts:
+                excluded = self._excluded.get(section.nombre)
+                row = self._row(shift_date)
+                if excluded is not None and row is not None:
+                    result[b, known] |= excluded[row, columns[known]]
+        return result
+
+    def index_history(self, assignments_df: pd.DataFrame) -> None:
+        """Index the ledger rows the preference conditions look at, in one pass"""
+        self._worked = {}
+        if assignments_df is None or assignments_df.empty or not self._preferences:
+            return
+        ordinals = pd.to_datetime(assignments_df['date']).dt.date.map(datetime.date.toordinal)
+        for worker_name, ordinal, section_name in zip(assignments_df['worker_name'], ordinals,
+                                                      assignments_df['section_name']):
+            self._worked.setdefault((worker_name, ordinal), set()).add(section_name)
+
+    def record(self, date: datetime.date, section_name: str, worker_name: str) -> None:
+        """Add an assignment made after index_history"""
+        if self._preferences:
+            self._worked.setdefault((worker_name, date.toordinal()), set()).add(section_name)
+
+    def _condition_holds(self, condition: Optional[Dict], date: datetime.date) -> bool:
+        """Evaluate an if_worked condition on a date"""
+        if not condition:
+            return True
+        fragments = [fragment.lower() for fragment in condition.get('sections') or []]
+        for worker_name in condition.get('workers') or []:
+            for days in condition.get('days_before') or [0]:
+                for section_name in self._worked.get((worker_name, date.toordinal() - int(days)), ()):
+                    if not fragments or any(fragment in section_name.lower() for fragment in fragments):
+                        return True
+        return False
+
+    def preferred_worker(self, section_name: str, date: datetime.date, eligible_names: Iterable[str]) -> Optional[str]:
+        """
+        Worker a preference rule gives the shift to, if one matches and they are eligible
+
+        Args:
+            section_name: Section of the shift
+            date: Date of the shift
+            eligible_names: Names of the workers that can take the shift
+
+        Returns:
+            Worker name or None
+        """
+        row = self._row(date)
+        if row is None:
+            return None
+        eligible_names = set(eligible_names)
+        for mask, rule in self._preferences.get(section_name, ()):
+            if mask[row] and rule.worker in eligible_names and self._condition_holds(rule.if_worked, date):
+                return rule.worker
+        return None
@@ -0,0 +1,367 @@
+import datetime
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+WEEKDAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+PARITY_NAMES = {"even": 0, "odd": 1}
+
+# Separator of the ranges in include / exclude entries ("2025-07-01/2025-07-04")
+RANGE_SEPARATOR = "/"
+
+# Expanded year bitmaps kept in memory, keyed by (pattern key, year)
+PATTERN_CACHE_SIZE = 256
+_year_mask_cache = OrderedDict()
+_year_mask_lock = threading.Lock()
+
+
+def _parse_date(value) -> Optional[datetime.date]:
+    """Parse a date given as a date/datetime or an ISO (YYYY-MM-DD) string"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if value is None or not str(value).strip():
+        return None
+    try:
+        return datetime.date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        logger.warning(f"Could not parse section date '{value}'")
+        return None
+
+
+def _parse_dates(values) -> frozenset:
+    """Ordinals of a list of dates and 'start/end' ranges"""
+    ordinals = set()
+    for value in values or ():
+        if isinstance(value, str) and RANGE_SEPARATOR in value:
+            start, end = (_parse_date(part) for part in value.split(RANGE_SEPARATOR, 1))
+            if start and end:
+                ordinals.update(range(start.toordinal(), end.toordinal() + 1))
+            continue
+        day = _parse_date(value)
+        if day is not None:
+            ordinals.add(day.toordinal())
+    return frozenset(ordinals)
+
+
+def _encode_dates(ordinals: Iterable[int]) -> List[str]:
+    """Compact a set of ordinals into ISO dates and 'start/end' ranges of consecutive days"""
+    encoded = []
+    ordinals = sorted(ordinals)
+    i = 0
+    while i < len(ordinals):
+        j = i
+        while j + 1 < len(ordinals) and ordinals[j + 1] == ordinals[j] + 1:
+            j += 1
+        start = datetime.date.fromordinal(ordinals[i]).isoformat()
+        if j > i:
+            encoded.append(f"{start}{RANGE_SEPARATOR}{datetime.date.fromordinal(ordinals[j]).isoformat()}")
+        else:
+            encoded.append(start)
+        i = j + 1
+    return encoded
+
+
+class DatePattern:
+    """
+    Recurrence rule telling on which dates a section applies.
+
+    Rules (all optional):
+        week_parity: [{"from": "YYYY-MM-DD" | None, "parity": "even" | "odd"}, ...]
+            ISO week parity, switching at each cutover date. Dates before the
+            first cutover follow the first entry.
+        nth_weekday: [[n, "friday"], [-1, "monday"], ...]
+            Nth weekday of the month (negative counts from the end).
+        start / end: Validity bounds (inclusive).
+        include / exclude: Explicit dates or "start/end" ranges added / removed.
+
+    A date matches when it satisfies every generative rule (parity, nth weekday,
+    bounds), or is included, and is not excluded. A pattern with only include
+    dates is the former explicit `fechas` list. Each year is expanded once into
+    a boolean bitmap and cached.
+    """
+
+    def __init__(self, week_parity=None, nth_weekday=None, include=None, exclude=None, start=None, end=None):
+        cutovers = []
+        for rule in week_parity or ():
+            parity = rule.get("parity") if isinstance(rule, dict) else rule[1]
+            cutover = rule.get("from") if isinstance(rule, dict) else rule[0]
+            parity = PARITY_NAMES.get(parity, parity)
+            if parity not in (0, 1):
+                raise ValueError(f"Invalid week parity '{parity}'")
+            cutovers.append((_parse_date(cutover), parity))
+        self.week_parity = tuple(sorted(cutovers, key=lambda item: item[0] or datetime.date.min))
+
+        nth_rules = []
+        for n, weekday in nth_weekday or ():
+            weekday = WEEKDAY_NAMES.index(weekday) if isinstance(weekday, str) else int(weekday)
+            if not (1 <= abs(int(n)) <= 5):
+                raise ValueError(f"Invalid nth weekday '{n}'")
+            nth_rules.append((int(n), weekday))
+        self.nth_weekday = tuple(sorted(set(nth_rules)))
+
+        self.include = _parse_dates(include)
+        self.exclude = _parse_dates(exclude)
+        self.start = _parse_date(start)
+        self.end = _parse_date(end)
+        self.key = json.dumps(self.to_dict(), sort_keys=True)
+
+    @classmethod
+    def from_value(cls, value) -> Optional["DatePattern"]:
+        """
+        Build a pattern from a Section.fechas value
+
+        Args:
+            value: DatePattern, rule dict, JSON text, or a legacy list of ISO dates
+
+        Returns:
+            DatePattern, or None when the section has no date restriction
+        """
+        if isinstance(value, DatePattern):
+            return value
+        value = decode_section_fechas(value)
+        if not value:
+            return None
+        if isinstance(value, dict):
+            return _compile_pattern(json.dumps(value, sort_keys=True, default=str))
+        return _compile_pattern(json.dumps({"include": sorted(str(day)[:10] for day in value)}))
+
+    @property
+    def is_generative(self) -> bool:
+        """Whether the pattern has rules beyond the explicit include list"""
+        return bool(self.week_parity or self.nth_weekday or self.start or self.end)
+
+    def to_dict(self) -> Dict:
+        """Compact JSON-serializable form (consecutive included days become ranges)"""
+        rule = {}
+        if self.week_parity:
+            rule["week_parity"] = [{"from": cutover.isoformat() if cutover else None,
+                                    "parity": "even" if parity == 0 else "odd"}
+                                   for cutover, parity in self.week_parity]
+        if self.nth_weekday:
+            rule["nth_weekday"] = [[n, WEEKDAY_NAMES[weekday]] for n, weekday in self.nth_weekday]
+        if self.start:
+            rule["start"] = self.start.isoformat()
+        if self.end:
+            rule["end"] = self.end.isoformat()
+        if self.include:
+            rule["include"] = _encode_dates(self.include)
+        if self.exclude:
+            rule["exclude"] = _encode_dates(self.exclude)
+        return rule
+
+    def __eq__(self, other):
+        return isinstance(other, DatePattern) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"DatePattern({self.key})"
+
+    def _expand_year(self, year: int) -> np.ndarray:
+        """Boolean mask of the days of a year matching the pattern"""
+        dates = np.arange(np.datetime64(f"{year:04d}-01-01"), np.datetime64(f"{year + 1:04d}-01-01"),
+                          dtype="datetime64[D]")
+        first_ordinal = datetime.date(year, 1, 1).toordinal()
+        ordinals = np.arange(first_ordinal, first_ordinal + len(dates))
+
+        if self.is_generative:
+            mask = np.ones(len(dates), dtype=bool)
+            index = pd.DatetimeIndex(dates)
+            if self.week_parity:
+                week_parity = index.isocalendar().week.to_numpy().astype("int64") % 2
+                expected = np.full(len(dates), self.week_parity[0][1])
+                for cutover, parity in self.week_parity[1:]:
+                    expected[ordinals >= cutover.toordinal()] = parity
+                mask &= week_parity == expected
+            if self.nth_weekday:
+                weekdays = index.weekday.to_numpy()
+                day = index.day.to_numpy()
+                nth = (day - 1) // 7 + 1
+                nth_from_end = -((index.days_in_month.to_numpy() - day) // 7 + 1)
+                nth_mask = np.zeros(len(dates), dtype=bool)
+                for n, weekday in self.nth_weekday:
+                    nth_mask |= (weekdays == weekday) & ((nth == n) if n > 0 else (nth_from_end == n))
+                mask &= nth_mask
+            if self.start:
+                mask &= ordinals >= self.start.toordinal()
+            if self.end:
+                mask &= ordinals <= self.end.toordinal()
+        else:
+            # Only explicit dates, or no restriction at all
+            mask = np.full(len(dates), not self.include, dtype=bool)
+
+        if self.include:
+            mask |= np.isin(ordinals, np.fromiter(self.include, dtype="int64"))
+        if self.exclude:
+            mask &= ~np.isin(ordinals, np.fromiter(self.exclude, dtype="int64"))
+        return mask
+
+    def year_mask(self, year: int) -> np.ndarray:
+        """
+        Cached bitmap of a year, one boolean per day from January 1st
+
+        Args:
+            year: Year to expand
+
+        Returns:
+            Read-only boolean array
+        """
+        cache_key = (self.key, year)
+        with _year_mask_lock:
+            mask = _year_mask_cache.get(cache_key)
+            if mask is not None:
+                _year_mask_cache.move_to_end(cache_key)
+                return mask
+
+        mask = self._expand_year(year)
+        mask.setflags(write=False)
+        with _year_mask_lock:
+            _year_mask_cache[cache_key] = mask
+            while len(_year_mask_cache) > PATTERN_CACHE_SIZE:
+                _year_mask_cache.popitem(last=False)
+        return mask
+
+    def mask(self, dates: np.ndarray) -> np.ndarray:
+        """
+        Whether each date of a datetime64[D] array matches, read from the year bitmaps
+
+        Args:
+            dates: datetime64[D] array
+
+        Returns:
+            Boolean array of the same length
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        result = np.zeros(len(dates), dtype=bool)
+        if not len(dates):
+            return result
+        years = dates.astype("datetime64[Y]").astype("int64") + 1970
+        for year in np.unique(years).tolist():
+            in_year = years == year
+            day_of_year = (dates[in_year] - np.datetime64(f"{year:04d}-01-01")).astype("int64")
+            result[in_year] = self.year_mask(year)[day_of_year]
+        return result
+
+    def __contains__(self, day) -> bool:
+        day = _parse_date(day)
+        if day is None:
+            return False
+        return bool(self.year_mask(day.year)[day.timetuple().tm_yday - 1])
+
+    def dates_in_year(self, year: int) -> List[datetime.date]:
+        """Dates of a year matching the pattern"""
+        first_ordinal = datetime.date(year, 1, 1).toordinal()
+        return [datetime.date.fromordinal(first_ordinal + i) for i in np.flatnonzero(self.year_mask(year)).tolist()]
+
+    def years(self) -> List[int]:
+        """Years with explicit dates (empty when the rule repeats every year)"""
+        if self.is_generative:
+            return []
+        return sorted({datetime.date.fromordinal(ordinal).year for ordinal in self.include})
+
+    def with_dates(self, include=(), exclude=()) -> "DatePattern":
+        """
+        Copy of the pattern with more dates included and/or excluded
+
+        Args:
+            include: Dates or ranges to add
+            exclude: Dates or ranges to remove
+
+        Returns:
+            New DatePattern
+        """
+        rule = self.to_dict()
+        added, removed = _parse_dates(include), _parse_dates(exclude)
+        # Removed dates stay in include (exclude wins over it), so a list of explicit dates that loses
+        # every date still matches nothing instead of turning into "every date but the excluded ones"
+        rule["include"] = _encode_dates(self.include | added)
+        rule["exclude"] = _encode_dates((self.exclude | removed) - added)
+        return DatePattern(**{key: value for key, value in rule.items() if value})
+
+
+_compiled_patterns = OrderedDict()
+
+
+def _compile_pattern(key: str) -> DatePattern:
+    """Compile a canonical JSON rule once per process"""
+    with _year_mask_lock:
+        pattern = _compiled_patterns.get(key)
+        if pattern is not None:
+            _compiled_patterns.move_to_end(key)
+            return pattern
+    pattern = DatePattern(**json.loads(key))
+    with _year_mask_lock:
+        _compiled_patterns[key] = pattern
+        while len(_compiled_patterns) > PATTERN_CACHE_SIZE:
+            _compiled_patterns.popitem(last=False)
+    return pattern
+
+
+def decode_section_fechas(value) -> Union[List[str], Dict, None]:
+    """
+    Decode the fechas column: a JSON rule object, a JSON list, or comma separated ISO dates
+
+    Args:
+        value: Stored value (text, list, dict or DatePattern)
+
+    Returns:
+        Rule dict, list of dates, or an empty list
+    """
+    if isinstance(value, DatePattern):
+        return value.to_dict()
+    if value is None or isinstance(value, (dict, list, tuple, set, frozenset)):
+        return value if isinstance(value, dict) else list(value or [])
+    text = str(value).strip()
+    if not text:
+        return []
+    if text[0] in "[{":
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            logger.warning(f"Could not decode section fechas '{text[:40]}...'")
+            return []
+    return [day.strip() for day in text.split(",") if day.strip()]
+
+
+def encode_section_fechas(value) -> str:
+    """
+    Stored form of Section.fechas: the compact JSON rule (empty text when unrestricted)
+
+    Args:
+        value: Section.fechas (rule dict, list of dates or DatePattern)
+
+    Returns:
+        Text for the fechas column
+    """
+    pattern = DatePattern.from_value(value)
+    if pattern is None:
+        return ""
+    return json.dumps(pattern.to_dict())
+
+
+def section_pattern(section) -> Optional[DatePattern]:
+    """Date pattern of a section, None if it applies on every date of its dias"""
+    return DatePattern.from_value(getattr(section, "fechas", None))
+
+
+def pattern_version(value) -> Optional[str]:
+    """Canonical key of a fechas value, for cache fingerprints"""
+    pattern = DatePattern.from_value(value)
+    return pattern.key if pattern is not None else None
+
+
+# Alternating ISO-week parity of the HEMS afternoon shifts
+HEMS_WEEK_PATTERN = DatePattern(week_parity=[
+    {"from": None, "parity": "even"},
+    {"from": "2026-05-25", "parity": "odd"},
+    {"from": "2026-11-23", "parity": "even"},
+])
@@ -1,4 +1,5 @@
 import datetime
+from utils.section_rules import HEMS_WEEK_PATTERN, DatePattern, decode_section_fechas
 class Section:
     def __init__(self, nombre, dias, horas_turno, horas_jornada, personal, libra, fechas):
         self.nombre = nombre
@@ -7,16 +8,17 @@ class Section:
         self.horas_jornada = horas_jornada
         self.personal = personal
         self.libra = libra
-        self.fechas = fechas
-        
+        # Either a list of ISO dates or a date rule (see utils.section_rules.DatePattern)
+        self.fechas = decode_section_fechas(fechas)
+
+    @property
+    def pattern(self):
+        """DatePattern of the section, None if it applies on every date of its dias"""
+        return DatePattern.from_value(self.fechas)
+
     def _es_semana_hems(fecha):
-        semana = fecha.isocalendar()[1]
-        if fecha < datetime.date(2026, 5, 25):
-            return semana % 2 == 0  # Semanas pares hasta el 25 de mayo
-        elif fecha < datetime.date(2026, 11, 23):
-            return semana % 2 != 0  # Semanas impares hasta el 23 de noviembre
-        else:
-            return semana % 2 == 0 #Semanas pares hasta final de año
+        # Even ISO weeks until 25/05/2026, odd weeks until 23/11/2026, even weeks afterwards
+        return fecha in HEMS_WEEK_PATTERN
     
     def _to_dict(self):
         return {
@@ -70,6 +72,8 @@ dias_coordis = {
     datetime.date(2025, 12, 30)
 }
 
+# Bundled holidays: seed of the festivos table and fallback of utils.holidays when it is empty.
+# Read holidays through utils.holidays.get_holidays() instead of this list.
 festivos = [
     datetime.date(2026, 1, 1),
     datetime.date(2026, 1, 6),
@@ -10,9 +10,23 @@ from datetime import datetime as datetime_type
 from datetime import timedelta
 from datetime import date as datetime_date
 
-from utils.sections import festivos, calendario_2026
-from utils.worker import Worker
+from utils.sections import calendario_2026
+from utils.holidays import get_holidays
+from utils.worker import Worker, compile_workers
+from utils.ooo import OOOIndex
+from utils.staffing import StaffingCounters
+from utils.scheduling_rules import CompiledRules
+from utils.workload_limits import WorkloadCounters
+from utils.eligibility import EligibilityIndex
+from utils.weekend_assignment import (ROLE_COUNT, block_candidate_masks, block_row_index, build_weekend_blocks,
+                                      solve_capped_weekend_roles, solve_weekend_roles, weekend_key,
+                                      weekend_role_costs)
 from utils.sections import Section
+from utils.hours_rules import compute_counted_hours
+from utils.demand import DemandMatrix, get_period_demand, to_datetime64, uncovered_slots
+from utils.assignment_io import STATS_SUMMARY_KEYS
+from utils.assignment_stats import (METRIC_KEYS, METRIC_LABELS, metrics_table, metrics_to_dict,
+                                    period_metrics_to_dict, period_worker_metrics, worker_metrics)
 
 from datetime import datetime
 from utils.db import get_db
@@ -23,9 +37,22 @@ all_sections = db.get_sections()
 # Get workers from database
 workers = db.get_workers()
 
+# Reasons reported for required shifts left without a worker
+UNCOVERED_NO_CATEGORY = "Secció sense categoria de treballador"
+UNCOVERED_NO_STAFF = "Cap treballador d'alta amb aquesta àrea"
+UNCOVERED_ALL_OOO = "Tots els treballadors de l'àrea absents"
+UNCOVERED_NOT_ASSIGNED = "No assignada (restriccions o backtracking)"
+
+# Urgencias sections are assigned by their own weekend/lab logic and left out of the unassigned count
+URGENCIAS_UNCOUNTED_SECTIONS = ("Urg_G_noche_l", "Urg_G_tarde-noche_l", "Urg_G_festivo", "Urg_G_refuerzo_fyf")
+
 class ShiftAssigner:
-    def __init__(self, workers, sections, priority, calendario, session_state, year=2025,):
-        self.workers = workers
+    def __init__(self, workers, sections, priority, calendario, session_state, year=2025, minimum_staff=None,
+                 monthly_caps=None):
+        # Compiled once: bitmask/bisect availability checks in the solver loops
+        self.workers = compile_workers(workers)
+        # Out-of-office periods of every worker, for range queries
+        self.ooo_index = OOOIndex(self.workers)
         self.sections = [section for section in all_sections if section.nombre in sections]
         self.sections_priority = priority if priority else {
             "HEMS_tarde": 1,
@@ -44,6 +71,14 @@ class ShiftAssigner:
             }
         self.calendario = calendario
         self.year = year
+        # Workers per category that must stay available for regular work (DEFAULT_MINIMUM_STAFF when omitted)
+        self.minimum_staff = dict(minimum_staff or {})
+        # Shifts per month by area and shift type (DEFAULT_MONTHLY_CAPS when omitted)
+        self.monthly_caps = dict(monthly_caps or {})
+        # Static eligibility per (section, weekday): area, assigned weekdays and section-day constraints
+        self.eligibility = EligibilityIndex(self.workers, all_sections, self._get_required_category)
+        # Festivos of every year, loaded once from the holiday calendar (O(1) membership)
+        self.festivos = get_holidays().dates()
         self.logger = None
         self.session_state = session_state  # Store session_state
 
@@ -144,83 +179,72 @@ class ShiftAssigner:
         self.logger.info(f"Generated {len(historical_df)} historical assignments")
         
     def _init_metrics(self):
-        # Initialize yearly metrics for each worker
-        self.yearly_metrics = {}
-        for worker in self.workers:
-            self.yearly_metrics[worker.name] = {
-                'total_shifts': 0,
-                'total_hours': 0,
-                'night_shifts': 0,
-                'weekend_shifts': 0,
-                'festivo_shifts': 0
-            }
-        
-        # Update metrics from all assignments (including historical)
-        for _, row in self.assignments.iterrows():
-            worker_name = row['worker_name']
-            section_name = row['section_name']
-            date = row['date'].date()
-            hours = row['hours']
-            
-            if worker_name in self.yearly_metrics:
-                self.yearly_metrics[worker_name]['total_shifts'] += 1
-                self.yearly_metrics[worker_name]['total_hours'] += hours
-                
-                # Count night shifts
-                if any(night_type in section_name for night_type in ['nocturno', 'nocturna']):
-                    self.yearly_metrics[worker_name]['night_shifts'] += 1
-                
-                # Count weekend shifts
-                if self.is_weekend(date):
-                    self.yearly_metrics[worker_name]['weekend_shifts'] += 1
-                
-                # Count holiday shifts
-                if date in festivos:
-                    self.yearly_metrics[worker_name]['festivo_shifts'] += 1
+        # Initialize yearly metrics for each worker from all assignments (including historical)
+        worker_names = [worker.name for worker in self.workers]
+        self.yearly_metrics = {name: {key: 0 for key in METRIC_KEYS} for name in worker_names}
+        if self.assignments.empty:
+            return
+
+        known = self.assignments[self.assignments['worker_name'].isin(worker_names)]
+        totals = worker_metrics(period_worker_metrics(known, worker_names, self.festivos))
+        self.yearly_metrics.update(metrics_to_dict(totals.loc[totals.index.isin(worker_names)]))
 
     def initialize_availability_matrix(self, start_date, end_date):
         """Create a matrix tracking worker availability for a specific period"""
-        # Create date range for the period
-        date_range = []
-        current_date = start_date
-        while current_date <= end_date:
-            date_range.append(current_date)
-            current_date += timedelta(days=1)
-        
-        # Initialize availability matrix (True = available)
-        availability = pd.DataFrame(
-            True, 
-            index=date_range, 
-            columns=[worker.name for worker in self.workers]
-        )
-        
+        date_range = pd.date_range(start_date, end_date, freq='D')
+        days = date_range.to_numpy().astype('datetime64[D]')
+        worker_names = [worker.name for worker in self.workers]
+
+        # Availability as a days x workers boolean array (True = available)
+        available = np.ones((len(days), len(worker_names)), dtype=bool)
+
+        def day_rows(dates):
+            rows = (to_datetime64(dates) - days[0]).astype('int64') if len(days) else np.array([], dtype='int64')
+            return rows[(rows >= 0) & (rows < len(days))]
+
         # Mark unavailable days due to vacations, training, etc.
-        for worker in self.workers:
-            # Skip days worker is unavailable (if this data exists)
-            if hasattr(worker, 'ooo_days') and worker.ooo_days:
-                for day in worker.ooo_days:
-                    if day in availability.index:
-                        availability.loc[day, worker.name] = False
-                        self.logger.info(f"Marking {day} as unavailable for {worker.name} (OOO day)")
-            if hasattr(worker, 'avoid_days') and worker.avoid_days:  
-                for day in worker.avoid_days:
-                    if day in availability.index:
-                        availability.loc[day, worker.name] = False
-        # Mark days where workers are already assigned shifts (from previous periods)
-        for _, row in self.assignments.iterrows():
-            date = row['date']
-            worker_name = row['worker_name']
-            
-            # Mark this day as unavailable
-            if date in availability.index:
-                availability.loc[date, worker_name] = False
-            
-            # If shift requires time off next day (libra=True), mark that too
-            if row['libra'] and date + timedelta(days=1) in availability.index:
-                availability.loc[date + timedelta(days=1), worker_name] = False
-        
-        return availability
-    
+        for column, worker in enumerate(self.workers):
+            ooo_ranges = worker.ooo_row_ranges(start_date, len(days))
+            for row_start, row_stop in ooo_ranges:
+                available[row_start:row_stop, column] = False
+            if ooo_ranges:
+                ooo_count = sum(row_stop - row_start for row_start, row_stop in ooo_ranges)
+                self.logger.info(f"Marking {ooo_count} days as unavailable for {worker.name} (OOO days)")
+            # avoid_days holds weekday names; only explicit dates block a day here
+            avoid_dates = [day for day in (getattr(worker, 'avoid_days', None) or [])
+                           if isinstance(day, datetime_date)]
+            available[day_rows(avoid_dates), column] = False
+
+        # Mark days where workers are already assigned shifts (from previous periods),
+        # and the next day when the shift requires time off (libra)
+        if not self.assignments.empty and len(days):
+            columns = self.assignments['worker_name'].map({name: j for j, name in enumerate(worker_names)})
+            known = columns.notna().to_numpy()
+            rows = (to_datetime64(self.assignments['date']) - days[0]).astype('int64')[known]
+            columns = columns[known].astype('int64').to_numpy()
+            libra = self.assignments['libra'].fillna(False).astype(bool).to_numpy()[known]
+            for offset, mask in ((0, np.ones(len(rows), dtype=bool)), (1, libra)):
+                shifted = rows[mask] + offset
+                inside = (shifted >= 0) & (shifted < len(days))
+                available[shifted[inside], columns[mask][inside]] = False
+
+        return pd.DataFrame(available, index=list(date_range.date), columns=worker_names)
+
+    def get_period_demand(self, start_date, end_date):
+        """
+        Demand (date x section requirement matrix) of the assigner's sections over a period
+
+        Holidays and the days considered come from self.calendario; dates missing
+        from it require no shifts.
+        """
+        festivo_days = [date for date, day_type in self.calendario if day_type == "festivo"]
+        demand = get_period_demand(self.sections, start_date, end_date, festivo_days)
+        in_calendar = np.isin(demand.dates, to_datetime64(date for date, _ in self.calendario))
+        if not in_calendar.all():
+            demand = DemandMatrix(demand.dates, demand.sections, demand.labels, demand.is_festivo,
+                                  demand.required & in_calendar[:, None])
+        return demand
+
     def is_night_shift(self, section):
         """Check if a section is considered a night shift"""
         return 'noche' in section.nombre.lower() or 'nocturno' in section.nombre.lower() or section.nombre == "UCI_G_lab"
@@ -278,7 +302,7 @@ class ShiftAssigner:
             'worker_name': worker.name,
             'hours': section.horas_turno,
             'libra': section.libra,
-            'is_festivo': date in festivos,
+            'is_festivo': date in self.festivos,
             'is_weekend': self.is_weekend(date),
             'period': period_name
         }])], ignore_index=True)
@@ -300,7 +324,7 @@ class ShiftAssigner:
         if self.is_weekend(date):
             period_metrics[worker.name]['weekend_shifts'] += 1
             
-        if date in festivos:
+        if date in self.festivos:
             period_metrics[worker.name]['festivo_shifts'] += 1
             
         # Update yearly metrics as well
@@ -313,7 +337,7 @@ class ShiftAssigner:
         if self.is_weekend(date):
             self.yearly_metrics[worker.name]['weekend_shifts'] += 1
             
-        if date in festivos:
+        if date in self.festivos:
             self.yearly_metrics[worker.name]['festivo_shifts'] += 1
     
     def get_workload_score(self, worker_name, period_metrics, is_night=False, is_weekend=False, is_festivo=False, yearly_weight=0.3):
@@ -404,7 +428,6 @@ class ShiftAssigner:
         # Get all shifts that need to be assigned in this period
         shifts_to_assign = []
         first_friday_reinforcements = []  # Initialize this list for first Friday special cases
-        current_date = start_date
         
         # Initialize TWO availability matrices
         # 1. Shift availability matrix (for shift assignments)
@@ -414,34 +437,26 @@ class ShiftAssigner:
         # 2. Regular work schedule availability matrix (for regular jornada)
         regular_availability = self.initialize_regular_availability_matrix(start_date, end_date)
         self.logger.info(f"Regular availability matrix initialized for period {period_name}")
-        
-        while current_date <= end_date:
-            # Find day type (weekday, weekend, holiday)
-            day_type = next((day_type for date, day_type in self.calendario if date == current_date), None)
-            if not day_type:
-                current_date += timedelta(days=1)
-                continue
-            
-            # Check which sections apply for this day
-            for section in self.sections:
-                # Check if this section applies to this day type
-                if day_type not in section.dias:
-                    continue
-                # Check if section has specific dates and this date is not one of them
-                if hasattr(section, 'fechas') and section.fechas and len(section.fechas) > 0:
-                    # Only continue with sections that have specific dates when the current date is in those dates
-                    if str(current_date) not in section.fechas:
-                        continue
-                if current_date.weekday() == 4 and self.is_first_friday_of_month(current_date):
-                    # Find the reinforcement section
-                    refuerzo_section = next((s for s in all_sections if s.nombre == "Urg_G_refuerzo_fyf"), None)
-                    if refuerzo_section:
-                        first_friday_reinforcements.append((current_date, refuerzo_section))
-                        self.logger.info(f"Added reinforcement shift for first Friday on {current_date}")
-                # This shift needs to be assigned
-                shifts_to_assign.append((current_date, section))
-                    
-            current_date += timedelta(days=1)
+        # Available regular staff per (date, category), kept in sync with regular_availability
+        staffing = StaffingCounters(self.workers, regular_availability, self.minimum_staff)
+        # Person-specific rules (pins, exclusions, preferences) compiled against the period dates
+        rules = CompiledRules(self.workers, start_date, end_date)
+        # Monthly shifts and yearly guard hours of every worker, checked before each assignment
+        section_areas = {s.nombre: self._get_required_category(s) for s in all_sections if self._get_required_category(s)}
+        workload = WorkloadCounters(self.workers, self.assignments, section_areas, self.festivos, self.monthly_caps)
+        
+        # Sections that apply on each date of the period, from the compiled demand matrix
+        demand = self.get_period_demand(start_date, end_date)
+        self.log_feasibility_report(demand)
+        for shift_date, section in demand.shifts():
+            if shift_date.weekday() == 4 and self.is_first_friday_of_month(shift_date):
+                # Find the reinforcement section
+                refuerzo_section = next((s for s in all_sections if s.nombre == "Urg_G_refuerzo_fyf"), None)
+                if refuerzo_section:
+                    first_friday_reinforcements.append((shift_date, refuerzo_section))
+                    self.logger.info(f"Added reinforcement shift for first Friday on {shift_date}")
+            # This shift needs to be assigned
+            shifts_to_assign.append((shift_date, section))
         for shift in first_friday_reinforcements:
             shifts_to_assign.append(shift)
         
@@ -452,6 +467,11 @@ class ShiftAssigner:
             x[0]                                    # Then sort by date
         ))
 
+        # Pinned shifts are assigned first and left out of the search
+        pinned_shifts = self._apply_pins(rules, shifts_to_assign, shift_availability, regular_availability,
+                                         period_metrics, period_name, staffing, workload)
+        shifts_to_assign = [(d, s) for d, s in shifts_to_assign if (d.isoformat(), s.nombre) not in pinned_shifts]
+
         regular_shifts = []
         urg_lab = []  # For Urgencias lab shifts
         urg_weekend_shifts = {}  # Organize by month/weekend
@@ -459,28 +479,11 @@ class ShiftAssigner:
         for shift_date, section in shifts_to_assign:
             is_urg_weekend = (
                 "Urg_G" in section.nombre and 
-                (shift_date.weekday() >= 4 or shift_date in festivos)  # Friday-Sunday or holiday
+                (shift_date.weekday() >= 4 or shift_date in self.festivos)  # Friday-Sunday or holiday
             )
             if is_urg_weekend:
-                # Group by weekend start date (Friday) to keep weekends together
-                # For Friday: use the same date
-                # For Saturday: use the previous day (Friday)
-                # For Sunday: use Friday (2 days back)
-                # For holidays on weekdays: use the date itself
-                if shift_date.weekday() == 4:  # Friday
-                    weekend_key = shift_date
-                elif shift_date.weekday() == 5:  # Saturday
-                    weekend_key = shift_date - timedelta(days=1)  # Previous Friday
-                elif shift_date.weekday() == 6:  # Sunday
-                    weekend_key = shift_date - timedelta(days=2)  # Previous Friday
-                else:
-                    # Holiday on weekday - use the date itself
-                    weekend_key = shift_date
-                
-                if weekend_key not in urg_weekend_shifts:
-                    urg_weekend_shifts[weekend_key] = []
-                
-                urg_weekend_shifts[weekend_key].append((shift_date, section))
+                # Group by weekend (Friday date) to keep weekends together; holidays on weekdays are their own key
+                urg_weekend_shifts.setdefault(weekend_key(shift_date), []).append((shift_date, section))
             elif section.nombre == "Urg_G_noche_l":
                 urg_lab.append((shift_date, section))
             else:
@@ -517,32 +520,25 @@ class ShiftAssigner:
 
             # Find eligible workers for this shift
             eligible_workers = []
+            weekday = date.weekday()  # 0=Monday, 1=Tuesday, 2=Wednesday, 3=Thursday, 4=Friday
 
             for worker in self.workers:
-                # Check if worker is available on this date and can work in this section
-                if (worker.name in shift_availability.columns and 
-                    shift_availability.loc[date, worker.name] and worker.state == "Alta" and
-                    worker.can_work_in_area(self._get_required_category(section))):
-                    
-                    # Check if this is a weekday (Monday-Thursday) that needs special handling
-                    weekday = date.weekday()  # 0=Monday, 1=Tuesday, 2=Wednesday, 3=Thursday, 4=Friday
-                    weekday_name = weekdays[weekday]
-                    # For Monday-Thursday, check if this worker has this day assigned to this section
-                    is_eligible = True
-                    if 0 <= weekday <= 3 and section.nombre in ["UCI_G_lab", "Coordis_nocturno", "Coordis_diurno", "HEMS_tarde", "Urg_G_noche_l"]:  # Monday to Thursday
-                        if hasattr(worker, 'days_assigned') and worker.days_assigned:
-                            section_days = worker.days_assigned.get(self._get_required_category(section), [])
-                            # If worker has specific days assigned for this section but today is not one of them
-                            if weekday_name not in section_days:
-                                is_eligible = False
-                                self.logger.info(f"  - {worker.name} not eligible: day {weekday_name} not in assigned days for {section.nombre}")
-                        if len(worker.days_assigned)==0:
-                            is_eligible = False
-                            self.logger.info(f"  - {worker.name} not eligible: doesn't have a day assigned from Monday to Thursday")
-                    
+                # Static eligibility (active, area, Monday-Thursday assigned days, section-day
+                # constraints) is one lookup, then the worker must be available on this date
+                if (self.eligibility.allows(section.nombre, weekday, worker.name) and
+                    worker.name in shift_availability.columns and 
+                    shift_availability.loc[date, worker.name]):
+                    is_eligible = not rules.is_excluded(section.nombre, date, worker.name)
+                    if not is_eligible:
+                        self.logger.info(f"  - {worker.name} not eligible: excluded by a scheduling rule")
+
+                    if is_eligible and not workload.allows(worker.name, section, date):
+                        is_eligible = False
+                        self.logger.info(f"  - {worker.name} not eligible: monthly cap or guard hours reached")
+
                     # NEW: Check minimum staffing requirement for regular shifts
                     if is_eligible and self.is_regular_shift(section) and 0 <= weekday <= 3:
-                        if not self.check_minimum_staffing(worker, date, regular_availability):
+                        if not self.check_minimum_staffing(worker, date, staffing):
                             is_eligible = False
                             self.logger.info(f"  - {worker.name} not eligible: insufficient staffing would remain in department")
                     
@@ -560,48 +556,33 @@ class ShiftAssigner:
             if not eligible_workers:
                 # CRITICAL FIX: Check if this shift is fundamentally impossible
                 # (i.e., no worker can EVER do this shift regardless of availability)
-                weekday = date.weekday()
-                weekday_name = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"][weekday]
-                
-                fundamentally_possible = False
-                for worker in self.workers:
-                    if (worker.state == "Alta" and
-                        worker.can_work_in_area(self._get_required_category(section))):
-                        
-                        # Check weekday eligibility for Monday-Thursday
-                        if 0 <= weekday <= 3:  # Monday to Thursday
-                            if hasattr(worker, 'days_assigned') and worker.days_assigned:
-                                section_days = worker.days_assigned.get(self._get_required_category(section), [])
-                                if weekday_name in section_days:
-                                    fundamentally_possible = True
-                                    break
-                        else:
-                            # For weekends/holidays, if worker can work in area, it's possible
-                            fundamentally_possible = True
-                            break
+                weekday_name = weekdays[weekday]
+                fundamentally_possible = self.eligibility.candidate_count(section.nombre, weekday) > 0
                 
                 if not fundamentally_possible:
                     if self.logger:
                         self.logger.error(f"FUNDAMENTAL ERROR: No worker can EVER work {section.nombre} on {weekday_name}s")
-                        self.logger.error(f"This is a configuration problem - please assign at least one worker to {weekday_name} for {self._get_required_category(section)}")
+                        self.logger.error(f"This is a configuration problem - please assign at least one worker to {weekday_name} for {self._get_required_category(section)} (or review their section-day constraints)")
                     print(f"CONFIGURATION ERROR: No worker assigned to work {section.nombre} on {weekday_name}s")
                     print(f"Please check worker day assignments for {self._get_required_category(section)}")
                     return False
                 
                 # Mark all possible assignments for this shift as tried
                 for worker in self.workers:
-                    current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, _, _ in assignment_stack)
+                    current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, *_ in assignment_stack)
                     tried_combinations.add(current_assignments_key + ((date.isoformat(), section.nombre, worker.name),))
                     
                 # Undo the last assignment
                 if assignment_stack:
-                    prev_date, prev_section, prev_worker, prev_shift_availability, prev_regular_availability = assignment_stack.pop()
-                    current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, _, _ in assignment_stack)
+                    prev_date, prev_section, prev_worker, prev_shift_availability, prev_regular_availability, prev_staffing, prev_workload = assignment_stack.pop()
+                    current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, *_ in assignment_stack)
                     self.log_backtracking("backtrack", prev_date, prev_section, prev_worker)
 
                     # Reset availability to previous state
                     shift_availability = prev_shift_availability.copy()
                     regular_availability = prev_regular_availability.copy()
+                    staffing.undo(prev_staffing)
+                    workload.undo(prev_workload)
                     
                     # Remove the previous assignment from the dataframe
                     self.assignments = self.assignments[
@@ -618,7 +599,7 @@ class ShiftAssigner:
                         self.yearly_metrics[prev_worker.name]['weekend_shifts'] -= 1
                         period_metrics[prev_worker.name]['weekend_shifts'] -= 1
                     
-                    if prev_date in festivos:
+                    if prev_date in self.festivos:
                         self.yearly_metrics[prev_worker.name]['festivo_shifts'] -= 1
                         period_metrics[prev_worker.name]['festivo_shifts'] -= 1
                     
@@ -647,18 +628,20 @@ class ShiftAssigner:
             # Save current availability for backtracking
             prev_shift_availability = shift_availability.copy()
             prev_regular_availability = regular_availability.copy()
+            prev_staffing = staffing.checkpoint()
+            prev_workload = workload.checkpoint()
             
             # Assign the shift
-            self.assign_shift_with_dual_availability(date, section, best_worker, shift_availability, regular_availability, period_metrics, period_name)
+            self.assign_shift_with_dual_availability(date, section, best_worker, shift_availability, regular_availability, period_metrics, period_name, staffing, workload)
             self.log_backtracking("assign", date, section, best_worker)
 
             # Mark this assignment as tried
-            current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, _, _ in assignment_stack)
+            current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, *_ in assignment_stack)
             tried_combinations.add(current_assignments_key + ((date.isoformat(), section.nombre, best_worker.name),))
 
             # Save this assignment for potential backtracking
-            assignment_stack.append((date, section, best_worker, prev_shift_availability, prev_regular_availability))
-            current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, _, _ in assignment_stack)
+            assignment_stack.append((date, section, best_worker, prev_shift_availability, prev_regular_availability, prev_staffing, prev_workload))
+            current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, *_ in assignment_stack)
             # Move to next shift
             current_shift_index += 1
 
@@ -670,134 +653,67 @@ class ShiftAssigner:
         
         self.logger.info("Starting Urgencias weekend shifts assignment")
         
+        # Ledger the preference conditions look at, kept up to date with rules.record from here on
+        rules.index_history(self.assignments)
+
         # Get workers eligible for Urgencias shifts
         urg_workers = [w for w in self.workers if w.can_work_in_area("Guardia_Urg")]
         
         # Sort workers consistently
         urg_workers.sort(key=lambda w: w.name)
         
-        # Process each weekend (now keyed by weekend start date)
-        for weekend_key, shifts in urg_weekend_shifts.items():
-            # Use the weekend key (Friday date) for rotation calculation
-            weekend_start_month = weekend_key.month
-            
-            # Use the weekend start month for rotation calculation
-            rotation_offset = (weekend_start_month - 1) % 3
-            
-            self.logger.info(f"Weekend starting {weekend_key.strftime('%Y-%m-%d')} uses rotation for month {weekend_start_month} (offset={rotation_offset})")
-            
-            # HANDLE FIRST FRIDAYS ONCE, BEFORE ROLE ASSIGNMENTS
-            assigned_shifts = set()
-            
-            # Check if this weekend contains a first Friday
+        # The first-Friday reinforcement is worked on the Saturday, before the roles are solved
+        assigned_shifts = set()
+        for shifts in urg_weekend_shifts.values():
             for shift_date, section in shifts:
-                if self.is_first_friday_of_month(shift_date):
-                    self.logger.info(f"First Friday of the month detected on {shift_date.strftime('%Y-%m-%d')}")
-                    
-                    # Assign Friday shift to Violeta Fariña
-                    if section.nombre == "Urg_G_tarde-noche_l":
-                        violeta = next((w for w in urg_workers if w.name == "Violeta Fariña"), None)
-                        if violeta:
-                            self.assign_shift_with_dual_availability(shift_date, section, violeta, shift_availability, regular_availability, period_metrics, period_name)
-                            self.logger.info(f"Assigned Violeta Fariña to Friday shift {section.nombre} on {shift_date.strftime('%Y-%m-%d')}")
-                            
-                            # Mark as assigned
-                            assigned_shifts.add((shift_date.isoformat(), section.nombre))
-                            
-                            # Also handle Sunday morning for Violeta
-                            sunday_date = shift_date + timedelta(days=2)
-                            for sec in self.sections:
-                                if sec.nombre == "Urg_G_festivo_mañana":
-                                    sunday_morning_section = sec
-                                    self.assign_shift_with_dual_availability(sunday_date, sunday_morning_section, violeta, shift_availability, regular_availability, period_metrics, period_name)
-                                    self.logger.info(f"Assigned Violeta Fariña to Sunday morning shift on {sunday_date.strftime('%Y-%m-%d')}")
-                                    
-                                    # Mark Sunday as assigned
-                                    assigned_shifts.add((sunday_date.isoformat(), sunday_morning_section.nombre))
-                                    break
-                    
-                    # Handle reinforcement shift for first Friday weekend
-                    elif section.nombre == "Urg_G_refuerzo_fyf":
-                        saturday_date = shift_date + timedelta(days=1)  # Saturday after first Friday
-                        eligible_workers = [
-                            w for w in urg_workers
-                            if w.name != "Violeta Fariña" and  # Exclude Violeta
-                            w.name in shift_availability.columns and 
-                            shift_availability.loc[saturday_date, w.name] and 
-                            w.state == "Alta"
-                        ]
-                        if eligible_workers:
-                            best_worker = self.find_best_worker_for_shift(eligible_workers, saturday_date, section, period_metrics)
-                            self.assign_shift_with_dual_availability(saturday_date, section, best_worker, shift_availability, regular_availability, period_metrics, period_name)
-                            self.logger.info(f"Assigned {best_worker.name} to refuerzo shift on {saturday_date.strftime('%Y-%m-%d')}")
-                            
-                            # Mark as assigned
-                            assigned_shifts.add((saturday_date.isoformat(), section.nombre))
-            
-            # Group shifts by type (excluding already assigned ones)
-            friday_shifts = []
-            saturday_morning_shifts = []
-            saturday_night_shifts = []
-            sunday_morning_shifts = []
-            sunday_night_shifts = []
-            refuerzo = []
-            
-            for shift_date, section in shifts:
-                # Skip if already assigned in first Friday handling
-                if (shift_date.isoformat(), section.nombre) in assigned_shifts:
-                    continue
-                    
-                day_of_week = shift_date.weekday()
-                
-                if day_of_week == 4:  # Friday
-                    friday_shifts.append((shift_date, section))
-                elif day_of_week == 5:  # Saturday
-                    if "mañana" in section.nombre:
-                        saturday_morning_shifts.append((shift_date, section))
-                    elif "refuerzo" in section.nombre:
-                        refuerzo.append((shift_date, section))
-                    elif "noche" in section.nombre:
-                        saturday_night_shifts.append((shift_date, section))
-                elif day_of_week == 6 or shift_date in festivos:  # Sunday or holiday
-                    if "mañana" in section.nombre:
-                        sunday_morning_shifts.append((shift_date, section))
-                    elif "noche" in section.nombre:
-                        sunday_night_shifts.append((shift_date, section))
-                    elif "refuerzo" in section.nombre:
-                        refuerzo.append((shift_date, section))
-            
-            # NOW assign workers according to roles using the WEEKEND-CONSISTENT rotation
-            self._assign_role_shifts(
-                0, rotation_offset, urg_workers, 
-                friday_shifts + sunday_morning_shifts, 
-                shift_availability, period_metrics, period_name, assigned_shifts
-            )
-    
-            self._assign_role_shifts(
-                1, rotation_offset, urg_workers, 
-                saturday_morning_shifts + sunday_night_shifts, 
-                shift_availability, period_metrics, period_name, assigned_shifts
-            )
-    
-            self._assign_role_shifts(
-                2, rotation_offset, urg_workers, 
-                saturday_night_shifts, 
-                shift_availability, period_metrics, period_name, assigned_shifts
-            )
-            
-            # Assign remaining reinforcement shifts
-            for shift_date, section in refuerzo:
-                if (shift_date.isoformat(), section.nombre) not in assigned_shifts:
-                        eligible_workers = [
-                            w for w in self.workers
-                            if w.name in shift_availability.columns and
-                            shift_availability.loc[shift_date, w.name] and w.can_work_in_area("Guardia_Urg") and
-                            w.state == "Alta"
-                        ]
-                        if eligible_workers:
-                            best_worker = self.find_best_worker_for_shift(eligible_workers, shift_date, section, period_metrics)
-                            self.assign_shift_with_dual_availability(shift_date, section, best_worker, shift_availability, regular_availability, period_metrics, period_name)
-                            self.logger.info(f"Assigned {best_worker.name} to reinforcement shift {section.nombre} on {shift_date.strftime('%Y-%m-%d')}")
+                if section.nombre == "Urg_G_refuerzo_fyf" and self.is_first_friday_of_month(shift_date):
+                    saturday_date = shift_date + timedelta(days=1)  # Saturday after first Friday
+                    eligible_workers = [
+                        w for w in urg_workers
+                        if not rules.is_excluded(section.nombre, saturday_date, w.name) and
+                        self.eligibility.allows(section.nombre, saturday_date.weekday(), w.name) and
+                        w.name in shift_availability.columns and 
+                        shift_availability.loc[saturday_date, w.name] and 
+                        w.state == "Alta" and workload.allows(w.name, section, saturday_date)
+                    ]
+                    if eligible_workers:
+                        best_worker = self._choose_worker(rules, eligible_workers, saturday_date, section, period_metrics)
+                        self.assign_shift_with_dual_availability(saturday_date, section, best_worker, shift_availability, regular_availability, period_metrics, period_name, staffing, workload)
+                        rules.record(saturday_date, section.nombre, best_worker.name)
+                        self.logger.info(f"Assigned {best_worker.name} to refuerzo shift on {saturday_date.strftime('%Y-%m-%d')}")
+                        
+                        # Mark as assigned (the Friday entry is covered by this Saturday shift)
+                        assigned_shifts.add((saturday_date.isoformat(), section.nombre))
+                        assigned_shifts.add((shift_date.isoformat(), section.nombre))
+
+        # Every remaining role of every weekend is solved at once
+        blocks, single_shifts = build_weekend_blocks(urg_weekend_shifts, assigned_shifts, self.festivos)
+        for block, worker in zip(blocks, self._solve_weekend_roles(blocks, urg_workers, shift_availability, period_metrics, rules, workload)):
+            if worker is None:
+                shift_names = ", ".join(f"{section.nombre} {shift_date.strftime('%Y-%m-%d')}" for shift_date, section in block.shifts)
+                self.logger.warning(f"FAILED TO ASSIGN: No worker available for all shifts in role {block.role} on weekend {block.weekend.isoformat()} ({shift_names})")
+                print(f"No worker available for Urgencias weekend role {block.role} on {block.weekend.isoformat()}")
+                continue
+            for shift_date, section in block.shifts:
+                self.assign_shift_with_dual_availability(shift_date, section, worker, shift_availability, regular_availability, period_metrics, period_name, staffing, workload)
+                rules.record(shift_date, section.nombre, worker.name)
+                self.logger.info(f"Assigned role {block.role} to worker {worker.name} on {shift_date.strftime('%Y-%m-%d')}")
+
+        # Assign remaining reinforcement shifts
+        for shift_date, section in single_shifts:
+            eligible_workers = [
+                w for w in self.workers
+                if w.name in shift_availability.columns and
+                shift_availability.loc[shift_date, w.name] and w.can_work_in_area("Guardia_Urg") and
+                w.state == "Alta" and not rules.is_excluded(section.nombre, shift_date, w.name) and
+                self.eligibility.allows(section.nombre, shift_date.weekday(), w.name) and
+                workload.allows(w.name, section, shift_date)
+            ]
+            if eligible_workers:
+                best_worker = self._choose_worker(rules, eligible_workers, shift_date, section, period_metrics)
+                self.assign_shift_with_dual_availability(shift_date, section, best_worker, shift_availability, regular_availability, period_metrics, period_name, staffing, workload)
+                rules.record(shift_date, section.nombre, best_worker.name)
+                self.logger.info(f"Assigned {best_worker.name} to reinforcement shift {section.nombre} on {shift_date.strftime('%Y-%m-%d')}")
         self.logger.info("Urgencias weekend shifts assignment completed")
         self.logger.info("Starting Urgencias lab shifts assignment")
         urg_shift_index = 0
@@ -813,27 +729,18 @@ class ShiftAssigner:
             eligible_workers = []
             
             for worker in self.workers:
-                # Check if worker is available on this date and can work in this section
-                if (worker.name in shift_availability.columns and 
-                    shift_availability.loc[date, worker.name] and worker.state == "Alta" and
-                    worker.can_work_in_area(self._get_required_category(section))):
-                    
-                    # Check if this is a weekday (Monday-Thursday) that needs special handling
-                    weekday = date.weekday()  # 0=Monday, 1=Tuesday, 2=Wednesday, 3=Thursday, 4=Friday
-                    weekday_name = weekdays[weekday]
-                    # For Monday-Thursday, check if this worker has this day assigned to this section
-                    is_eligible = True
-                    if 0 <= weekday <= 3:  # Monday to Thursday
-                        if hasattr(worker, 'days_assigned') and worker.days_assigned:
-                            section_days = worker.days_assigned.get(self._get_required_category(section), [])
-                            # If worker has specific days assigned for this section but today is not one of them
-                            if weekday_name not in section_days:
-                                is_eligible = False
-                                self.logger.info(f"  - {worker.name} not eligible: day {weekday_name} not in assigned days for {section.nombre}")
-                        if len(worker.days_assigned)==0:
-                            is_eligible = False
-                            self.logger.info(f"  - {worker.name} not eligible: doesn't have a day assigned from Monday to Thursday")
-                    
+                # Static eligibility from the index, then availability on this date
+                if (self.eligibility.allows(section.nombre, date.weekday(), worker.name) and
+                    worker.name in shift_availability.columns and 
+                    shift_availability.loc[date, worker.name]):
+                    is_eligible = not rules.is_excluded(section.nombre, date, worker.name)
+                    if not is_eligible:
+                        self.logger.info(f"  - {worker.name} not eligible: excluded by a scheduling rule")
+
+                    if is_eligible and not workload.allows(worker.name, section, date):
+                        is_eligible = False
+                        self.logger.info(f"  - {worker.name} not eligible: monthly cap or guard hours reached")
+
                     if is_eligible:
                         # Check if we've already tried this worker for this shift
                         potential_combination = current_assignments_key + ((date.isoformat(), section.nombre, worker.name),)
@@ -850,36 +757,14 @@ class ShiftAssigner:
                 self.logger.info(f"FAILED: No eligible workers for Urgencias lab shift on {date.strftime('%Y-%m-%d')}")
                 print(f"No eligible workers for Urgencias lab shift on {date.strftime('%Y-%m-%d')}")
                 return False
-            # For Monday shifts, handle the special rule for Velasco/Marín/María Coma
-            if date.weekday() == 0:  # Monday
-                self.logger.info(f"Monday shift detected on {date.strftime('%Y-%m-%d')}, applying special rules")
-                
-                # Find Velasco and Marín in eligible workers
-                velasco = next((w for w in eligible_workers if "Roberto Velasco" in w.name), None)
-                marin = next((w for w in eligible_workers if "Edu Marin" in w.name), None)
-                maria_coma = next((w for w in eligible_workers if w.name == "María Coma"), None)
-                
-                # Check if Velasco or Marín worked weekend nights
-                velasco_worked_weekend =self.worker_had_weekend_night_shift("Roberto Velasco", date)
-                marin_worked_weekend = self.worker_had_weekend_night_shift("Edu Marin", date)
-                
-                # If either of them worked weekend nights, assign to María Coma
-                if (velasco_worked_weekend or marin_worked_weekend) and maria_coma:
-                    self.logger.info(f"Velasco or Marin worked weekend nights, assigning to María Coma")
-                    best_worker = maria_coma
-                # Otherwise, assign to either Velasco or Marín (prefer Velasco if both available)
-                # If both Velasco and Marín are available, choose the one of the 3 (Velasco, Coma, Marin( who had their last shift the longest time ago
-                else:
-                # Not Monday, use regular assignment logic
-                     best_worker = self.find_best_worker_for_shift(eligible_workers, date, section, period_metrics)
-            else:
-                # Not Monday, use regular assignment logic
-                best_worker = self.find_best_worker_for_shift(eligible_workers, date, section, period_metrics)
-            self.assign_shift_with_dual_availability(date, section, best_worker, shift_availability, regular_availability, period_metrics, period_name)
+            # Preference rules (e.g. the Monday after a weekend night) come before the regular scoring
+            best_worker = self._choose_worker(rules, eligible_workers, date, section, period_metrics)
+            self.assign_shift_with_dual_availability(date, section, best_worker, shift_availability, regular_availability, period_metrics, period_name, staffing, workload)
+            rules.record(date, section.nombre, best_worker.name)
             self.logger.info(f"Assigned {best_worker.name} to Urgencias lab shift on {date.strftime('%Y-%m-%d')}")
             
             # Mark this assignment as tried
-            current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, _, _ in assignment_stack)
+            current_assignments_key = tuple((d.isoformat(), s.nombre, w.name) for d, s, w, *_ in assignment_stack)
             tried_combinations.add(current_assignments_key + ((date.isoformat(), section.nombre, best_worker.name),))
             
             # Update shift_availability
@@ -892,7 +777,7 @@ class ShiftAssigner:
                     shift_availability.loc[next_day, best_worker.name] = False
             
             # Save this assignment for potential backtracking
-            assignment_stack.append((date, section, best_worker, shift_availability.copy(), regular_availability.copy()))            
+            assignment_stack.append((date, section, best_worker, shift_availability.copy(), regular_availability.copy(), staffing.checkpoint(), workload.checkpoint()))            
             # Move to next Urgencias lab shift
             urg_shift_index += 1
 
@@ -902,82 +787,53 @@ class ShiftAssigner:
 
 
     def initialize_regular_availability_matrix(self, start_date, end_date):
-        """Create a matrix tracking worker availability for regular work schedule (jornada)"""
-        # Create date range for the period
-        date_range = []
-        current_date = start_date
-        while current_date <= end_date:
-            date_range.append(current_date)
-            current_date += timedelta(days=1)
-        
-        # Initialize availability matrix (True = available for regular work)
-        availability = pd.DataFrame(
-            True, 
-            index=date_range, 
-            columns=[worker.name for worker in self.workers]
-        )
-        
-        # Mark unavailable days due to vacations, training, etc.
-        for worker in self.workers:
-            # Skip days worker is unavailable (if this data exists)
-            if hasattr(worker, 'ooo_days') and worker.ooo_days:
-                for day in worker.ooo_days:
-                    if day in availability.index:
-                        availability.loc[day, worker.name] = False
-            
-            # NEW: Mark days based on worker's regular work schedule (dias_semana_jornada)
-            if hasattr(worker, 'dias_semana_jornada') and worker.dias_semana_jornada:
-                for date in date_range:
-                    weekday_name = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"][date.weekday()]
-                    if weekday_name not in worker.dias_semana_jornada:
-                        availability.loc[date, worker.name] = False
-        
-        return availability
+        """Create a matrix tracking worker availability for regular work (jornada)"""
+        date_range = pd.date_range(start_date, end_date, freq='D')
+        weekday_bits = 1 << date_range.weekday.to_numpy()
+
+        # Available on the worker's jornada weekdays, except out-of-office days
+        available = np.empty((len(date_range), len(self.workers)), dtype=bool)
+        for column, worker in enumerate(self.workers):
+            available[:, column] = (weekday_bits & worker.jornada_mask) != 0
+            for row_start, row_stop in worker.ooo_row_ranges(start_date, len(date_range)):
+                available[row_start:row_stop, column] = False
+
+        return pd.DataFrame(available, index=list(date_range.date), columns=[worker.name for worker in self.workers])
 
     def is_regular_shift(self, section):
         """Check if a section is considered a regular shift (not urgencias)"""
         return not ("Urg_G" in section.nombre)
 
-    def check_minimum_staffing(self, worker, date, regular_availability):
-        """Check if assigning this worker would leave at least 2 other workers available in the same category"""
-        worker_category = None
-        
-        # Determine worker's category based on what areas they can work in
-        if worker.can_work_in_area("Guardia_UCI"):
-            worker_category = "Guardia_UCI"
-        elif worker.can_work_in_area("HEMS"):
-            worker_category = "HEMS"
-        elif worker.can_work_in_area("Coordis"):
-            worker_category = "Coordis"
-        elif worker.can_work_in_area("Guardia_Urg"):
-            worker_category = "Guardia_Urg"
-        else:
+    def check_minimum_staffing(self, worker, date, staffing):
+        """
+        Check if assigning this worker would leave the minimum staff of their category available
+
+        The date and the next day (when it is part of the period) are checked
+        against the per-category counters, so the test does not scan the workers.
+
+        Args:
+            worker: Candidate worker
+            date: Date of the regular shift
+            staffing: StaffingCounters of the period
+
+        Returns:
+            True if every checked day keeps at least the category minimum
+        """
+        headroom = staffing.headroom(worker, [date, date + timedelta(days=1)])
+        if headroom is None:
             return True  # If we can't determine category, don't restrict
-        
-        # Count available workers in the same category for this date and next day
-        dates_to_check = [date]
-        next_day = date + timedelta(days=1)
-        if next_day in regular_availability.index:
-            dates_to_check.append(next_day)
-        
-        for check_date in dates_to_check:
-            available_count = 0
-            
-            for other_worker in self.workers:
-                if (other_worker.name != worker.name and 
-                    other_worker.can_work_in_area(worker_category) and
-                    other_worker.name in regular_availability.columns and
-                    regular_availability.loc[check_date, other_worker.name]):
-                    available_count += 1
-            
-            if available_count < 2:
-                self.logger.info(f"Insufficient staffing for {worker_category} on {check_date}: only {available_count} workers would remain")
-                return False
-        
+
+        spare, check_date = headroom
+        category = staffing.category_of(worker)
+        if spare < 0:
+            remaining = spare + staffing.minimum_staff.get(category, 0)
+            self.logger.info(f"Insufficient staffing for {category} on {check_date}: only {remaining} workers would remain")
+            return False
+        self.logger.info(f"  - {worker.name}: staffing headroom {spare} for {category} on {check_date}")
         return True
 
-    def assign_shift_with_dual_availability(self, date, section, worker, shift_availability, regular_availability, period_metrics, period_name):
-        """Assign a worker to a shift and update both availability matrices"""
+    def assign_shift_with_dual_availability(self, date, section, worker, shift_availability, regular_availability, period_metrics, period_name, staffing=None, workload=None):
+        """Assign a worker to a shift and update both availability matrices (and the staffing and workload counters, if given)"""
         # CHECK: Prevent duplicate assignments
         existing_assignment = self.assignments[
             (self.assignments['date'] == date) & 
@@ -997,10 +853,12 @@ class ShiftAssigner:
             'worker_name': worker.name,
             'hours': section.horas_turno,
             'libra': section.libra,
-            'is_festivo': date in festivos,
+            'is_festivo': date in self.festivos,
             'is_weekend': self.is_weekend(date),
             'period': period_name
         }])], ignore_index=True)
+        if workload is not None:
+            workload.add(worker.name, section, date)
         
         # Mark worker as unavailable for this day in shift availability
         shift_availability.loc[date, worker.name] = False
@@ -1008,6 +866,8 @@ class ShiftAssigner:
         # If this is a regular shift, also mark as unavailable in regular availability
         if self.is_regular_shift(section):
             regular_availability.loc[date, worker.name] = False
+            if staffing is not None:
+                staffing.mark_unavailable(worker.name, date)
         
         # If libra=True, mark next day as unavailable too in both matrices
         if section.libra:
@@ -1016,6 +876,8 @@ class ShiftAssigner:
                 shift_availability.loc[next_day, worker.name] = False
             if self.is_regular_shift(section) and next_day in regular_availability.index and self.is_regular_shift(section):
                 regular_availability.loc[next_day, worker.name] = False
+                if staffing is not None:
+                    staffing.mark_unavailable(worker.name, next_day)
 
         # Update period metrics
         period_metrics[worker.name]['total_shifts'] += 1
@@ -1027,7 +889,7 @@ class ShiftAssigner:
         if self.is_weekend(date):
             period_metrics[worker.name]['weekend_shifts'] += 1
             
-        if date in festivos:
+        if date in self.festivos:
             period_metrics[worker.name]['festivo_shifts'] += 1
             
         # Update yearly metrics as well
@@ -1040,7 +902,7 @@ class ShiftAssigner:
         if self.is_weekend(date):
             self.yearly_metrics[worker.name]['weekend_shifts'] += 1
             
-        if date in festivos:
+        if date in self.festivos:
             self.yearly_metrics[worker.name]['festivo_shifts'] += 1
     
     def find_best_worker_for_shift(self, eligible_workers, date, section, period_metrics):
@@ -1180,130 +1042,137 @@ class ShiftAssigner:
         self.log_backtracking("scores", date, section, worker_scores)
         return max(worker_scores, key=lambda x: x[1])[0]
     
-    def _assign_role_shifts(self, role_id, rotation_offset, workers, shifts, availability, period_metrics, period_name, assigned_shifts=None):
-        """Assign shifts for a specific role in the Urgencias weekend rotation pattern"""
-        if not shifts:
-            self.logger.info(f"No shifts to assign for role {role_id} in period {period_name}")
-            return
-        
-        # Use the passed assigned_shifts set, or create a new one if None
-        if assigned_shifts is None:
-            assigned_shifts = set()
-        else:
-            # Make a copy to avoid modifying the original
-            assigned_shifts = assigned_shifts.copy()
-        
-        self.logger.info(f"Starting assignment for role {role_id} in period {period_name} with {len(shifts)} shifts")
-        
-        # REMOVE ALL FIRST FRIDAY HANDLING - it's now done before calling this method
-        
-        # Group remaining shifts by weekend (using Friday/Saturday date as the key)
-        weekend_shifts = {}
-        for shift_date, section in shifts:
-            shift_key = (shift_date.isoformat(), section.nombre)
-            if shift_key in assigned_shifts:
-                self.logger.info(f"Skipping already assigned shift: {section.nombre} on {shift_date.strftime('%Y-%m-%d')}")
+    def _choose_worker(self, rules, eligible_workers, date, section, period_metrics):
+        """Worker a preference rule gives the shift to, or the best scored one"""
+        preferred_name = rules.preferred_worker(section.nombre, date, [w.name for w in eligible_workers])
+        if preferred_name is not None:
+            self.logger.info(f"Scheduling rule prefers {preferred_name} for {section.nombre} on {date.strftime('%Y-%m-%d')}")
+            return next(w for w in eligible_workers if w.name == preferred_name)
+        return self.find_best_worker_for_shift(eligible_workers, date, section, period_metrics)
+
+    def _apply_pins(self, rules, shifts_to_assign, shift_availability, regular_availability, period_metrics, period_name, staffing, workload):
+        """
+        Assign the shifts pinned by scheduling rules before the search
+
+        A pin is applied when its shift is demanded in the period and its worker
+        is active, available and within their monthly caps and guard hours;
+        otherwise it is logged and the shift is left to the search.
+
+        Args:
+            rules: CompiledRules of the period
+            shifts_to_assign: (date, Section) pairs demanded in the period
+            shift_availability: Shift availability matrix
+            regular_availability: Regular availability matrix
+            period_metrics: Metrics of the period so far
+            period_name: Name of the period
+            staffing: StaffingCounters of the period
+            workload: WorkloadCounters of the period
+
+        Returns:
+            Set of (ISO date, section name) keys assigned
+        """
+        demanded = {(d.isoformat(), s.nombre): (d, s) for d, s in shifts_to_assign}
+        workers_by_name = {w.name: w for w in self.workers}
+        pinned = set()
+        for pin_date, section_name, worker_name in rules.pins:
+            key = (pin_date.isoformat(), section_name)
+            if key not in demanded or key in pinned:
                 continue
+            worker = workers_by_name.get(worker_name)
+            if (worker is None or worker.state != "Alta" or worker_name not in shift_availability.columns or
+                    not shift_availability.loc[pin_date, worker_name]):
+                self.logger.warning(f"Pin of {worker_name} to {section_name} on {key[0]} not applied: worker not available")
+                continue
+            shift_date, section = demanded[key]
+            if not workload.allows(worker_name, section, shift_date):
+                self.logger.warning(f"Pin of {worker_name} to {section_name} on {key[0]} not applied: monthly cap or guard hours reached")
+                continue
+            self.assign_shift_with_dual_availability(shift_date, section, worker, shift_availability, regular_availability, period_metrics, period_name, staffing, workload)
+            self.logger.info(f"Assigned {worker_name} to pinned shift {section_name} on {key[0]}")
+            pinned.add(key)
+        return pinned
 
-            if shift_date.weekday() == 4:  # Friday
-                weekend_key = shift_date.isoformat()
-            elif shift_date.weekday() == 5:  # Saturday
-                weekend_key = (shift_date - timedelta(days=1)).isoformat()
-            elif shift_date.weekday() == 6:  # Sunday
-                weekend_key = (shift_date - timedelta(days=2)).isoformat()
-            else:
-                # For holidays that fall on weekdays, use the date itself
-                weekend_key = shift_date.isoformat()
-            
-            if weekend_key not in weekend_shifts:
-                weekend_shifts[weekend_key] = []
-            weekend_shifts[weekend_key].append((shift_date, section))
-        
-        # Determine preferred workers for this role based on rotation
-        preferred_workers = []
-        for i, worker in enumerate(workers):
-            if (i + rotation_offset) % 3 == role_id:
-                preferred_workers.append(worker)
-        
-        self.logger.info(f"Preferred workers for role {role_id}: {[w.name for w in preferred_workers]}")
-        
-        # For each weekend, assign ALL shifts to ONE worker
-        for weekend_key, weekend_role_shifts in weekend_shifts.items():
-            self.logger.info(f"Processing weekend {weekend_key} with {len(weekend_role_shifts)} shifts for role {role_id}")
-            
-            # Find workers who are available for ALL shifts in this weekend's role
-            eligible_preferred_workers = []
-            
-            # Check each preferred worker for availability on all shifts
-            for worker in preferred_workers:
-                can_do_all_shifts = True
-                
-                # Check if worker is available for every shift in this role for this weekend
-                for shift_date, section in weekend_role_shifts:
-                    if not (worker.name in availability.columns and 
-                        availability.loc[shift_date, worker.name] and 
-                        worker.state == "Alta"):
-                        can_do_all_shifts = False
-                        self.logger.info(f"Worker {worker.name} cannot do shift on {shift_date} for {section.nombre}")
-                        break
-                
-                if can_do_all_shifts:
-                    eligible_preferred_workers.append(worker)
-            
-            # If we found preferred workers who can do all shifts, use them
-            if eligible_preferred_workers:
-                # Find the best worker among those who can do all shifts
-                best_worker = self.find_best_worker_for_shift(
-                    eligible_preferred_workers, 
-                    weekend_role_shifts[0][0],  # Use first shift date for scoring
-                    weekend_role_shifts[0][1],  # Use first shift section for scoring
-                    period_metrics
-                )
-                
-                # Assign ALL shifts for this weekend's role to the same worker
-                for shift_date, section in weekend_role_shifts:
-                    self.assign_shift_with_dual_availability(shift_date, section, best_worker, availability, [], period_metrics, period_name)
-                    assigned_shifts.add((shift_date.isoformat(), section.nombre))
-                    self.logger.info(f"Assigned role {role_id} to preferred worker {best_worker.name} on {shift_date.strftime('%Y-%m-%d')}")
-            
-            # If no preferred workers can do all shifts, try other eligible workers
-            else:
-                self.logger.info(f"No preferred workers available for all role {role_id} shifts on weekend {weekend_key}")
-                
-                # Check all other workers who can do all shifts
-                eligible_backup_workers = []
-                for worker in workers:
-                    if worker in preferred_workers:
-                        continue  # Skip preferred workers, already checked
-                        
-                    can_do_all_shifts = True
-                    for shift_date, section in weekend_role_shifts:
-                        if not (worker.name in availability.columns and 
-                            availability.loc[shift_date, worker.name] and 
-                            worker.state == "Alta"):
-                            can_do_all_shifts = False
-                            break
-                    
-                    if can_do_all_shifts:
-                        eligible_backup_workers.append(worker)
-                
-                if eligible_backup_workers:
-                    best_worker = self.find_best_worker_for_shift(
-                        eligible_backup_workers, 
-                        weekend_role_shifts[0][0],
-                        weekend_role_shifts[0][1],
-                        period_metrics
-                    )
-                    
-                    # Assign ALL shifts to the same worker
-                    for shift_date, section in weekend_role_shifts:
-                        self.assign_shift_with_dual_availability(shift_date, section, best_worker, availability, [], period_metrics, period_name)
-                        assigned_shifts.add((shift_date.isoformat(), section.nombre))  # Add this line
-                        self.logger.info(f"Assigned role {role_id} to worker {best_worker.name} on {shift_date.strftime('%Y-%m-%d')}")
-                else:
-                    self.logger.warning(f"FAILED TO ASSIGN: No worker available for all shifts in role {role_id} on weekend {weekend_key}")
-        
-        self.logger.info(f"Completed assignment for role {role_id} in period {period_name}")
+    def _solve_weekend_roles(self, blocks, workers, availability, period_metrics, rules=None, workload=None):
+        """
+        Choose the worker of every Urgencias weekend block of the period in one solve (one per month when capped)
+
+        A worker is a candidate for a block when they are active and available
+        for all of its shifts. Costs favour the worker's rotation role for the
+        month ((i + rotation_offset) % 3 == role, with workers sorted by name),
+        a light period workload and not having done the block's sections recently.
+
+        Args:
+            blocks: WeekendBlock list
+            workers: Urgencias workers, sorted by name
+            availability: Shift availability matrix
+            period_metrics: Metrics of the period so far
+            rules: CompiledRules whose exclusions remove candidates
+            workload: WorkloadCounters whose monthly caps and guard hours limit the blocks of each worker
+
+        Returns:
+            Worker (or None if nobody can take it) for each block
+        """
+        if not blocks or not workers:
+            return [None] * len(blocks)
+
+        # Rotation role of each worker, shifted every month
+        worker_ids = np.arange(len(workers))
+        offsets = np.array([(block.weekend.month - 1) % ROLE_COUNT for block in blocks])
+        roles = np.array([block.role for block in blocks])
+        preferred = (worker_ids[None, :] + offsets[:, None]) % ROLE_COUNT == roles[:, None]
+
+        # Availability of the workers on every date, then one AND over each block's rows
+        columns = availability.columns.get_indexer([worker.name for worker in workers])
+        active = np.array([worker.state == "Alta" for worker in workers]) & (columns >= 0)
+        available = availability.to_numpy(dtype=bool)[:, np.maximum(columns, 0)] & active
+        preferred_candidates, backup_candidates = block_candidate_masks(
+            block_row_index(blocks, availability.index), available, preferred)
+        if rules is not None:
+            allowed = ~rules.block_exclusions(blocks, [worker.name for worker in workers])
+            preferred_candidates &= allowed
+            backup_candidates &= allowed
+        # Static eligibility (section-day constraints) of every shift of each block
+        names = [worker.name for worker in workers]
+        static = {}
+        for b, block in enumerate(blocks):
+            for shift_date, section in block.shifts:
+                key = (section.nombre, shift_date.weekday())
+                if key not in static:
+                    static[key] = self.eligibility.mask(section.nombre, shift_date.weekday(), names)
+                preferred_candidates[b] &= static[key]
+                backup_candidates[b] &= static[key]
+        candidates = preferred_candidates | backup_candidates
+        for b, block in enumerate(blocks):
+            self.logger.info(f"Weekend {block.weekend.isoformat()} role {block.role}: "
+                             f"{int(preferred_candidates[b].sum())} preferred and {int(backup_candidates[b].sum())} backup candidates")
+
+        period_shifts = np.array([period_metrics[worker.name]['total_shifts'] for worker in workers])
+
+        # Days since each worker last did one of the block's sections (large when never)
+        section_names = sorted({section.nombre for block in blocks for _, section in block.shifts})
+        section_ids = {name: k for k, name in enumerate(section_names)}
+        last_done = np.full((len(section_names), len(workers)), np.iinfo("int64").min // 2, dtype="int64")
+        if not self.assignments.empty:
+            history = self.assignments[self.assignments['section_name'].isin(section_names)]
+            history = history.assign(date=pd.to_datetime(history['date']).dt.date.map(datetime_date.toordinal))
+            last = history.groupby(['section_name', 'worker_name'])['date'].max()
+            worker_column = {worker.name: i for i, worker in enumerate(workers)}
+            for (section_name, worker_name), ordinal in last.items():
+                if worker_name in worker_column:
+                    last_done[section_ids[section_name], worker_column[worker_name]] = ordinal
+        days_since = np.empty((len(blocks), len(workers)), dtype="int64")
+        for b, block in enumerate(blocks):
+            elapsed = min(block.dates).toordinal() - last_done[[section_ids[section.nombre] for _, section in block.shifts]]
+            days_since[b] = np.where(elapsed > 0, np.minimum(elapsed, 9999), 9999).min(axis=0)
+
+        costs = weekend_role_costs(preferred, period_shifts, days_since)
+        if workload is None:
+            solution = solve_weekend_roles(blocks, candidates, costs)
+        else:
+            # Monthly caps and guard hours bound the blocks of each worker month by month
+            solution = solve_capped_weekend_roles(blocks, candidates, costs, workload, names)
+        self.logger.info(f"Solved {len(blocks)} Urgencias weekend blocks, {solution.count(None)} without candidates")
+        return [workers[i] if i is not None else None for i in solution]
     
     def assign_all_shifts(self):
         """Assign shifts for the entire year in biweekly periods"""
@@ -1338,47 +1207,35 @@ class ShiftAssigner:
     def get_assignment_stats(self):
         """Get summary statistics for the assignments"""
         stats = {}
+        worker_names = list(self.yearly_metrics.keys())
+        
+        # Hours counted with the same per-section rules as the Comptatges view
+        counted_hours = {}
+        if not self.assignments.empty:
+            counted_hours = compute_counted_hours(self.assignments, all_sections)\
+                .groupby(self.assignments['worker_name']).sum().to_dict()
         
         # Per worker stats
         for worker_name, metrics in self.yearly_metrics.items():
             stats[worker_name] = {
                 'total_shifts': metrics['total_shifts'],
                 'total_hours': metrics['total_hours'],
+                'counted_hours': float(counted_hours.get(worker_name, 0)),
                 'night_shifts': metrics['night_shifts'],
                 'weekend_shifts': metrics['weekend_shifts'],
                 'festivo_shifts': metrics['festivo_shifts']
             }
             
-        # Per period stats
-        period_stats = {}
-        for period_name in self.assignments['period'].unique():
-            period_df = self.assignments[self.assignments['period'] == period_name]
-            
-            worker_stats = {}
-            for worker_name in self.yearly_metrics.keys():
-                worker_df = period_df[period_df['worker_name'] == worker_name]
-                
-                # Fix: Explicitly convert to int before summing
-                night_shift_count = sum(1 if self.is_night_shift_by_name(row['section_name']) else 0 
-                                    for _, row in worker_df.iterrows())
-                weekend_shifts = int(worker_df['is_weekend'].sum()) if len(worker_df) > 0 else 0
-                festivo_shifts = int(worker_df['is_festivo'].sum()) if len(worker_df) > 0 else 0
-                
-                worker_stats[worker_name] = {
-                    'total_shifts': len(worker_df),
-                    'total_hours': float(worker_df['hours'].sum()) if len(worker_df) > 0 else 0,
-                    'night_shifts': night_shift_count,
-                    'weekend_shifts': weekend_shifts,
-                    'festivo_shifts': festivo_shifts
-                }
-                    
-            period_stats[period_name] = worker_stats
-            
-        stats['period_stats'] = period_stats
+        # Per period stats, every worker in every period (one groupby over the ledger)
+        known = self.assignments[self.assignments['worker_name'].isin(worker_names)]
+        period_metrics = period_worker_metrics(known, worker_names, self.festivos)
+        stats['period_stats'] = period_metrics_to_dict(period_metrics)
         
         # Overall stats
         stats['total_shifts_assigned'] = len(self.assignments)
-        stats['unassigned_shifts_count'] = self.count_unassigned_shifts()
+        uncovered = self.get_uncovered_report()
+        stats['unassigned_shifts_count'] = self.count_unassigned_shifts(uncovered)
+        stats['uncovered_shifts'] = uncovered.to_dict('records')
         
         return stats
 
@@ -1386,84 +1243,124 @@ class ShiftAssigner:
         """Check if a section name indicates a night shift"""
         return 'noche' in section_name.lower() or 'nocturno' in section_name.lower()
     
-    def count_unassigned_shifts(self):
-        """Count shifts that should be assigned but weren't"""
-        unassigned_count = 0
-        
-        # For each day, check if all required shifts were assigned
-        for date, day_type in self.calendario:
-            for section in self.sections:
-                # Skip the excluded sections
-                if ("Urg_G_noche_l" in section.nombre or "Urg_G_tarde-noche_l" in section.nombre or
-                    "Urg_G_festivo" in section.nombre or "Urg_G_refuerzo_fyf" in section.nombre):
-                    continue
-                
-                # Check if this section applies to this day
-                if day_type not in section.dias:
-                    continue
-                    
-                # Skip if this section has specific dates and this date is not in it
-                if hasattr(section, 'fechas') and section.fechas and date not in section.fechas:
-                    continue
-                
-                # Check if we have an assignment for this date and section
-                matching_assignments = self.assignments[
-                    (self.assignments['date'] == date) & 
-                    (self.assignments['section_name'] == section.nombre)
-                ]
-                
-                if len(matching_assignments) == 0:
-                    unassigned_count += 1
-        
-        return unassigned_count
-    
+    def get_feasibility_report(self, start_date, end_date):
+        """
+        Candidates of every (section, weekday) demanded in a period, before solving
+
+        Read from the eligibility index, so it costs one pass over the demand.
+        Pairs without candidates can't be covered whatever the availability.
+
+        Args:
+            start_date: First date (inclusive)
+            end_date: Last date (inclusive)
+
+        Returns:
+            DataFrame with section_name, weekday, shifts, candidates and removed_by_constraints
+        """
+        return self.eligibility.feasibility_report(self.get_period_demand(start_date, end_date))
+
+    def log_feasibility_report(self, demand):
+        """Log the pre-solve feasibility of a period's demand (see get_feasibility_report)"""
+        report = self.eligibility.feasibility_report(demand)
+        for row in report.itertuples(index=False):
+            if row.candidates == 0:
+                self.logger.warning(f"INFEASIBLE: no worker can do {row.section_name} on {row.weekday}s "
+                                    f"({row.shifts} shifts, {row.removed_by_constraints} removed by section-day constraints)")
+            elif row.removed_by_constraints:
+                self.logger.info(f"{row.section_name} on {row.weekday}s: {row.candidates} candidates, "
+                                 f"{row.removed_by_constraints} removed by section-day constraints")
+        return report
+
+    def get_uncovered_report(self, start_date=None, end_date=None):
+        """
+        List every required shift without an assigned worker, with the likely reason
+
+        The demand of the period is anti-joined with the assignments ledger on
+        (date, section). Each uncovered slot is then explained, in order, by the
+        section having no worker category, no active worker having that area, all
+        of them being out of office that day, or otherwise the solver's constraints.
+
+        Args:
+            start_date: First date (inclusive), the start of the calendar by default
+            end_date: Last date (inclusive), the end of the calendar by default
+
+        Returns:
+            DataFrame with date, weekday, is_festivo, section_name and reason
+        """
+        calendar_dates = [date for date, _ in self.calendario]
+        if not calendar_dates or not self.sections:
+            return pd.DataFrame(columns=['date', 'weekday', 'is_festivo', 'section_name', 'reason'])
+
+        demand = self.get_period_demand(start_date or min(calendar_dates), end_date or max(calendar_dates))
+        report = uncovered_slots(demand, self.assignments)
+        if report.empty:
+            report['reason'] = pd.Series(dtype='object')
+            return report
+
+        # Active workers per category and the days each of them is out of office
+        categories = {section.nombre: self._get_required_category(section) for section in demand.sections}
+        active = [worker for worker in self.workers if worker.state == "Alta"]
+        first_day = pd.Timestamp(demand.dates[0]).date() if len(demand.dates) else None
+        rows = demand.date_index(report['date'].to_numpy())
+        reasons = np.full(len(report), UNCOVERED_NOT_ASSIGNED, dtype=object)
+        for section_name, category in categories.items():
+            in_section = (report['section_name'] == section_name).to_numpy()
+            if not in_section.any():
+                continue
+            if category is None:
+                reasons[in_section] = UNCOVERED_NO_CATEGORY
+                continue
+            staff = [worker for worker in active if worker.can_work_in_area(category)]
+            if not staff:
+                reasons[in_section] = UNCOVERED_NO_STAFF
+                continue
+            absent = self.ooo_index.unavailable_counts(first_day, len(demand.dates), [worker.name for worker in staff])
+            present = len(staff) - absent
+            reasons[in_section & (present[rows] == 0)] = UNCOVERED_ALL_OOO
+
+        report['reason'] = reasons
+        return report
+
+    def count_unassigned_shifts(self, report=None):
+        """Count shifts that should be assigned but weren't (Urgencias sections excluded)"""
+        if report is None:
+            report = self.get_uncovered_report()
+        if report.empty:
+            return 0
+        excluded = report['section_name'].str.contains('|'.join(URGENCIAS_UNCOUNTED_SECTIONS), regex=True)
+        return int((~excluded).sum())
+
     def export_to_csv(self, filename="shift_assignments.csv"):
-        """Export assignments to CSV file"""
-        self.assignments.sort_values(by=['date', 'section_name']).to_csv(filename, index=False)
+        """
+        Export assignments and period/yearly statistics to CSV files
+
+        Returns:
+            Dictionary with the assignments, period_statistics and yearly_statistics frames written
+        """
+        assignments = self.assignments.sort_values(by=['date', 'section_name'])
+        assignments.to_csv(filename, index=False)
         timestamp = datetime_type.now().strftime("%Y%m%d_%H%M%S")
-        assignments_csv_path = f"./data/assignments_{timestamp}.csv"
-        self.assignments.sort_values(by=['date', 'section_name']).to_csv(assignments_csv_path)
-        # Also export period-wise statistics
-        stats = self.get_assignment_stats()
-        
-        # Create a DataFrame with worker statistics per period
-        period_stats_rows = []
-        for period, workers in stats['period_stats'].items():
-            for worker_name, metrics in workers.items():
-                if metrics['total_shifts'] > 0:  # Only include workers with shifts
-                    period_stats_rows.append({
-                        'Period': period,
-                        'Worker': worker_name,
-                        'Total Shifts': metrics['total_shifts'],
-                        'Total Hours': metrics['total_hours'],
-                        'Night Shifts': metrics['night_shifts'],
-                        'Weekend Shifts': metrics['weekend_shifts'],
-                        'Festivo Shifts': metrics['festivo_shifts']
-                    })
-                    
-        # Export to CSV if we have data
-        if period_stats_rows:
-            pd.DataFrame(period_stats_rows).to_csv("data/period_statistics.csv", index=False)
+        assignments.to_csv(f"./data/assignments_{timestamp}.csv")
+
+        # Period-wise statistics (only workers with shifts) and yearly statistics
+        worker_names = list(self.yearly_metrics.keys())
+        known = self.assignments[self.assignments['worker_name'].isin(worker_names)]
+        period_table = metrics_table(period_worker_metrics(known, worker_names, self.festivos), only_active=True)
+        yearly_table = pd.DataFrame(
+            [{'Worker': name, **{METRIC_LABELS[key]: metrics[key] for key in METRIC_KEYS}}
+             for name, metrics in self.yearly_metrics.items()],
+            columns=['Worker'] + [METRIC_LABELS[key] for key in METRIC_KEYS]
+        )
+
+        if not period_table.empty:
+            period_table.to_csv("data/period_statistics.csv", index=False)
             print("Period statistics exported to period_statistics.csv")
-            
-        # Export yearly statistics
-        yearly_stats_rows = []
-        for worker_name, metrics in stats.items():
-            if worker_name != 'period_stats' and worker_name != 'total_shifts_assigned' and worker_name != 'unassigned_shifts_count':
-                yearly_stats_rows.append({
-                    'Worker': worker_name,
-                    'Total Shifts': metrics['total_shifts'],
-                    'Total Hours': metrics['total_hours'],
-                    'Night Shifts': metrics['night_shifts'],
-                    'Weekend Shifts': metrics['weekend_shifts'],
-                    'Festivo Shifts': metrics['festivo_shifts']
-                })
-                
-        # Export to CSV if we have data
-        if yearly_stats_rows:
-            pd.DataFrame(yearly_stats_rows).to_csv("data/yearly_statistics.csv", index=False)
+        if not yearly_table.empty:
+            yearly_table.to_csv("data/yearly_statistics.csv", index=False)
             print("Yearly statistics exported to data/yearly_statistics.csv")
 
+        return {'assignments': assignments, 'period_statistics': period_table, 'yearly_statistics': yearly_table}
+
     def setup_logging(self):
         """Configure logging for backtracking operations"""
         log_filename = f"./data/backtracking_log_{(datetime_type.now() + timedelta(hours=2)).strftime('%Y%m%d_%H%M%S')}.txt"
@@ -1515,7 +1412,7 @@ def main():
     
     print("\nYearly Worker Statistics:")
     for worker_name, metrics in {k: v for k, v in stats.items() 
-                                if k != 'period_stats' and k != 'total_shifts_assigned' and k != 'unassigned_shifts_count'}.items():
+                                if k not in STATS_SUMMARY_KEYS}.items():
         print(f"{worker_name}: {metrics['total_shifts']} shifts, {metrics['total_hours']} hours, "
               f"{metrics['night_shifts']} nights, {metrics['weekend_shifts']} weekends, "
               f"{metrics['festivo_shifts']} festivos")
@@ -0,0 +1,991 @@
+import sqlite3
+import threading
+import logging
+import json
+import os
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Any
+from utils.worker import Worker  # Import the Worker class
+from utils.section_rules import decode_section_fechas, encode_section_fechas
+from utils.sections import Section, festivos  # Import the Section class and the bundled holidays
+from utils.assignment_cube import (CUBE_COLUMNS, CUBE_SOURCE_COLUMNS, build_assignment_cube,
+                                   encode_cube_columns, decode_cube)
+from utils.assignment_io import (ASSIGNMENT_COLUMNS, ASSIGNMENT_DTYPES, METRIC_COLUMNS,
+                                 cast_assignment_frame, concat_assignment_pages, columns_to_tuples,
+                                 encode_assignment_columns, encode_metric_columns)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = "data/guardias.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS Workers (
+    name TEXT PRIMARY KEY,
+    initials TEXT,
+    birth_year INTEGER,
+    category TEXT,
+    state TEXT DEFAULT 'Alta',
+    areas TEXT,
+    days_assigned TEXT,
+    avoid_days TEXT,
+    section_day_constraints TEXT,
+    available_work_hours REAL DEFAULT 1688,
+    available_guard_hours REAL DEFAULT 499,
+    ooo_days TEXT,
+    jornada_laboral REAL DEFAULT 100,
+    dias_semana_jornada TEXT,
+    rules TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Sections (
+    nombre TEXT PRIMARY KEY,
+    dias TEXT,
+    horas_turno REAL,
+    horas_jornada REAL,
+    personal INTEGER DEFAULT 1,
+    libra INTEGER DEFAULT 0,
+    fechas TEXT
+);
+
+CREATE TABLE IF NOT EXISTS assignment_scenarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    created_by TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    year INTEGER,
+    description TEXT,
+    settings TEXT,
+    status TEXT DEFAULT 'draft'
+);
+
+CREATE TABLE IF NOT EXISTS shift_assignments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scenario_id INTEGER NOT NULL REFERENCES assignment_scenarios(id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    day_of_week TEXT,
+    section_name TEXT NOT NULL,
+    worker_name TEXT,
+    hours REAL,
+    libra INTEGER DEFAULT 0,
+    is_festivo INTEGER DEFAULT 0,
+    is_weekend INTEGER DEFAULT 0,
+    period TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_shift_assignments_scenario_date
+    ON shift_assignments (scenario_id, date);
+CREATE INDEX IF NOT EXISTS idx_shift_assignments_scenario_worker
+    ON shift_assignments (scenario_id, worker_name, date);
+CREATE INDEX IF NOT EXISTS idx_shift_assignments_scenario_section
+    ON shift_assignments (scenario_id, section_name, date);
+
+CREATE TABLE IF NOT EXISTS assignment_metrics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scenario_id INTEGER NOT NULL REFERENCES assignment_scenarios(id) ON DELETE CASCADE,
+    worker_name TEXT NOT NULL,
+    total_shifts INTEGER DEFAULT 0,
+    total_hours REAL DEFAULT 0,
+    night_shifts INTEGER DEFAULT 0,
+    weekend_shifts INTEGER DEFAULT 0,
+    festivo_shifts INTEGER DEFAULT 0,
+    period TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_assignment_metrics_scenario
+    ON assignment_metrics (scenario_id);
+
+CREATE TABLE IF NOT EXISTS assignment_cube (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scenario_id INTEGER NOT NULL REFERENCES assignment_scenarios(id) ON DELETE CASCADE,
+    worker_name TEXT NOT NULL,
+    section_name TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    shifts INTEGER DEFAULT 0,
+    hours REAL DEFAULT 0,
+    night_shifts INTEGER DEFAULT 0,
+    weekend_shifts INTEGER DEFAULT 0,
+    festivo_shifts INTEGER DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_assignment_cube_scenario
+    ON assignment_cube (scenario_id, year, month);
+
+CREATE TABLE IF NOT EXISTS festivos (
+    date TEXT PRIMARY KEY,
+    description TEXT
+);
+"""
+
+# Columns stored as JSON text in the Workers table
+WORKER_JSON_FIELDS = ('days_assigned', 'avoid_days', 'section_day_constraints', 'ooo_days', 'dias_semana_jornada',
+                      'rules')
+
+# Columns added after the first release, created on open in files that predate them
+ADDED_COLUMNS = {'Workers': {'rules': 'TEXT'}}
+
+
+def _csv_list(value) -> List[str]:
+    """Split a comma-separated CSV cell into its stripped items (empty cells give [])"""
+    if not isinstance(value, str):
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _sections_from_csv(path: str) -> List[Section]:
+    """
+    Read the sections of the CSV export (data/sections.csv)
+
+    Args:
+        path: Path of the CSV file
+
+    Returns:
+        List of Section
+    """
+    sections = []
+    for row in pd.read_csv(path).to_dict('records'):
+        sections.append(Section(
+            nombre=row['nombre'],
+            dias=_csv_list(row['dias']),
+            horas_turno=float(row['horas_turno']),
+            horas_jornada=None,
+            personal=int(row['personal']),
+            libra=str(row['libra']).strip().lower() == 'true',
+            fechas=_csv_list(row.get('fechas')),
+        ))
+    return sections
+
+
+def _decode_json(value, default):
+    """Decode a JSON text column, falling back to the given default"""
+    if value is None or value == "":
+        return default
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return default
+
+
+def _decode_list(value):
+    """Decode a list column stored either as JSON or as comma separated text"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    decoded = _decode_json(value, None)
+    if isinstance(decoded, list):
+        return decoded
+    return [item.strip() for item in str(value).split(",") if item.strip()]
+
+
+def _encode_json(value):
+    """Encode a list/dict attribute as JSON text (strings are stored untouched)"""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, default=str)
+
+
+class SQLiteManager:
+    """
+    Manager class for local SQLite database operations.
+    Implements the same interface as SupabaseManager on a local file, so it can be
+    used for development, benchmarks and offline demos without a remote instance.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_SQLITE_PATH):
+        """
+        Open (and create if needed) the SQLite database file
+
+        Args:
+            db_path: Path of the SQLite file, ':memory:' for a throwaway database
+        """
+        try:
+            self.db_path = db_path
+            if db_path != ":memory:" and os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+            # Streamlit serves every session from its own thread, so the connection
+            # is shared and every access is serialized through a lock
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            self._lock = threading.RLock()
+
+            with self._lock:
+                self.conn.execute("PRAGMA foreign_keys = ON")
+                if db_path != ":memory:":
+                    self.conn.execute("PRAGMA journal_mode = WAL")
+                self.conn.executescript(SCHEMA)
+                self._add_missing_columns()
+                self.conn.commit()
+            logger.info(f"SQLite connection initialized successfully ({db_path})")
+        except Exception as e:
+            logger.error(f"Failed to initialize SQLite connection: {str(e)}")
+            raise
+
+    def _add_missing_columns(self) -> None:
+        """Add the ADDED_COLUMNS missing from an existing database file"""
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in columns.items():
+                if column not in existing:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+                    logger.info(f"Added column {table}.{column}")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        """Run a SELECT statement and return the rows as dictionaries"""
+        with self._lock:
+            cursor = self.conn.execute(sql, params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def _query_df(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        """Run a SELECT statement and return the rows as a DataFrame"""
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """Run a single write statement inside its own transaction"""
+        with self._lock:
+            with self.conn:
+                return self.conn.execute(sql, params)
+
+    # ========== WORKER OPERATIONS ==========
+
+    def _row_to_worker(self, row: Dict) -> Worker:
+        """Convert a Workers row to a Worker object"""
+        row = dict(row)
+        row['areas'] = _decode_list(row.get('areas'))
+        row['days_assigned'] = _decode_json(row.get('days_assigned'), {})
+        row['avoid_days'] = _decode_list(row.get('avoid_days'))
+        row['section_day_constraints'] = _decode_json(row.get('section_day_constraints'), {})
+        row['ooo_days'] = _decode_list(row.get('ooo_days'))
+        dias_semana_jornada = _decode_list(row.pop('dias_semana_jornada', None))
+        if dias_semana_jornada:
+            row['dias_semana_jornada'] = dias_semana_jornada
+        # Drop NULL numeric columns so the Worker defaults apply
+        row = {key: value for key, value in row.items() if value is not None}
+        return Worker(**row)
+
+    def _worker_to_row(self, worker: Worker) -> Dict:
+        """Convert a Worker object to a Workers row"""
+        # Out-of-office periods come as ranges: [{"start": "dd/mm/YYYY", "end": "dd/mm/YYYY", "reason": ...}]
+        worker_data = worker.to_row()
+        if isinstance(worker_data.get('areas'), list):
+            worker_data['areas'] = ", ".join(worker_data['areas'])
+        for field in WORKER_JSON_FIELDS:
+            if field in worker_data:
+                worker_data[field] = _encode_json(worker_data[field])
+        return worker_data
+
+    def get_workers(self) -> List[Worker]:
+        """
+        Retrieve all workers from the database
+
+        Returns:
+            List of Worker objects
+        """
+        try:
+            rows = self._query("SELECT * FROM Workers")
+            worker_list = [self._row_to_worker(row) for row in rows]
+            logger.info(f"Retrieved {len(worker_list)} workers from database")
+            return worker_list
+        except Exception as e:
+            logger.error(f"Error fetching workers: {str(e)}")
+            return []
+
+    def get_worker(self, worker_name: str) -> Optional[Worker]:
+        """
+        Retrieve a specific worker by name
+
+        Args:
+            worker_name: The name of the worker to retrieve
+
+        Returns:
+            Worker object or None if not found
+        """
+        try:
+            rows = self._query("SELECT * FROM Workers WHERE name = ?", (worker_name,))
+            if rows:
+                return self._row_to_worker(rows[0])
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching worker '{worker_name}': {str(e)}")
+            return None
+
+    def create_worker(self, worker: Worker) -> Optional[Worker]:
+        """
+        Create a new worker in the database
+
+        Args:
+            worker: Worker object to create
+
+        Returns:
+            Updated Worker object or None if failed
+        """
+        try:
+            existing = self.get_worker(worker.name)
+            if existing:
+                logger.warning(f"Worker with name '{worker.name}' already exists")
+                return self.update_worker(worker)
+
+            worker_data = self._worker_to_row(worker)
+            columns = ", ".join(worker_data.keys())
+            placeholders = ", ".join("?" for _ in worker_data)
+            self._execute(f"INSERT INTO Workers ({columns}) VALUES ({placeholders})",
+                          tuple(worker_data.values()))
+            logger.info(f"Worker created: {worker.name}")
+            return self.get_worker(worker.name)
+        except Exception as e:
+            logger.error(f"Error creating worker: {str(e)}")
+            raise
+
+    def update_worker(self, worker: Worker) -> Optional[Worker]:
+        """
+        Update an existing worker
+
+        Args:
+            worker: Worker object with updated data
+
+        Returns:
+            Updated Worker object or None if failed
+        """
+        try:
+            if not worker.name:
+                raise ValueError("Worker must have a name to update")
+
+            worker_data = self._worker_to_row(worker)
+            assignments = ", ".join(f"{key} = ?" for key in worker_data)
+            self._execute(f"UPDATE Workers SET {assignments} WHERE name = ?",
+                          tuple(worker_data.values()) + (worker.name,))
+            logger.info(f"Worker updated: {worker.name}")
+            return self.get_worker(worker.name) or worker
+        except Exception as e:
+            logger.error(f"Error updating worker: {str(e)}")
+            raise
+
+    def delete_worker(self, worker_name: str) -> bool:
+        """
+        Delete a worker from the database
+
+        Args:
+            worker_name: The name of the worker to delete
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self._execute("DELETE FROM Workers WHERE name = ?", (worker_name,))
+            logger.info(f"Worker deleted: {worker_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting worker '{worker_name}': {str(e)}")
+            return False
+
+    # ========== SECTION OPERATIONS ==========
+
+    def _row_to_section(self, row: Dict) -> Section:
+        """Convert a Sections row to a Section object"""
+        row = dict(row)
+        row['dias'] = _decode_list(row.get('dias'))
+        row['fechas'] = decode_section_fechas(row.get('fechas'))
+        row['libra'] = bool(row.get('libra'))
+        return Section(**row)
+
+    def _section_to_row(self, section: Section) -> Dict:
+        """Convert a Section object to a Sections row (same text format as Supabase)"""
+        section_data = section._to_dict()
+        section_data['horas_jornada'] = getattr(section, 'horas_jornada', None)
+        if isinstance(section_data.get('dias'), list):
+            section_data['dias'] = ", ".join(section_data['dias'])
+        # Date rules (and legacy date lists) are stored as compact JSON
+        section_data['fechas'] = encode_section_fechas(section_data.get('fechas'))
+        section_data['libra'] = int(bool(section_data.get('libra')))
+        return section_data
+
+    def get_sections(self) -> List[Section]:
+        """
+        Retrieve all sections from the database
+
+        Returns:
+            List of Section objects
+        """
+        try:
+            rows = self._query("SELECT * FROM Sections ORDER BY nombre")
+            section_list = [self._row_to_section(row) for row in rows]
+            logger.info(f"Retrieved {len(section_list)} sections from database")
+            return section_list
+        except Exception as e:
+            logger.error(f"Error fetching sections: {str(e)}")
+            return []
+
+    def get_section(self, section_nombre: str) -> Optional[Section]:
+        """
+        Retrieve a specific section by nombre
+
+        Args:
+            section_nombre: The nombre of the section to retrieve
+
+        Returns:
+            Section object or None if not found
+        """
+        try:
+            rows = self._query("SELECT * FROM Sections WHERE nombre = ?", (section_nombre,))
+            if rows:
+                return self._row_to_section(rows[0])
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching section '{section_nombre}': {str(e)}")
+            return None
+
+    def create_section(self, section: Section) -> Optional[Section]:
+        """
+        Create a new section in the database
+
+        Args:
+            section: Section object to create
+
+        Returns:
+            Updated Section object or None if failed
+        """
+        try:
+            existing = self.get_section(section.nombre)
+            if existing:
+                logger.warning(f"Section with nombre '{section.nombre}' already exists")
+                return self.update_section(section)
+
+            section_data = self._section_to_row(section)
+            columns = ", ".join(section_data.keys())
+            placeholders = ", ".join("?" for _ in section_data)
+            self._execute(f"INSERT INTO Sections ({columns}) VALUES ({placeholders})",
+                          tuple(section_data.values()))
+            logger.info(f"Section created: {section.nombre}")
+            return self.get_section(section.nombre)
+        except Exception as e:
+            logger.error(f"Error creating section: {str(e)}")
+            raise
+
+    def update_section(self, section: Section) -> Optional[Section]:
+        """
+        Update an existing section
+
+        Args:
+            section: Section object with updated data
+
+        Returns:
+            Updated Section object or None if failed
+        """
+        try:
+            if not section.nombre:
+                raise ValueError("Section must have a nombre to update")
+
+            section_data = self._section_to_row(section)
+            if section_data.get('horas_jornada') is None:
+                # Keep the stored value when the caller didn't provide one
+                del section_data['horas_jornada']
+            assignments = ", ".join(f"{key} = ?" for key in section_data)
+            self._execute(f"UPDATE Sections SET {assignments} WHERE nombre = ?",
+                          tuple(section_data.values()) + (section.nombre,))
+            logger.info(f"Section updated: {section.nombre}")
+            return self.get_section(section.nombre) or section
+        except Exception as e:
+            logger.error(f"Error updating section: {str(e)}")
+            raise
+
+    def delete_section(self, section_nombre: str) -> bool:
+        """
+        Delete a section from the database
+
+        Args:
+            section_nombre: The nombre of the section to delete
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self._execute("DELETE FROM Sections WHERE nombre = ?", (section_nombre,))
+            logger.info(f"Section deleted: {section_nombre}")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting section '{section_nombre}': {str(e)}")
+            return False
+
+    # ========== SHIFT ASSIGNMENT OPERATIONS ==========
+
+    def save_assignment_scenario(self, name: str, created_by: str, year: int,
+                                 assignments_df: pd.DataFrame, metrics_dict: Dict,
+                                 description: str = "", settings: Dict = None) -> Optional[int]:
+        """
+        Save a complete assignment scenario to the database
+
+        The scenario, its assignments, its metrics and its worker x section x month
+        aggregate cube are written in a single transaction, with the column-wise
+        payload bulk inserted through executemany.
+
+        Args:
+            name: Name of the scenario
+            created_by: Username who created the scenario
+            year: Year for which assignments were generated
+            assignments_df: DataFrame containing all shift assignments
+            metrics_dict: Dictionary containing worker metrics
+            description: Optional description of the scenario
+            settings: Optional dictionary of settings used to generate this scenario
+
+        Returns:
+            ID of the created scenario or None if failed
+        """
+        try:
+            with self._lock:
+                with self.conn:
+                    cursor = self.conn.execute(
+                        "INSERT INTO assignment_scenarios (name, created_by, year, description, settings) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (name, created_by, year, description, json.dumps(settings) if settings else None)
+                    )
+                    scenario_id = cursor.lastrowid
+
+                    assignment_rows = columns_to_tuples(
+                        encode_assignment_columns(assignments_df, scenario_id), ASSIGNMENT_COLUMNS
+                    )
+                    self.conn.executemany(
+                        f"INSERT INTO shift_assignments ({', '.join(ASSIGNMENT_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' for _ in ASSIGNMENT_COLUMNS)})",
+                        assignment_rows
+                    )
+
+                    metric_rows = columns_to_tuples(
+                        encode_metric_columns(metrics_dict, scenario_id), METRIC_COLUMNS
+                    )
+                    self.conn.executemany(
+                        f"INSERT INTO assignment_metrics ({', '.join(METRIC_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' for _ in METRIC_COLUMNS)})",
+                        metric_rows
+                    )
+
+                    cube_columns = ['scenario_id'] + CUBE_COLUMNS
+                    self.conn.executemany(
+                        f"INSERT INTO assignment_cube ({', '.join(cube_columns)}) "
+                        f"VALUES ({', '.join('?' for _ in cube_columns)})",
+                        columns_to_tuples(encode_cube_columns(build_assignment_cube(assignments_df), scenario_id),
+                                          cube_columns)
+                    )
+
+            logger.info(f"Saved assignment scenario {name} (ID: {scenario_id}) with "
+                        f"{len(assignment_rows)} assignments and {len(metric_rows)} metrics")
+            return scenario_id
+        except Exception as e:
+            logger.error(f"Error saving assignment scenario: {str(e)}")
+            return None
+
+    def get_assignment_scenarios(self) -> pd.DataFrame:
+        """
+        Get all assignment scenarios
+
+        Returns:
+            DataFrame containing all scenarios with metadata
+        """
+        try:
+            return self._query_df("SELECT * FROM assignment_scenarios ORDER BY created_at DESC")
+        except Exception as e:
+            logger.error(f"Error fetching assignment scenarios: {str(e)}")
+            return pd.DataFrame()
+
+    def get_assignment_scenario(self, scenario_id: int) -> Optional[Dict]:
+        """
+        Get a specific assignment scenario by ID
+
+        Args:
+            scenario_id: ID of the scenario to retrieve
+
+        Returns:
+            Dictionary containing scenario data or None if not found
+        """
+        try:
+            rows = self._query("SELECT * FROM assignment_scenarios WHERE id = ?", (int(scenario_id),))
+            if rows:
+                return rows[0]
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching assignment scenario {scenario_id}: {str(e)}")
+            return None
+
+    def iter_assignments(self, scenario_id: int, columns: Optional[List[str]] = None,
+                         start_date: str = None, end_date: str = None,
+                         worker_name: str = None, section_name: str = None,
+                         page_size: int = 1000) -> Iterator[pd.DataFrame]:
+        """
+        Stream the shift assignments of a scenario page by page
+
+        Same contract as SupabaseManager.iter_assignments. The rows are read with a
+        single indexed query and yielded in slices, since a local file has no row cap.
+
+        Args:
+            scenario_id: ID of the scenario
+            columns: Columns to select, all columns if None
+            start_date: Optional start date filter (YYYY-MM-DD)
+            end_date: Optional end date filter (YYYY-MM-DD)
+            worker_name: Optional worker filter
+            section_name: Optional section filter
+            page_size: Rows per yielded page
+
+        Yields:
+            DataFrame with the rows of each page
+        """
+        unknown = [column for column in (columns or []) if column not in ASSIGNMENT_DTYPES]
+        if unknown:
+            raise ValueError(f"Unknown assignment columns: {unknown}")
+
+        where = "scenario_id = ?"
+        params = [int(scenario_id)]
+        for clause, value in (("date >= ?", start_date), ("date <= ?", end_date),
+                              ("worker_name = ?", worker_name), ("section_name = ?", section_name)):
+            if value:
+                where += f" AND {clause}"
+                params.append(value)
+
+        select = ", ".join(columns) if columns else "*"
+        df = self._query_df(f"SELECT {select} FROM shift_assignments WHERE {where} ORDER BY date, id",
+                            tuple(params))
+        df = cast_assignment_frame(df)
+        for offset in range(0, max(len(df), 1), page_size):
+            yield df.iloc[offset:offset + page_size]
+
+    def get_assignments(self, scenario_id: int, start_date: str = None, end_date: str = None,
+                        columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Get all shift assignments for a specific scenario
+
+        Args:
+            scenario_id: ID of the scenario to retrieve assignments for
+            start_date: Optional start date filter (YYYY-MM-DD)
+            end_date: Optional end date filter (YYYY-MM-DD)
+            columns: Optional list of columns to select (all columns if None)
+
+        Returns:
+            DataFrame containing all assignments for the scenario
+        """
+        try:
+            return concat_assignment_pages(
+                self.iter_assignments(scenario_id, columns, start_date=start_date, end_date=end_date),
+                columns
+            )
+        except Exception as e:
+            logger.error(f"Error fetching assignments for scenario {scenario_id}: {str(e)}")
+            return pd.DataFrame()
+
+    def get_worker_assignments(self, scenario_id: int, worker_name: str,
+                               columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Get all shift assignments for a specific worker in a scenario
+
+        Args:
+            scenario_id: ID of the scenario
+            worker_name: Name of the worker
+            columns: Optional list of columns to select (all columns if None)
+
+        Returns:
+            DataFrame containing worker's assignments
+        """
+        try:
+            return concat_assignment_pages(
+                self.iter_assignments(scenario_id, columns, worker_name=worker_name),
+                columns
+            )
+        except Exception as e:
+            logger.error(f"Error fetching assignments for worker {worker_name} in scenario {scenario_id}: {str(e)}")
+            return pd.DataFrame()
+
+    def get_assignment_metrics(self, scenario_id: int) -> pd.DataFrame:
+        """
+        Get all metrics for a specific assignment scenario
+
+        Args:
+            scenario_id: ID of the scenario to retrieve metrics for
+
+        Returns:
+            DataFrame containing metrics for all workers
+        """
+        try:
+            return self._query_df("SELECT * FROM assignment_metrics WHERE scenario_id = ?", (int(scenario_id),))
+        except Exception as e:
+            logger.error(f"Error fetching metrics for scenario {scenario_id}: {str(e)}")
+            return pd.DataFrame()
+
+    def get_assignment_cube(self, scenario_id: int) -> pd.DataFrame:
+        """
+        Get the worker x section x month aggregate cube of a scenario
+
+        Scenarios saved before the cube existed have no stored cube; it is then
+        computed from their assignments.
+
+        Args:
+            scenario_id: ID of the scenario
+
+        Returns:
+            DataFrame with the cube cells (see utils.assignment_cube)
+        """
+        try:
+            df = self._query_df("SELECT * FROM assignment_cube WHERE scenario_id = ?", (int(scenario_id),))
+            if not df.empty:
+                return decode_cube(df)
+            return build_assignment_cube(self.get_assignments(scenario_id, columns=CUBE_SOURCE_COLUMNS))
+        except Exception as e:
+            logger.error(f"Error fetching cube for scenario {scenario_id}: {str(e)}")
+            return pd.DataFrame()
+
+    def delete_assignment_scenario(self, scenario_id: int) -> bool:
+        """
+        Delete an assignment scenario and all related assignments and metrics
+
+        Args:
+            scenario_id: ID of the scenario to delete
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            # Foreign keys cascade to assignments and metrics
+            self._execute("DELETE FROM assignment_scenarios WHERE id = ?", (int(scenario_id),))
+            logger.info(f"Deleted assignment scenario {scenario_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting assignment scenario {scenario_id}: {str(e)}")
+            return False
+
+    def clone_assignment_scenario(self, scenario_id: int, new_name: str) -> Optional[int]:
+        """
+        Clone an existing assignment scenario with a new name
+
+        Equivalent of the clone_assignment_scenario stored function used with
+        Supabase: the rows are copied with INSERT ... SELECT in one transaction.
+
+        Args:
+            scenario_id: ID of the scenario to clone
+            new_name: Name for the new scenario
+
+        Returns:
+            ID of the new scenario or None if failed
+        """
+        try:
+            copied_assignments = ", ".join(ASSIGNMENT_COLUMNS[1:])
+            copied_metrics = ", ".join(METRIC_COLUMNS[1:])
+            copied_cube = ", ".join(CUBE_COLUMNS)
+            with self._lock:
+                with self.conn:
+                    cursor = self.conn.execute(
+                        "INSERT INTO assignment_scenarios (name, created_by, year, description, settings, status) "
+                        "SELECT ?, created_by, year, 'Cloned from ' || name || ' (ID: ' || id || ')', settings, 'draft' "
+                        "FROM assignment_scenarios WHERE id = ?",
+                        (new_name, int(scenario_id))
+                    )
+                    if cursor.rowcount == 0:
+                        logger.error(f"Scenario {scenario_id} not found for cloning")
+                        return None
+                    new_scenario_id = cursor.lastrowid
+
+                    self.conn.execute(
+                        f"INSERT INTO shift_assignments (scenario_id, {copied_assignments}) "
+                        f"SELECT ?, {copied_assignments} FROM shift_assignments WHERE scenario_id = ?",
+                        (new_scenario_id, int(scenario_id))
+                    )
+                    self.conn.execute(
+                        f"INSERT INTO assignment_metrics (scenario_id, {copied_metrics}) "
+                        f"SELECT ?, {copied_metrics} FROM assignment_metrics WHERE scenario_id = ?",
+                        (new_scenario_id, int(scenario_id))
+                    )
+                    self.conn.execute(
+                        f"INSERT INTO assignment_cube (scenario_id, {copied_cube}) "
+                        f"SELECT ?, {copied_cube} FROM assignment_cube WHERE scenario_id = ?",
+                        (new_scenario_id, int(scenario_id))
+                    )
+
+            logger.info(f"Cloned scenario {scenario_id} to new scenario {new_scenario_id}")
+            return new_scenario_id
+        except Exception as e:
+            logger.error(f"Error cloning assignment scenario {scenario_id}: {str(e)}")
+            return None
+
+    def get_assignment_calendar(self, scenario_id: int, month: int, year: int) -> Dict[str, List[Dict]]:
+        """
+        Get shift assignments organized by day for a specific month and year
+
+        Args:
+            scenario_id: ID of the scenario
+            month: Month (1-12)
+            year: Year
+
+        Returns:
+            Dictionary with dates as keys and lists of assignments as values
+        """
+        try:
+            start_date = f"{year}-{month:02d}-01"
+            if month == 12:
+                end_date = f"{year}-12-31"
+            else:
+                end_date = (datetime(year, month + 1, 1) - timedelta(days=1)).strftime("%Y-%m-%d")
+
+            assignments_df = self.get_assignments(scenario_id, start_date, end_date)
+
+            calendar_data = {}
+            if not assignments_df.empty:
+                for date, group in assignments_df.groupby(assignments_df['date'].dt.strftime('%Y-%m-%d')):
+                    calendar_data[date] = group.to_dict('records')
+
+            return calendar_data
+        except Exception as e:
+            logger.error(f"Error fetching assignment calendar for scenario {scenario_id}: {str(e)}")
+            return {}
+
+    def get_section_assignments(self, scenario_id: int, section_name: str,
+                                columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Get all assignments for a specific section in a scenario
+
+        Args:
+            scenario_id: ID of the scenario
+            section_name: Name of the section
+            columns: Optional list of columns to select (all columns if None)
+
+        Returns:
+            DataFrame with assignments for the section
+        """
+        try:
+            return concat_assignment_pages(
+                self.iter_assignments(scenario_id, columns, section_name=section_name),
+                columns
+            )
+        except Exception as e:
+            logger.error(f"Error fetching assignments for section {section_name} in scenario {scenario_id}: {str(e)}")
+            return pd.DataFrame()
+
+    def publish_assignment_scenario(self, scenario_id: int) -> bool:
+        """
+        Publish an assignment scenario (change status from 'draft' to 'published')
+
+        Args:
+            scenario_id: ID of the scenario to publish
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self._execute("UPDATE assignment_scenarios SET status = 'published' WHERE id = ?", (int(scenario_id),))
+            logger.info(f"Published assignment scenario {scenario_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error publishing assignment scenario {scenario_id}: {str(e)}")
+            return False
+
+    def archive_assignment_scenario(self, scenario_id: int) -> bool:
+        """
+        Archive an assignment scenario (change status to 'archived')
+
+        Args:
+            scenario_id: ID of the scenario to archive
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self._execute("UPDATE assignment_scenarios SET status = 'archived' WHERE id = ?", (int(scenario_id),))
+            logger.info(f"Archived assignment scenario {scenario_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Error archiving assignment scenario {scenario_id}: {str(e)}")
+            return False
+
+    # ========== UTILITY METHODS ==========
+
+    def get_festivos(self, year: Optional[int] = None) -> pd.DataFrame:
+        """
+        Retrieve holiday/festivo dates
+
+        Args:
+            year: Optional year filter
+
+        Returns:
+            DataFrame with festivo dates
+        """
+        try:
+            if year:
+                df = self._query_df("SELECT * FROM festivos WHERE date >= ? AND date <= ? ORDER BY date",
+                                    (f"{year}-01-01", f"{year}-12-31"))
+            else:
+                df = self._query_df("SELECT * FROM festivos ORDER BY date")
+
+            if not df.empty and 'date' in df.columns:
+                df['date'] = pd.to_datetime(df['date'])
+
+            return df
+        except Exception as e:
+            logger.error(f"Error fetching festivos: {str(e)}")
+            return pd.DataFrame()
+
+    def create_festivo(self, date: str, description: str = "") -> Dict:
+        """
+        Create a new festivo/holiday
+
+        Args:
+            date: Date string in YYYY-MM-DD format
+            description: Optional description of the holiday
+
+        Returns:
+            Dictionary of created festivo
+        """
+        try:
+            festivo_data = {"date": date, "description": description}
+            self._execute("INSERT OR REPLACE INTO festivos (date, description) VALUES (?, ?)", (date, description))
+            logger.info(f"Festivo created: {date}")
+            return festivo_data
+        except Exception as e:
+            logger.error(f"Error creating festivo for {date}: {str(e)}")
+            raise
+
+    def delete_festivo(self, date: str) -> bool:
+        """
+        Delete a festivo by date
+
+        Args:
+            date: Date string in YYYY-MM-DD format
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self._execute("DELETE FROM festivos WHERE date = ?", (date,))
+            logger.info(f"Festivo deleted: {date}")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting festivo {date}: {str(e)}")
+            return False
+
+    def seed_from_json(self, workers_path: str = "data/workers.json",
+                       sections_path: str = "data/sections.csv") -> None:
+        """
+        Load the fixtures in data/ into empty Workers and Sections tables,
+        and the bundled holidays into an empty festivos table
+
+        Sections are read from the CSV export, since data/sections.json carries
+        free-text notes and is not valid JSON.
+
+        Args:
+            workers_path: Path of the workers JSON file
+            sections_path: Path of the sections CSV file
+
+        Raises:
+            ValueError: If a fixture can't be parsed or the Sections table is still empty
+        """
+        if not self._query("SELECT 1 FROM Workers LIMIT 1") and os.path.exists(workers_path):
+            with open(workers_path, encoding='utf-8') as f:
+                for worker_data in json.load(f):
+                    self.create_worker(Worker(**worker_data))
+        if not self._query("SELECT 1 FROM festivos LIMIT 1"):
+            for festivo in sorted(festivos):
+                self.create_festivo(festivo.isoformat())
+        if not self._query("SELECT 1 FROM Sections LIMIT 1") and os.path.exists(sections_path):
+            for section in _sections_from_csv(sections_path):
+                self.create_section(section)
+        if not self._query("SELECT 1 FROM Sections LIMIT 1"):
+            raise ValueError(f"Could not seed the SQLite database: no sections in {sections_path}")
+        logger.info("SQLite database seeded from the data/ fixtures")
@@ -0,0 +1,121 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Categories whose regular staffing is protected, in the order a worker's category is resolved
+STAFFING_CATEGORIES = ("Guardia_UCI", "HEMS", "Coordis", "Guardia_Urg")
+
+# Workers of the category that must stay available for regular work (besides the one assigned)
+DEFAULT_MINIMUM_STAFF = {category: 2 for category in STAFFING_CATEGORIES}
+
+
+def staffing_category(worker) -> Optional[str]:
+    """Category whose staffing a worker counts against: the first area of STAFFING_CATEGORIES they work in"""
+    for category in STAFFING_CATEGORIES:
+        if worker.can_work_in_area(category):
+            return category
+    return None
+
+
+class StaffingCounters:
+    """
+    Number of workers available for regular work per (date, category).
+
+    Built from the regular availability matrix with one matrix product
+    (availability x category membership) and kept in sync through
+    mark_unavailable, which records every change on a trail. undo() rolls the
+    trail back to a checkpoint, so each undone change costs O(1) and the
+    staffing check is a lookup instead of a scan over the workers.
+    """
+
+    def __init__(self, workers: Sequence, regular_availability: pd.DataFrame,
+                 minimum_staff: Optional[Dict[str, int]] = None):
+        self.categories = list(STAFFING_CATEGORIES)
+        self.minimum_staff = {**DEFAULT_MINIMUM_STAFF, **(minimum_staff or {})}
+        self._category_index = {category: k for k, category in enumerate(self.categories)}
+        self._date_index = {date: i for i, date in enumerate(regular_availability.index)}
+        self._worker_index = {name: j for j, name in enumerate(regular_availability.columns)}
+
+        by_name = {worker.name: worker for worker in workers}
+        self._members = np.zeros((len(regular_availability.columns), len(self.categories)), dtype=bool)
+        self._worker_category = {}
+        for j, name in enumerate(regular_availability.columns):
+            worker = by_name.get(name)
+            if worker is None:
+                continue
+            self._members[j] = [worker.can_work_in_area(category) for category in self.categories]
+            self._worker_category[name] = staffing_category(worker)
+
+        self._available = regular_availability.to_numpy(dtype=bool, copy=True)
+        self.counts = self._available.astype("int64") @ self._members.astype("int64")
+        self._trail: List[Tuple[int, int]] = []
+
+    def category_of(self, worker) -> Optional[str]:
+        """Staffing category of a worker (see staffing_category)"""
+        if worker.name in self._worker_category:
+            return self._worker_category[worker.name]
+        return staffing_category(worker)
+
+    def available_count(self, category: str, date) -> int:
+        """Workers of a category available for regular work on a date (0 outside the matrix)"""
+        row = self._date_index.get(date)
+        column = self._category_index.get(category)
+        if row is None or column is None:
+            return 0
+        return int(self.counts[row, column])
+
+    def mark_unavailable(self, worker_name: str, date) -> None:
+        """Take a worker out of the regular staff of a date; no-op if they already were"""
+        row = self._date_index.get(date)
+        column = self._worker_index.get(worker_name)
+        if row is None or column is None or not self._available[row, column]:
+            return
+        self._available[row, column] = False
+        self.counts[row] -= self._members[column]
+        self._trail.append((row, column))
+
+    def checkpoint(self) -> int:
+        """Position of the trail, to undo every later change"""
+        return len(self._trail)
+
+    def undo(self, checkpoint: int) -> None:
+        """Revert the changes made after a checkpoint"""
+        while len(self._trail) > checkpoint:
+            row, column = self._trail.pop()
+            self._available[row, column] = True
+            self.counts[row] += self._members[column]
+
+    def headroom(self, worker, dates: Iterable) -> Optional[Tuple[int, object]]:
+        """
+        Spare regular staff of the worker's category if they were taken off the dates
+
+        Args:
+            worker: Worker that would be assigned
+            dates: Dates to check (dates outside the matrix are skipped)
+
+        Returns:
+            (headroom, tightest date) where headroom is the number of other
+            available workers minus the category minimum, or None when the
+            worker has no staffing category or no date is in the matrix
+        """
+        category = self.category_of(worker)
+        if category is None:
+            return None
+        k = self._category_index[category]
+        column = self._worker_index.get(worker.name)
+        minimum = self.minimum_staff.get(category, 0)
+
+        tightest = None
+        for date in dates:
+            row = self._date_index.get(date)
+            if row is None:
+                continue
+            others = int(self.counts[row, k])
+            if column is not None and self._available[row, column] and self._members[column, k]:
+                others -= 1
+            if tightest is None or others - minimum < tightest[0]:
+                tightest = (others - minimum, date)
+        return tightest
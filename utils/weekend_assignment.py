@@ -0,0 +1,305 @@
+import datetime
+import logging
+from typing import AbstractSet, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from utils.min_cost_flow import MinCostFlow
+
+logger = logging.getLogger(__name__)
+
+# Rotation roles of an Urgencias weekend:
+#   0: Friday tarde-noche + Sunday (or holiday) morning
+#   1: Saturday morning + Sunday (or holiday) night
+#   2: Saturday night
+ROLE_COUNT = 3
+
+# Costs of giving a block to a worker (lower is better)
+ROTATION_COST = 100       # the block's role is not the worker's rotation role that month
+WORKLOAD_COST = 10        # per shift the worker already has in the period
+REPEAT_COST = 40          # per weekend block the worker already takes in this solve
+RECENCY_COST = 5          # per week short of RECENCY_WEEKS since the worker last did one of the block's sections
+RECENCY_WEEKS = 8
+UNCOVERED_COST = 1_000_000  # leaving a block uncovered, only chosen when no worker can take it
+
+
+class WeekendBlock(NamedTuple):
+    """Shifts of one weekend role, all given to the same worker"""
+    weekend: datetime.date
+    role: int
+    shifts: Tuple[Tuple[datetime.date, object], ...]
+
+    @property
+    def dates(self) -> List[datetime.date]:
+        """Dates of the block's shifts"""
+        return [shift_date for shift_date, _ in self.shifts]
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        """First and last ordinal the block keeps its worker busy, including the libra day after it"""
+        last_date, last_section = max(self.shifts, key=lambda shift: shift[0])
+        end = last_date.toordinal() + (1 if last_section.libra else 0)
+        return min(self.dates).toordinal(), end
+
+
+def weekend_key(shift_date: datetime.date) -> datetime.date:
+    """Friday of the weekend a shift belongs to (holidays on weekdays are their own key)"""
+    if shift_date.weekday() in (5, 6):
+        return shift_date - datetime.timedelta(days=shift_date.weekday() - 4)
+    return shift_date
+
+
+def weekend_role(shift_date: datetime.date, section, festivos: Iterable) -> Optional[int]:
+    """
+    Rotation role of an Urgencias weekend shift
+
+    Args:
+        shift_date: Date of the shift
+        section: Section of the shift
+        festivos: Holiday dates
+
+    Returns:
+        Role number, or None for shifts assigned one by one (reinforcements)
+    """
+    name = section.nombre
+    if "refuerzo" in name:
+        return None
+    weekday = shift_date.weekday()
+    if weekday == 4 and shift_date not in festivos:
+        return 0
+    if weekday == 5:
+        if "mañana" in name:
+            return 1
+        if "noche" in name:
+            return 2
+        return None
+    # Sunday or holiday
+    if "mañana" in name:
+        return 0
+    if "noche" in name:
+        return 1
+    return None
+
+
+def build_weekend_blocks(weekend_shifts: Dict[datetime.date, list], assigned_shifts: AbstractSet,
+                         festivos: Iterable) -> Tuple[List[WeekendBlock], List[Tuple[datetime.date, object]]]:
+    """
+    Group the Urgencias weekend shifts into one block per (weekend, role)
+
+    Args:
+        weekend_shifts: (date, Section) pairs by weekend key
+        assigned_shifts: Set of (ISO date, section name) keys already assigned (first-Friday rules)
+        festivos: Holiday dates
+
+    Returns:
+        (blocks sorted by weekend and role, remaining shifts assigned one by one)
+    """
+    blocks, singles = [], []
+    for key in sorted(weekend_shifts):
+        roles = {}
+        for shift_date, section in sorted(weekend_shifts[key], key=lambda shift: shift[0]):
+            if (shift_date.isoformat(), section.nombre) in assigned_shifts:
+                continue
+            role = weekend_role(shift_date, section, festivos)
+            if role is None:
+                singles.append((shift_date, section))
+            else:
+                roles.setdefault(role, []).append((shift_date, section))
+        blocks.extend(WeekendBlock(key, role, tuple(shifts)) for role, shifts in sorted(roles.items()))
+    return blocks, singles
+
+
+def block_clusters(blocks: Sequence[WeekendBlock]) -> List[int]:
+    """
+    Cluster id of each block; blocks whose spans overlap share a cluster
+
+    A worker takes at most one block per cluster, which keeps them off two
+    roles of the same weekend and off a block that starts during another
+    block's libra day.
+    """
+    clusters = [0] * len(blocks)
+    order = sorted(range(len(blocks)), key=lambda b: blocks[b].span)
+    cluster, cluster_end = -1, None
+    for b in order:
+        start, end = blocks[b].span
+        if cluster_end is None or start > cluster_end:
+            cluster += 1
+            cluster_end = end
+        else:
+            cluster_end = max(cluster_end, end)
+        clusters[b] = cluster
+    return clusters
+
+
+def block_row_index(blocks: Sequence[WeekendBlock], dates: Sequence) -> np.ndarray:
+    """
+    Rows of each block's dates in a matrix indexed by dates, padded to the longest block
+
+    Padding points at row len(dates) and dates missing from the matrix at
+    row len(dates) + 1, the two sentinel rows added by block_candidate_masks.
+
+    Args:
+        blocks: Weekend blocks
+        dates: Row labels of the availability matrix
+
+    Returns:
+        int64 array (blocks x longest block)
+    """
+    row_of = {day: i for i, day in enumerate(dates)}
+    padding, missing = len(row_of), len(row_of) + 1
+    width = max((len(block.shifts) for block in blocks), default=0)
+    rows = np.full((len(blocks), width), padding, dtype="int64")
+    for b, block in enumerate(blocks):
+        rows[b, :len(block.shifts)] = [row_of.get(day, missing) for day in block.dates]
+    return rows
+
+
+def block_candidate_masks(row_index: np.ndarray, available: np.ndarray,
+                          preferred: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Workers available for every shift of each block, split into preferred and backup
+
+    One gather of the block rows and one AND over them answers all blocks at once.
+
+    Args:
+        row_index: Output of block_row_index
+        available: Boolean (dates x workers) availability
+        preferred: Boolean (blocks x workers), True where the block's role is the worker's rotation role
+
+    Returns:
+        (preferred candidates, backup candidates), boolean (blocks x workers) each
+    """
+    n_workers = available.shape[1]
+    padded = np.vstack([available, np.ones((1, n_workers), dtype=bool), np.zeros((1, n_workers), dtype=bool)])
+    candidates = padded[row_index].all(axis=1)
+    return candidates & preferred, candidates & ~preferred
+
+
+def weekend_role_costs(preferred: np.ndarray, period_shifts: np.ndarray, days_since: np.ndarray) -> np.ndarray:
+    """
+    Cost of giving each block to each worker
+
+    Args:
+        preferred: Boolean (blocks x workers), True where the block's role is the worker's rotation role
+        period_shifts: Shifts each worker already has in the period
+        days_since: Days since each worker last did one of each block's sections (blocks x workers)
+
+    Returns:
+        int64 matrix (blocks x workers)
+    """
+    weeks_short = np.clip(RECENCY_WEEKS - days_since // 7, 0, RECENCY_WEEKS)
+    costs = (~preferred) * ROTATION_COST + period_shifts[None, :] * WORKLOAD_COST + weeks_short * RECENCY_COST
+    return costs.astype("int64")
+
+
+def solve_weekend_roles(blocks: Sequence[WeekendBlock], candidates: np.ndarray, costs: np.ndarray,
+                        max_blocks: Optional[np.ndarray] = None) -> List[Optional[int]]:
+    """
+    Assign every weekend block of the period at once, as a min-cost flow
+
+    source -> block -> (worker, cluster) -> worker -> sink. Each block takes
+    one unit; a worker takes at most one block per cluster and the k-th block
+    of a worker adds k * REPEAT_COST, so load is spread across the roster;
+    max_blocks caps the number of worker -> sink edges.
+    Every block also has a direct edge to the sink at UNCOVERED_COST, so the
+    flow is always complete and a block is only left uncovered when no
+    candidate can take it.
+
+    Args:
+        blocks: Weekend blocks
+        candidates: Boolean (blocks x workers), True where the worker can take every shift of the block
+        costs: Cost matrix (blocks x workers)
+        max_blocks: Most blocks each worker can take in this solve, unlimited when omitted
+
+    Returns:
+        Worker column per block, None for uncovered blocks
+    """
+    n_blocks, n_workers = candidates.shape
+    if not n_blocks:
+        return []
+    clusters = block_clusters(blocks)
+    n_clusters = max(clusters) + 1
+
+    source, sink = 0, 1
+    flow = MinCostFlow(2)
+    worker_nodes = [flow.add_node() for _ in range(n_workers)]
+    used_workers = np.flatnonzero(candidates.any(axis=0))
+    for w in used_workers.tolist():
+        limit = n_clusters if max_blocks is None else min(n_clusters, int(max_blocks[w]))
+        for k in range(limit):
+            flow.add_edge(worker_nodes[w], sink, 1, k * REPEAT_COST)
+
+    slot_nodes = {}
+    choice_edges = []
+    for b in range(n_blocks):
+        block_node = flow.add_node()
+        flow.add_edge(source, block_node, 1, 0)
+        flow.add_edge(block_node, sink, 1, UNCOVERED_COST)
+        for w in np.flatnonzero(candidates[b]).tolist():
+            slot = (w, clusters[b])
+            if slot not in slot_nodes:
+                slot_nodes[slot] = flow.add_node()
+                flow.add_edge(slot_nodes[slot], worker_nodes[w], 1, 0)
+            choice_edges.append((b, w, flow.add_edge(block_node, slot_nodes[slot], 1, int(costs[b, w]))))
+
+    flow.solve(source, sink, n_blocks)
+    result = [None] * n_blocks
+    for b, w, edge in choice_edges:
+        if flow.flow(edge):
+            result[b] = w
+    return result
+
+
+def block_months(blocks: Sequence[WeekendBlock]) -> List[Tuple[int, int]]:
+    """(year, month) of each block's cluster, the month its first weekend belongs to"""
+    clusters = block_clusters(blocks)
+    first_weekend = {}
+    for block, cluster in zip(blocks, clusters):
+        if cluster not in first_weekend or block.weekend < first_weekend[cluster]:
+            first_weekend[cluster] = block.weekend
+    return [(first_weekend[cluster].year, first_weekend[cluster].month) for cluster in clusters]
+
+
+def solve_capped_weekend_roles(blocks: Sequence[WeekendBlock], candidates: np.ndarray, costs: np.ndarray,
+                               workload, worker_names: Sequence[str]) -> List[Optional[int]]:
+    """
+    Assign the weekend blocks one month at a time, within the workers' monthly caps and guard hours
+
+    workload.block_limits bounds the blocks of each worker by the headroom of
+    the caps the blocks touch, which holds for the blocks of one month but not
+    as a total over several months. Each month is solved with solve_weekend_roles
+    and limits computed after counting the blocks taken in the months before
+    it; those counts also raise the workload and repeat costs of the next
+    months. The counts are undone before returning.
+
+    Args:
+        blocks: Weekend blocks
+        candidates: Boolean (blocks x workers), True where the worker can take every shift of the block
+        costs: Cost matrix (blocks x workers)
+        workload: WorkloadCounters of the period
+        worker_names: Worker name of each column
+
+    Returns:
+        Worker column per block, None for uncovered blocks
+    """
+    result: List[Optional[int]] = [None] * len(blocks)
+    taken_blocks = np.zeros(len(worker_names), dtype="int64")
+    taken_shifts = np.zeros(len(worker_names), dtype="int64")
+    months = block_months(blocks)
+    checkpoint = workload.checkpoint()
+    try:
+        for month in sorted(set(months)):
+            indices = [b for b, block_month in enumerate(months) if block_month == month]
+            month_blocks = [blocks[b] for b in indices]
+            allowed, max_blocks = workload.block_limits(month_blocks, worker_names)
+            month_costs = costs[indices] + taken_blocks[None, :] * REPEAT_COST + taken_shifts[None, :] * WORKLOAD_COST
+            solution = solve_weekend_roles(month_blocks, candidates[indices] & allowed, month_costs, max_blocks)
+            for b, w in zip(indices, solution):
+                result[b] = w
+                if w is None:
+                    continue
+                taken_blocks[w] += 1
+                taken_shifts[w] += len(blocks[b].shifts)
+                for shift_date, section in blocks[b].shifts:
+                    workload.add(worker_names[w], section, shift_date)
+    finally:
+        workload.undo(checkpoint)
+    return result
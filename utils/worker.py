@@ -1,9 +1,11 @@
-from datetime import datetime
+from utils.ooo import encode_ooo_periods, find_period, parse_ooo_day, parse_ooo_periods, period_row_ranges
+from utils.scheduling_rules import parse_worker_rules
 class Worker:
     def __init__(self, name, initials, birth_year, category, state="Alta", 
                  areas=None, days_assigned=None, avoid_days=None, 
                  section_day_constraints=None, available_work_hours=1688, available_guard_hours=499, ooo_days=[], 
-                 jornada_laboral = 100, dias_semana_jornada = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']):
+                 jornada_laboral = 100, dias_semana_jornada = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday'],
+                 rules=None):
         """Initialize a worker with their details
         
         Args:
@@ -22,6 +24,8 @@ class Worker:
             available_guard_hours (int): Available guard hours per year
             jornada_laboral (int): Percentage of full-time work (e.g., 100 for full-time, 50 for half-time)
             dias_semana_jornada (list): Days of the week the worker is available to work (mornings, doesn't apply to shifts)
+            rules (list): Person-specific scheduling rules (pin / exclude / prefer, see utils.scheduling_rules)
+                None when never set, so the legacy defaults for the worker's name apply
         """
         self.name = name
         self.initials = initials
@@ -34,31 +38,53 @@ class Worker:
         self.section_day_constraints = section_day_constraints if section_day_constraints else {}
         self.available_work_hours = available_work_hours
         self.available_guard_hours = available_guard_hours
-        self.ooo_days = []
         self.jornada_laboral = jornada_laboral
         self.dias_semana_jornada = dias_semana_jornada
-        if ooo_days:
-            for day in ooo_days:
-                if isinstance(day, str):
-                    # Parse date string in format YYYY-MM-DD
-                    try:
-                        parsed_date = datetime.strptime(day, '%d/%m/%Y').date()
-                        self.ooo_days.append(parsed_date)
-                    except ValueError:
-                        # Skip invalid dates
-                        print(f"Warning: Could not parse date '{day}' for worker {name}")
-                else:
-                    self.ooo_days.append(day)
-        
+        self.ooo_days = ooo_days
+        self.rules = parse_worker_rules(rules)
+
+    @property
+    def ooo_days(self):
+        """Out-of-office periods, sorted and disjoint (legacy single days are merged into ranges)"""
+        return self._ooo_days
+
+    @ooo_days.setter
+    def ooo_days(self, value):
+        self._ooo_days = parse_ooo_periods(value, self.name)
+        self._ooo_starts = [period.start.toordinal() for period in self._ooo_days]
+
+    def to_row(self):
+        """Fields stored in the Workers table, with the out-of-office periods as {start, end, reason} ranges
+
+        Returns:
+            dict: Column values; the backends encode the list and dict fields for their storage
+        """
+        return {
+            'name': self.name,
+            'initials': self.initials,
+            'birth_year': self.birth_year,
+            'category': self.category,
+            'state': self.state,
+            'areas': self.areas,
+            'days_assigned': self.days_assigned,
+            'avoid_days': self.avoid_days,
+            'section_day_constraints': self.section_day_constraints,
+            'available_work_hours': self.available_work_hours,
+            'available_guard_hours': self.available_guard_hours,
+            'ooo_days': encode_ooo_periods(self.ooo_days),
+            'jornada_laboral': self.jornada_laboral,
+            'dias_semana_jornada': self.dias_semana_jornada,
+            'rules': self.rules,
+        }
+
     def is_out_of_office(self, date):
         """Check if worker is out of office (holiday, personal day) on a specific date"""
         if isinstance(date, str):
-            try:
-                date = datetime.strptime(date, '%Y-%m-%d').date()
-            except ValueError:
+            date = parse_ooo_day(date)
+            if date is None:
                 return False
-                
-        return date in self.ooo_days
+        return find_period(self._ooo_days, self._ooo_starts, date) is not None
+
     def can_work_in_area(self, area):
         """Check if worker can work in a specific area"""
         return area in self.areas
@@ -118,3 +144,151 @@ class Worker:
     def __str__(self):
         return f"{self.name} ({self.category})"
 
+
+
+WEEKDAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+WEEKDAY_BITS = {name: 1 << i for i, name in enumerate(WEEKDAY_NAMES)}
+ALL_WEEKDAYS_MASK = (1 << len(WEEKDAY_NAMES)) - 1
+
+# Bits of the worker areas. The known areas have a fixed bit; others get the next free one
+AREA_BITS = {area: 1 << i for i, area in enumerate(
+    ("Guardia_UCI", "HEMS", "Coordis", "Guardia_Urg", "Guardia_Hosp"))}
+
+
+def area_bit(area):
+    """Bit of an area in CompiledWorker.area_mask (0 for empty areas)"""
+    if not area:
+        return 0
+    bit = AREA_BITS.get(area)
+    if bit is None:
+        bit = AREA_BITS.setdefault(area, 1 << len(AREA_BITS))
+    return bit
+
+
+def weekday_mask(days):
+    """Bitmask of a list of weekday names (0=Monday bit), unknown names are ignored"""
+    mask = 0
+    for day in days or []:
+        mask |= WEEKDAY_BITS.get(str(day).strip().lower(), 0)
+    return mask
+
+
+class CompiledWorker:
+    """
+    Read-only worker representation used by the solver.
+
+    Built once from a Worker (or a DB row); list fields are turned into
+    bitmasks (areas, avoid days, jornada weekdays, assigned weekdays per
+    category, section-day constraints) and the out-of-office periods into
+    sorted start ordinals, so every availability check is a bit test or a
+    bisect. Pickles as its source fields and recompiles on load.
+    """
+
+    __slots__ = ('name', 'initials', 'birth_year', 'category', 'state', 'areas', 'days_assigned',
+                 'avoid_days', 'section_day_constraints', 'ooo_days', 'available_work_hours',
+                 'available_guard_hours', 'jornada_laboral', 'dias_semana_jornada',
+                 'area_mask', 'avoid_mask', 'jornada_mask', 'assigned_masks', 'section_day_masks',
+                 'ooo_starts', 'rules')
+
+    def __init__(self, name, initials, birth_year, category, state="Alta", areas=None, days_assigned=None,
+                 avoid_days=None, section_day_constraints=None, available_work_hours=1688,
+                 available_guard_hours=499, ooo_days=None, jornada_laboral=100,
+                 dias_semana_jornada=('monday', 'tuesday', 'wednesday', 'thursday', 'friday'), rules=None):
+        self.name = name
+        self.initials = initials
+        self.birth_year = birth_year
+        self.category = category
+        self.state = state
+        self.areas = tuple(areas or ())
+        self.days_assigned = dict(days_assigned or {})
+        self.avoid_days = tuple(avoid_days or ())
+        self.section_day_constraints = dict(section_day_constraints or {})
+        self.available_work_hours = available_work_hours
+        self.available_guard_hours = available_guard_hours
+        self.jornada_laboral = jornada_laboral
+        self.dias_semana_jornada = tuple(dias_semana_jornada or ())
+        self.ooo_days = tuple(parse_ooo_periods(ooo_days, name))
+        self.rules = parse_worker_rules(rules)
+
+        self.area_mask = 0
+        for area in self.areas:
+            self.area_mask |= area_bit(area)
+        self.avoid_mask = weekday_mask(self.avoid_days)
+        self.jornada_mask = weekday_mask(self.dias_semana_jornada) if self.dias_semana_jornada else ALL_WEEKDAYS_MASK
+        self.assigned_masks = {category: weekday_mask(days) for category, days in self.days_assigned.items()}
+        self.section_day_masks = {section: weekday_mask(days)
+                                  for section, days in self.section_day_constraints.items()}
+        self.ooo_starts = tuple(period.start.toordinal() for period in self.ooo_days)
+
+    @classmethod
+    def from_worker(cls, worker):
+        """Compile a Worker (or any object with the Worker attributes)"""
+        if isinstance(worker, cls):
+            return worker
+        return cls(**{field: getattr(worker, field) for field in cls._source_fields() if hasattr(worker, field)})
+
+    @classmethod
+    def from_row(cls, row):
+        """Compile a Workers row (dict) with already decoded list/dict fields"""
+        return cls(**{field: row[field] for field in cls._source_fields() if row.get(field) is not None})
+
+    @staticmethod
+    def _source_fields():
+        return ('name', 'initials', 'birth_year', 'category', 'state', 'areas', 'days_assigned', 'avoid_days',
+                'section_day_constraints', 'available_work_hours', 'available_guard_hours', 'ooo_days',
+                'jornada_laboral', 'dias_semana_jornada', 'rules')
+
+    def __reduce__(self):
+        return (_rebuild_compiled_worker, (tuple(getattr(self, field) for field in self._source_fields()),))
+
+    def is_out_of_office(self, date):
+        """Check if worker is out of office (holiday, personal day) on a specific date"""
+        if isinstance(date, str):
+            date = parse_ooo_day(date)
+            if date is None:
+                return False
+        return self.ooo_period_on(date) is not None
+
+    def ooo_period_on(self, date):
+        """Out-of-office period containing the date, None if there is none"""
+        return find_period(self.ooo_days, self.ooo_starts, date)
+
+    def ooo_row_ranges(self, start_date, n_days):
+        """Row slices (start, stop) of the out-of-office days in a matrix of n_days rows from start_date"""
+        return period_row_ranges(self.ooo_days, start_date, n_days)
+
+    def can_work_in_area(self, area):
+        """Check if worker can work in a specific area"""
+        bit = AREA_BITS.get(area, 0) if area else 0
+        return bool(self.area_mask & bit)
+
+    def can_work_on_date(self, date):
+        """Check if worker can work on a specific date based on availability"""
+        if self.ooo_period_on(date) is not None:
+            return False
+        return not (self.avoid_mask >> date.weekday()) & 1
+
+    def can_do_section_on_day(self, section_name, date):
+        """Check if the worker has no restriction for a section on this day"""
+        return not (self.section_day_masks.get(section_name, 0) >> date.weekday()) & 1
+
+    def works_jornada_on(self, date):
+        """Check if the date is one of the worker's regular working weekdays"""
+        return bool((self.jornada_mask >> date.weekday()) & 1)
+
+    def has_assigned_weekday(self, category, weekday):
+        """Check if the worker has this weekday (0=Monday) assigned for a category"""
+        return bool((self.assigned_masks.get(category, 0) >> weekday) & 1)
+
+    def __str__(self):
+        return f"{self.name} ({self.category})"
+
+
+def _rebuild_compiled_worker(values):
+    """Unpickle a CompiledWorker from its source fields"""
+    return CompiledWorker(**dict(zip(CompiledWorker._source_fields(), values)))
+
+
+def compile_workers(workers):
+    """Compile a list of Worker objects for the solver"""
+    return [CompiledWorker.from_worker(worker) for worker in workers]
@@ -0,0 +1,173 @@
+import datetime
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from utils.staffing import STAFFING_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# Shift types a monthly cap applies to: weekdays, and weekends or festivos
+SHIFT_TYPES = ("laborable", "festivo")
+
+# Shifts a worker can take per month in each area, by shift type
+DEFAULT_MONTHLY_CAPS = {area: {"laborable": 6, "festivo": 4} for area in STAFFING_CATEGORIES}
+
+# Guard hours per year of workers without available_guard_hours
+DEFAULT_GUARD_HOURS = 499
+
+
+def shift_type(date: datetime.date, festivos: Iterable) -> str:
+    """Shift type of a date: festivo on weekends and festivos, laborable otherwise"""
+    return "festivo" if date.weekday() >= 5 or date in festivos else "laborable"
+
+
+class WorkloadCounters:
+    """
+    Monthly shift counts and yearly guard hours of every worker, checked against their limits.
+
+    Counts are kept per (worker, area, month, shift type) and hours per
+    (worker, year) in dictionaries seeded from the ledger, so checking a
+    candidate is two lookups. add() records every change on a trail and
+    undo() rolls it back to a checkpoint in O(1) per change, like
+    StaffingCounters.
+    """
+
+    def __init__(self, workers: Sequence, assignments_df: pd.DataFrame, section_areas: Dict[str, str],
+                 festivos: Iterable, monthly_caps: Optional[Dict[str, Dict[str, int]]] = None):
+        """
+        Args:
+            workers: Workers whose limits are enforced
+            assignments_df: Ledger of assignments already made (all periods)
+            section_areas: Area of each section name (sections without one are not capped monthly)
+            festivos: Holiday dates
+            monthly_caps: {area: {shift type: cap}} overriding DEFAULT_MONTHLY_CAPS
+        """
+        self.section_areas = section_areas
+        self.festivos = festivos
+        self.monthly_caps = {area: dict(caps) for area, caps in DEFAULT_MONTHLY_CAPS.items()}
+        for area, caps in (monthly_caps or {}).items():
+            self.monthly_caps.setdefault(area, {}).update(caps)
+        self.guard_hours = {worker.name: float(getattr(worker, 'available_guard_hours', None) or DEFAULT_GUARD_HOURS)
+                            for worker in workers}
+
+        self._monthly: Dict[Tuple[str, str, Tuple[int, int], str], int] = {}
+        self._hours: Dict[Tuple[str, int], float] = {}
+        self._trail: List[Tuple[Tuple[str, str, Tuple[int, int], str], Tuple[str, int], float]] = []
+        self._index_ledger(assignments_df)
+
+    def _index_ledger(self, assignments_df: pd.DataFrame) -> None:
+        """Seed the counters from the ledger with two group-bys"""
+        if assignments_df is None or assignments_df.empty:
+            return
+        known = assignments_df[assignments_df['worker_name'].isin(self.guard_hours)]
+        if known.empty:
+            return
+        dates = pd.to_datetime(known['date'])
+        festivo = (dates.dt.weekday >= 5).to_numpy() | dates.dt.date.isin(self.festivos).to_numpy()
+        ledger = pd.DataFrame({
+            'worker_name': known['worker_name'].to_numpy(),
+            'area': known['section_name'].map(self.section_areas).to_numpy(),
+            'year': dates.dt.year.to_numpy(),
+            'month': dates.dt.month.to_numpy(),
+            'type': np.where(festivo, "festivo", "laborable"),
+            'hours': pd.to_numeric(known['hours'], errors='coerce').fillna(0).to_numpy(),
+        })
+        for (worker_name, area, year, month, kind), count in ledger.dropna(subset=['area']).groupby(
+                ['worker_name', 'area', 'year', 'month', 'type']).size().items():
+            self._monthly[(worker_name, area, (int(year), int(month)), kind)] = int(count)
+        for (worker_name, year), hours in ledger.groupby(['worker_name', 'year'])['hours'].sum().items():
+            self._hours[(worker_name, int(year))] = float(hours)
+
+    def _key(self, worker_name: str, section_name: str, date: datetime.date):
+        """Monthly counter of a shift, None for sections without an area"""
+        area = self.section_areas.get(section_name)
+        return (worker_name, area, (date.year, date.month), shift_type(date, self.festivos)) if area else None
+
+    def monthly_count(self, worker_name: str, section_name: str, date: datetime.date) -> int:
+        """Shifts of the worker in the section's area, month and shift type"""
+        key = self._key(worker_name, section_name, date)
+        return self._monthly.get(key, 0) if key else 0
+
+    def monthly_cap(self, section_name: str, date: datetime.date) -> Optional[int]:
+        """Monthly cap of the section's area and the date's shift type, None when uncapped"""
+        area = self.section_areas.get(section_name)
+        return self.monthly_caps.get(area, {}).get(shift_type(date, self.festivos)) if area else None
+
+    def remaining_hours(self, worker_name: str, year: int) -> float:
+        """Guard hours the worker has left in a year"""
+        return self.guard_hours.get(worker_name, DEFAULT_GUARD_HOURS) - self._hours.get((worker_name, year), 0.0)
+
+    def allows(self, worker_name: str, section, date: datetime.date) -> bool:
+        """Check if the worker can take the shift without going over a monthly cap or their guard hours"""
+        cap = self.monthly_cap(section.nombre, date)
+        if cap is not None and self.monthly_count(worker_name, section.nombre, date) >= cap:
+            return False
+        return self.remaining_hours(worker_name, date.year) >= section.horas_turno
+
+    def add(self, worker_name: str, section, date: datetime.date) -> None:
+        """Count an assignment"""
+        key = self._key(worker_name, section.nombre, date)
+        if key:
+            self._monthly[key] = self._monthly.get(key, 0) + 1
+        hours_key = (worker_name, date.year)
+        self._hours[hours_key] = self._hours.get(hours_key, 0.0) + section.horas_turno
+        self._trail.append((key, hours_key, section.horas_turno))
+
+    def checkpoint(self) -> int:
+        """Position of the trail, to undo every later change"""
+        return len(self._trail)
+
+    def undo(self, checkpoint: int) -> None:
+        """Revert the assignments counted after a checkpoint"""
+        while len(self._trail) > checkpoint:
+            key, hours_key, hours = self._trail.pop()
+            if key:
+                self._monthly[key] -= 1
+            self._hours[hours_key] -= hours
+
+    def block_limits(self, blocks: Sequence, worker_names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Limits of the weekend blocks solved together
+
+        Args:
+            blocks: WeekendBlock list
+            worker_names: Columns of the result
+
+        Returns:
+            (allowed, max_blocks): boolean (blocks x workers), True where the
+            worker can take every shift of the block on its own, and the number
+            of blocks each worker can take at most, a conservative bound from
+            their tightest cap (the largest block against the smallest headroom).
+            The bound is only valid for the blocks of one month; several
+            months are solved one after the other (see solve_capped_weekend_roles)
+        """
+        allowed = np.ones((len(blocks), len(worker_names)), dtype=bool)
+        max_blocks = np.full(len(worker_names), len(blocks), dtype="int64")
+        for j, worker_name in enumerate(worker_names):
+            needs: Dict = {}
+            for b, block in enumerate(blocks):
+                block_needs: Dict = {}
+                for shift_date, section in block.shifts:
+                    key = self._key(worker_name, section.nombre, shift_date)
+                    if key:
+                        cap_need = ('cap', key, self.monthly_cap(section.nombre, shift_date))
+                        block_needs[cap_need] = block_needs.get(cap_need, 0) + 1
+                    hours_need = ('hours', (worker_name, shift_date.year), None)
+                    block_needs[hours_need] = block_needs.get(hours_need, 0) + section.horas_turno
+                for need, amount in block_needs.items():
+                    room = self._room(need)
+                    if amount > room:
+                        allowed[b, j] = False
+                    needs[need] = max(needs.get(need, 0), amount)
+            for need, amount in needs.items():
+                if amount > 0:
+                    max_blocks[j] = min(max_blocks[j], int(self._room(need) // amount))
+        return allowed, np.maximum(max_blocks, 0)
+
+    def _room(self, need) -> float:
+        """What is left of a cap ('cap', key, cap) or of a guard-hour budget ('hours', (worker, year), None)"""
+        kind, key, cap = need
+        if kind == 'hours':
+            return self.remaining_hours(*key)
+        return float('inf') if cap is None else cap - self._monthly.get(key, 0)